@@ -5,7 +5,6 @@ from datetime import datetime, timedelta
 from pathlib import Path
 
 import allure
-import boto3
 import pytest
 
 # Using dotenv to simplify setting up env vars locally
@@ -14,7 +13,26 @@ from gen3_ci.scripts.prepare_ci_environment import generate_api_keys_for_test_us
 from utils import TEST_DATA_PATH_OBJECT
 from utils import gen3_admin_tasks as gat
 from utils import logger
+from utils import durations, env_snapshot
 from utils import test_setup as setup
+from utils.es_admin import close_es_clients
+from utils.http_session import log_connection_stats
+from utils.index_sets import get_worker_index_set
+from utils.leases import (
+    LEASES_PATH_OBJECT,
+    get_leases,
+    get_scope,
+    get_scope_leases,
+    lease_manager,
+    leases_conflict,
+    merge_leases,
+)
+from utils.metrics_shipper import MetricsShipper, get_sink
+from utils.misc import ONE_WORKER_ONLY_PATH_OBJECT, log_poll_stats, one_worker_only
+from utils.port_forward import port_forwards
+from utils.session_cache import SESSION_CACHE_PATH_OBJECT
+from utils.timing_store import timing_store
+from utils.token_cache import TOKEN_CACHE_PATH_OBJECT, token_cache
 from xdist import is_xdist_controller
 from xdist.scheduler import LoadScopeScheduling
 
@@ -25,6 +43,11 @@ requires_google_bucket_marker_present = False
 collect_ignore = ["test_setup.py", "gen3_admin_tasks.py"]
 failed_test_suites = []
 test_results = {}
+test_call_durations = {}
+CI_METRICS_QUEUE_URL = "https://sqs.us-east-1.amazonaws.com/707767160287/ci-metrics-sqs"
+metrics_shipper = MetricsShipper(
+    get_sink(CI_METRICS_QUEUE_URL), on_sent=timing_store.mark_exported
+)
 
 
 class XDistCustomPlugin:
@@ -40,28 +63,80 @@ class XDistCustomPlugin:
     def pytest_xdist_make_scheduler(self, config, log):
         return CustomScheduling(config, log, nodes=self._nodes)
 
+    def pytest_configure_node(self, node):
+        # Workers use the environment probed by the controller
+        node.workerinput["env_snapshot"] = node.config.env_snapshot
+
 
 class CustomScheduling(LoadScopeScheduling):
     def __init__(self, config, log, *, nodes):
         super().__init__(config, log)
         self._nodes = nodes
+        self._durations = durations.load_durations(config)
+        self._sorted_by_duration = False
+        # scope => leases of its tests
+        self._leases = {}
+
+    def _sort_workqueue_by_duration(self):
+        """
+        Order the scopes longest-first using the durations of previous runs. Since each
+        worker takes the next scope as soon as it is done, this spreads the long scopes
+        over the workers and leaves the short ones to fill in the gaps at the end
+        """
+        scope_durations = durations.estimate_scope_durations(
+            {scope: list(nodeids) for scope, nodeids in self.workqueue.items()},
+            self._durations,
+        )
+        for scope in sorted(
+            scope_durations, key=lambda scope: scope_durations[scope], reverse=True
+        ):
+            self.workqueue.move_to_end(scope)
+        longest = max(scope_durations, key=scope_durations.get)
+        logger.info(
+            f"Scheduling {len(scope_durations)} scopes longest-first on {len(self.nodes)} workers. "
+            f"Longest scope: '{longest}' ({scope_durations[longest]:.0f}s), estimated run time: "
+            f"{durations.estimate_makespan(scope_durations, len(self.nodes)):.0f}s"
+        )
 
-    def _split_scope(self, nodeid):
-        node = self._nodes[nodeid]
-        # Run all tests with marker workspace to run serially (same worker)
-        if node.get_closest_marker("workspace"):
-            return "__workspace__"
-
-        # Run all tests with marker ras to run serially (same worker)
-        if node.get_closest_marker("ras"):
-            return "__ras__"
-
-        # Group all tests that affect ES indices and run them on the same worker serially
-        if node.get_closest_marker("guppy") or node.get_closest_marker("pfb"):
-            return "__indices__"
+    def _scope_leases(self, scope, work_unit):
+        """Leases of the tests of the scope, see utils.leases"""
+        if scope not in self._leases:
+            self._leases[scope] = merge_leases(
+                get_leases(self._nodes[nodeid]) for nodeid in work_unit
+            )
+        return self._leases[scope]
+
+    def _pick_non_conflicting_scope(self, node):
+        """
+        Move the first scope whose leases don't conflict with the scopes running on the
+        other workers to the front of the queue. If they all conflict, the worker gets
+        the first one and waits for the lease.
+        """
+        running_leases = [
+            self._scope_leases(scope, work_unit)
+            for other_node, assigned in self.assigned_work.items()
+            if other_node is not node
+            for scope, work_unit in assigned.items()
+            if not all(work_unit.values())
+        ]
+        for scope, work_unit in self.workqueue.items():
+            leases = self._scope_leases(scope, work_unit)
+            if not any(leases_conflict(leases, other) for other in running_leases):
+                self.workqueue.move_to_end(scope, last=False)
+                return
+
+    def _assign_work_unit(self, node):
+        if not self._sorted_by_duration and self.workqueue:
+            self._sort_workqueue_by_duration()
+            self._sorted_by_duration = True
+        self._pick_non_conflicting_scope(node)
+        super()._assign_work_unit(node)
 
-        # otherwise, each test is in its own scope
-        return nodeid.rsplit("::", 1)[0]
+    def _split_scope(self, nodeid):
+        # Each test class (or module) is a scope. Tests sharing a resource (an account,
+        # ES aliases...) declare it with `@pytest.mark.uses` instead of being pinned to
+        # a worker, see _pick_non_conflicting_scope
+        return get_scope(nodeid)
 
 
 def pytest_collection_finish(session):
@@ -74,29 +149,42 @@ def pytest_collection_finish(session):
     if not hasattr(session.config, "workerinput"):
         for item in session.items:
             # Access the markers for each test item
-            if (
-                item.get_closest_marker("requires_fence_client")
-                and not requires_fence_client_marker_present
-            ):
-                setup.setup_fence_test_clients_info()
+            if item.get_closest_marker("requires_fence_client"):
                 requires_fence_client_marker_present = True
-
-            if (
-                item.get_closest_marker("requires_google_bucket")
-                and not requires_google_bucket_marker_present
-                and not os.getenv("RUNNING_LOCAL")
+            if item.get_closest_marker("requires_google_bucket") and not os.getenv(
+                "RUNNING_LOCAL"
             ):
-                setup.setup_google_buckets()
                 requires_google_bucket_marker_present = True
-        # Run Usersync job
-        if not os.getenv("RUNNING_LOCAL"):
-            setup.run_usersync()
+        # Create the fence clients and google buckets and run the usersync job
+        setup.run_bootstrap(
+            requires_fence_client=requires_fence_client_marker_present,
+            requires_google_bucket=requires_google_bucket_marker_present,
+            requires_usersync=not os.getenv("RUNNING_LOCAL"),
+        )
 
 
-@pytest.fixture(scope="session", autouse=True)
-def get_fence_clients():
+@one_worker_only
+def load_fence_clients():
+    """Credentials of the fence clients set up by the controller, read by one worker"""
     setup.get_client_id_secret()
     setup.get_rotated_client_id_secret()
+    return pytest.clients, pytest.rotated_clients
+
+
+@pytest.fixture(scope="session", autouse=True)
+def get_fence_clients():
+    clients, rotated_clients = load_fence_clients()
+    pytest.clients.update(clients)
+    pytest.rotated_clients.update(rotated_clients)
+
+
+@pytest.fixture(scope="session")
+def index_set():
+    """The CI indices and guppy of this worker, see utils.index_sets"""
+    worker_index_set = get_worker_index_set(pytest.namespace)
+    worker_index_set.setup()
+    yield worker_index_set
+    worker_index_set.teardown()
 
 
 def pytest_configure(config):
@@ -133,8 +221,15 @@ def pytest_configure(config):
         # Get configuration files
         setup.get_configuration_files()
 
+    # Probe the environment once on the controller, workers get the snapshot from it
+    if hasattr(config, "workerinput") and "env_snapshot" in config.workerinput:
+        config.env_snapshot = config.workerinput["env_snapshot"]
+    else:
+        config.env_snapshot = env_snapshot.load_or_build_snapshot(pytest.namespace)
+    snapshot = config.env_snapshot
+
     # Skip portal tests based on portal version
-    config.skip_portal_tests = gat.skip_portal_tests()
+    config.skip_portal_tests = snapshot["skip_portal_tests"]
 
     # Compute root url for portal
     try:
@@ -155,23 +250,25 @@ def pytest_configure(config):
         pytest.root_url_portal = pytest.root_url
 
     # List of services deployed
-    pytest.deployed_services = gat.get_list_of_services_deployed()
+    pytest.deployed_services = snapshot["deployed_services"]
     # List of sower jobs enabled
-    pytest.enabled_sower_jobs = gat.get_enabled_sower_jobs()
+    pytest.enabled_sower_jobs = snapshot["enabled_sower_jobs"]
     # # Is Flag enabled for USE_AGG_MDS
-    pytest.use_agg_mdg_flag = gat.is_agg_mds_enabled()
+    pytest.use_agg_mdg_flag = snapshot["use_agg_mdg_flag"]
     # Is indexs3client job deployed
-    pytest.indexs3client_job_deployed = gat.check_indexs3client_job_deployed()
+    pytest.indexs3client_job_deployed = snapshot["indexs3client_job_deployed"]
     # Google tests dont run on local
     pytest.google_enabled = (
-        gat.is_google_enabled() if not os.getenv("RUNNING_LOCAL") else False
+        snapshot["google_enabled"] if not os.getenv("RUNNING_LOCAL") else False
     )
     # Is REGISTER_USERS_ON enabled
-    pytest.is_register_user_enabled = gat.is_register_user_enabled(pytest.namespace)
+    pytest.is_register_user_enabled = snapshot["is_register_user_enabled"]
+    # Helm revision the session caches (portal config, service versions) are keyed by
+    pytest.helm_revision = snapshot.get("helm_revision")
     # Flag for identifying if root_url_portal is for frontend or not
-    pytest.frontend_url = gat.is_frontend_url()
+    pytest.frontend_url = gat.is_frontend_url(pytest.deployed_services)
     if pytest.frontend_url:
-        repo_name, branch_name, target_dir = gat.get_ff_commons_info()
+        repo_name, branch_name, target_dir = snapshot["ff_commons_info"]
         pytest.frontend_commons_name = target_dir
         if not hasattr(config, "workerinput"):
             gat.download_frontend_commons_app_repo(repo_name, branch_name, target_dir)
@@ -183,13 +280,23 @@ def pytest_configure(config):
 
 def pytest_runtest_logreport(report):
     test_nodeid = report.nodeid
+    # Timings are recorded by the controller, which gets the reports of all the workers
+    is_controller = not os.getenv("PYTEST_XDIST_WORKER")
+    if is_controller:
+        durations.record_duration(report)
+        worker = report.node.gateway.id if hasattr(report, "node") else None
+        timing_store.record_phase(report, worker=worker)
     if test_nodeid not in test_results:
         test_results[test_nodeid] = {}
 
     test_results[test_nodeid][report.when] = report.outcome
+    if report.when == "call":
+        test_call_durations[test_nodeid] = report.duration
 
+    # Wait for the teardown so that teardown failures are part of the result
     if (
-        "setup" in test_results[test_nodeid]
+        report.when == "teardown"
+        and "setup" in test_results[test_nodeid]
         and "call" in test_results[test_nodeid]
         and not os.getenv("RUNNING_LOCAL")
     ):
@@ -210,7 +317,9 @@ def pytest_runtest_logreport(report):
             "test_suite": test_nodeid.split("::")[1],
             "test_case": test_nodeid.split("::")[-1],
             "result": final_test_result,
-            "duration": str(timedelta(seconds=report.duration)),
+            "duration": str(
+                timedelta(seconds=test_call_durations.pop(test_nodeid))
+            ),
         }
         # Collect test suite failures for re-run
         if (
@@ -218,18 +327,21 @@ def pytest_runtest_logreport(report):
             and test_nodeid.split("::")[1] not in failed_test_suites
         ):
             failed_test_suites.append(test_nodeid.split("::")[1])
-        # Add data to the queue
-        try:
-            sqs = boto3.client("sqs")
-            queue_url = (
-                "https://sqs.us-east-1.amazonaws.com/707767160287/ci-metrics-sqs"
-            )
-            response = sqs.send_message(
-                QueueUrl=queue_url, MessageBody=json.dumps(message)
-            )
-            logger.info(f"[SQS MESSAGE SENT] MessageId: {response['MessageId']}")
-        except Exception as e:
-            logger.error(f"[SQS SEND ERROR] {e}")
+        # Store the message and hand it to the background shipper
+        if is_controller:
+            key = timing_store.add_message(CI_METRICS_QUEUE_URL, message)
+            metrics_shipper.submit(key, message)
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_protocol(item, nextitem):
+    # The leases are held from the setup of the first test using them to the teardown of
+    # the last one, class and module fixtures included
+    lease_manager.acquire(get_scope_leases(item), holder=item.nodeid)
+    try:
+        yield
+    finally:
+        lease_manager.keep_only(get_scope_leases(nextitem))
 
 
 @pytest.hookimpl(hookwrapper=True)
@@ -258,11 +370,32 @@ def pytest_unconfigure(config):
     # Skip running code if --collect-only is passed
     if config.option.collectonly:
         return
+    logger.info(f"Access token cache stats: {token_cache.stats}")
+    log_connection_stats()
+    log_poll_stats()
+    close_es_clients()
+    lease_manager.release()
+    port_forwards.stop_all()
     if not hasattr(config, "workerinput"):
         directory_path = TEST_DATA_PATH_OBJECT / "fence_clients"
         if os.path.exists(directory_path):
             shutil.rmtree(directory_path)
-        if requires_fence_client_marker_present:
+        shutil.rmtree(TOKEN_CACHE_PATH_OBJECT, ignore_errors=True)
+        shutil.rmtree(ONE_WORKER_ONLY_PATH_OBJECT, ignore_errors=True)
+        shutil.rmtree(LEASES_PATH_OBJECT, ignore_errors=True)
+        shutil.rmtree(SESSION_CACHE_PATH_OBJECT, ignore_errors=True)
+        durations.save_durations(config)
+        metrics_shipper.flush()
+        if not os.getenv("RUNNING_LOCAL"):
+            # Send what is left over from failed sends and from previous runs
+            timing_store.export_pending(CI_METRICS_QUEUE_URL, metrics_shipper.send)
+        metrics_shipper.close()
+        timing_store.close()
+        # the fence clients are reused by the next sessions, see FenceClientPool
+        if (
+            requires_fence_client_marker_present
+            and os.getenv("DELETE_FENCE_CLIENTS", "false").lower() == "true"
+        ):
             setup.delete_all_fence_clients()
         if not os.getenv("RERUNNING_TESTS") == "true" and not os.getenv(
             "RUNNING_LOCAL"
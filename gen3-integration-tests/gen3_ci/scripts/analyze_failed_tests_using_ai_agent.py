@@ -1,14 +1,13 @@
 import json
 import os
 import re
-import socket
 import subprocess
-import time
 from pathlib import Path
 
 import requests
 from dotenv import load_dotenv
 from utils import logger
+from utils.port_forward import port_forwards
 
 load_dotenv()
 
@@ -58,34 +57,9 @@ def setup_ollama_helm_chart():
         )
 
 
-def wait_for_port(host="localhost", port=11434, timeout=60):
-    start = time.time()
-    while time.time() - start < timeout:
-        try:
-            with socket.create_connection((host, port), timeout=2):
-                return True
-        except OSError:
-            time.sleep(1)
-    raise TimeoutError("Port-forward did not become ready")
-
-
-def setup_port_forwarding():
-    cmd = [
-        "kubectl",
-        "port-forward",
-        "svc/ollama",
-        "11434:11434",
-        "-n",
-        os.getenv("NAMESPACE"),
-    ]
-
-    process = subprocess.Popen(
-        cmd,
-        stdout=subprocess.DEVNULL,
-        stderr=subprocess.STDOUT,
-    )
-    wait_for_port("localhost", 11434, timeout=60)
-    return process
+def get_ollama_url():
+    """Local url of the ollama service, (re)starting the port-forward if needed"""
+    return port_forwards.get(os.getenv("NAMESPACE"), "svc/ollama", 11434).url
 
 
 def uninstall_ollama_helm_chart():
@@ -110,7 +84,7 @@ def uninstall_ollama_helm_chart():
 
 
 def validate_ollama_model():
-    response = requests.get("http://localhost:11434/api/tags")
+    response = requests.get(f"{get_ollama_url()}/api/tags")
     logger.info(response.json())
     return response.json()
 
@@ -151,7 +125,7 @@ def analyze_env_setup_failure() -> str:
     ]
     payload = {"model": "gemma4:e4b", "messages": messages, "temperature": 0}
     headers = {"Content-Type": "application/json"}
-    url = "http://localhost:11434/v1/chat/completions"
+    url = f"{get_ollama_url()}/v1/chat/completions"
     response = requests.post(url, json=payload, headers=headers)
     if response.status_code != 200:
         logger.info(f"API call failed. Response: {response.text}")
@@ -207,7 +181,7 @@ def analyze_failed_tests() -> str:
         ]
         payload = {"model": "gemma4:e4b", "messages": messages, "temperature": 0}
         headers = {"Content-Type": "application/json"}
-        url = "http://localhost:11434/v1/chat/completions"
+        url = f"{get_ollama_url()}/v1/chat/completions"
         response = requests.post(url, json=payload, headers=headers)
         if response.status_code != 200:
             logger.info(f"API call failed. Response: {response.text}")
@@ -259,10 +233,8 @@ def generate_slack_report():
 
 
 if __name__ == "__main__":
-    process = None
     try:
         setup_ollama_helm_chart()
-        process = setup_port_forwarding()
         assert "gemma4:e4b" in str(validate_ollama_model())
         response = run_test_failure_analysis()
         with open("logs/failure_analysis.txt", "w") as f:
@@ -271,7 +243,5 @@ if __name__ == "__main__":
     except Exception as e:
         logger.info(f"Failed to run inference: {e}")
     finally:
-        if process and process.poll() is None:
-            process.terminate()
-            process.wait()
+        port_forwards.stop_all()
     uninstall_ollama_helm_chart()
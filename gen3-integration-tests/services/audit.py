@@ -4,9 +4,9 @@ import time
 from json import JSONDecodeError
 
 import pytest
-from gen3.auth import Gen3Auth
 from utils import logger
 from utils.misc import retry
+from utils.token_cache import get_auth
 
 
 class Audit(object):
@@ -21,7 +21,7 @@ class Audit(object):
             "start={}".format(timestamp),
             "username={}".format(pytest.users[user]),
         ]
-        auth = Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=pytest.root_url)
+        auth = get_auth(user, endpoint=pytest.root_url)
         url = self.AUDIT_LOG_ENDPOINT + "/" + log_category
         url = url + "?" + "&".join(params)
         response = auth.curl(path=url)
@@ -35,7 +35,7 @@ class Audit(object):
         url = self.AUDIT_LOG_ENDPOINT + "/" + log_category
         url = url + "?" + "&".join(params)
         counter = 0
-        auth = Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=pytest.root_url)
+        auth = get_auth(user, endpoint=pytest.root_url)
 
         while counter < 40:
             time.sleep(30)
@@ -1,8 +1,8 @@
 import pytest
-import requests
-from gen3.auth import Gen3Auth
 from gen3.submission import Gen3Submission
 from utils import TEST_DATA_PATH_OBJECT, logger
+from utils.http_session import get_session
+from utils.token_cache import get_auth
 
 
 class Dicom(object):
@@ -16,7 +16,7 @@ class Dicom(object):
             self.DICOM_STUDIES = "/dicom-server/studies"
 
     def submit_dicom_file(self, user="main_account", expected_status=200):
-        auth = Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=self.BASE_URL)
+        auth = get_auth(user, endpoint=self.BASE_URL)
         access_token = auth.get_access_token()
         url = self.BASE_URL + self.DICOM_INSTANCES
         with (TEST_DATA_PATH_OBJECT / "dicom/test_file.dcm").open("rb") as file:
@@ -25,7 +25,7 @@ class Dicom(object):
             "Content-Type": "application/dicom",
             "Authorization": f"bearer {access_token}",
         }
-        response = requests.post(url=url, data=content, headers=headers)
+        response = get_session().post(url=url, data=content, headers=headers)
         assert (
             response.status_code == expected_status
         ), f"Expected status {expected_status} but got {response.status_code}"
@@ -34,7 +34,7 @@ class Dicom(object):
             return response.json()
 
     def get_studies(self, study_instance, user="main_account"):
-        auth = Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=self.BASE_URL)
+        auth = get_auth(user, endpoint=self.BASE_URL)
         url = self.DICOM_STUDIES + "/" + study_instance
         response = auth.curl(path=url)
         assert (
@@ -43,7 +43,7 @@ class Dicom(object):
         return response.json()
 
     def get_dicom_file(self, dicom_file_id, user="main_account", expected_status=200):
-        auth = Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=self.BASE_URL)
+        auth = get_auth(user, endpoint=self.BASE_URL)
         url = self.DICOM_INSTANCES + "/" + dicom_file_id
         response = auth.curl(path=url)
         assert (
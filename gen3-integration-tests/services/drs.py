@@ -14,6 +14,8 @@ from gen3.tools.download.drs_download import (
     list_drs_object,
 )
 from utils import TEST_DATA_PATH_OBJECT, logger
+from utils.http_session import get_session
+from utils.token_cache import get_auth
 
 
 class Drs(object):
@@ -23,7 +25,7 @@ class Drs(object):
         self.SERVICE_INFO_ENDPOINT = "/ga4gh/drs/v1/service-info"
 
     def _auth(self, user: str = "main_account") -> Gen3Auth:
-        return Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=self.BASE_URL)
+        return get_auth(user, endpoint=self.BASE_URL)
 
     @staticmethod
     def _extract_id(file: dict) -> str | None:
@@ -41,7 +43,7 @@ class Drs(object):
 
     def get_drs_object_using_gen3sdk(self, file: dict, user="main_account"):
         """Get Drs object"""
-        auth = Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=self.BASE_URL)
+        auth = get_auth(user, endpoint=self.BASE_URL)
         id = file.get("did") or file.get("id")
         response = list_drs_object(
             hostname=pytest.hostname,
@@ -77,7 +79,7 @@ class Drs(object):
 
     def get_drs_download(self, file, user="main_account"):
         """Get Drs signed url"""
-        auth = Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=self.BASE_URL)
+        auth = get_auth(user, endpoint=self.BASE_URL)
         path = TEST_DATA_PATH_OBJECT / "drs_download"
         if os.path.exists(path):
             shutil.rmtree(path)
@@ -110,7 +112,7 @@ class Drs(object):
         auth = self._auth(user)
         id = self._extract_id(file)
         url = f"{self.BASE_URL}{self.DRS_ENDPOINT}/{id}"
-        response = requests.options(url, auth=auth)
+        response = get_session().options(url, auth=auth)
         return response
 
     def get_bulk_object_authorizations(
@@ -119,7 +121,7 @@ class Drs(object):
         """Get bulk authorization info (OPTIONS /objects)"""
         auth = self._auth(user)
         url = f"{self.BASE_URL}{self.DRS_ENDPOINT}"
-        response = requests.options(
+        response = get_session().options(
             url, json={"bulk_object_ids": object_ids}, auth=auth
         )
         return response
@@ -130,7 +132,7 @@ class Drs(object):
         """Get multiple DRS objects (POST /objects)"""
         auth = self._auth(user)
         body = json.dumps({"bulk_object_ids": object_ids})
-        response = requests.post(
+        response = get_session().post(
             url=f"{self.BASE_URL}{self.DRS_ENDPOINT}",
             data=body,
             auth=auth,
@@ -146,7 +148,7 @@ class Drs(object):
         """Get bulk presigned URLs (POST /objects/access)"""
         auth = self._auth(user)
         body = json.dumps({"bulk_object_access_ids": bulk_access_ids})
-        response = requests.post(
+        response = get_session().post(
             url=f"{self.BASE_URL}{self.DRS_ENDPOINT}/access",
             data=body,
             auth=auth,
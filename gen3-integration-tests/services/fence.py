@@ -5,15 +5,16 @@ import re
 from contextlib import redirect_stdout
 
 import pytest
-import requests
-from gen3.auth import Gen3Auth, Gen3AuthError
+from gen3.auth import Gen3AuthError
 from gen3.file import Gen3File
 from pages.login import LoginPage
 from pages.user_register import UserRegister
 from playwright.sync_api import Page
 from utils import logger
-from utils.misc import retry
+from utils.http_session import get_session
+from utils.misc import poll, retry
 from utils.test_execution import screenshot
+from utils.token_cache import get_auth
 
 
 class Fence(object):
@@ -56,9 +57,7 @@ class Fence(object):
         if protocol:
             url = f"{url}?protocol={protocol}"
         if user:
-            auth = Gen3Auth(
-                refresh_token=pytest.api_keys[user], endpoint=pytest.root_url
-            )
+            auth = get_auth(user, endpoint=pytest.root_url)
             gen3file = Gen3File(auth_provider=auth)
             stdout_buffer = io.StringIO()
             try:
@@ -69,7 +68,7 @@ class Fence(object):
                 response = stdout_buffer.getvalue()
                 status_code = int(re.search(r"\b\d{3}\b", str(e)).group())
         elif access_token:
-            response = requests.get(
+            response = get_session().get(
                 self.BASE_URL + url,
                 headers={
                     "Content-Type": "application/json",
@@ -80,7 +79,7 @@ class Fence(object):
             response = response.content.decode()
         else:
             # Perform GET requests without authorization code
-            response = requests.get(self.BASE_URL + url, auth={})
+            response = get_session().get(self.BASE_URL + url, auth={})
             status_code = response.status_code
             response = response.content.decode()
         logger.info(f"Status code: {status_code} - {response}")
@@ -101,14 +100,14 @@ class Fence(object):
         payload = {"guids": guids}
 
         if user:
-            auth = Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=self.BASE_URL)
-            response = requests.post(
+            auth = get_auth(user, endpoint=self.BASE_URL)
+            response = get_session().post(
                 self.BASE_URL + url,
                 json=payload,
                 auth=auth,
             )
         elif access_token:
-            response = requests.post(
+            response = get_session().post(
                 self.BASE_URL + url,
                 json=payload,
                 headers={
@@ -117,7 +116,7 @@ class Fence(object):
                 },
             )
         else:
-            response = requests.post(
+            response = get_session().post(
                 self.BASE_URL + url,
                 json=payload,
             )
@@ -134,11 +133,11 @@ class Fence(object):
 
     def get_url_for_data_upload(self, file_name: str, user: str) -> dict:
         """Generate the url for uploading the data"""
-        auth = Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=self.BASE_URL)
+        auth = get_auth(user, endpoint=self.BASE_URL)
         headers = {
             "Content-Type": "application/json",
         }
-        response = requests.post(
+        response = get_session().post(
             url=f"{self.BASE_URL}{self.DATA_UPLOAD_ENDPOINT}",
             data=json.dumps({"file_name": file_name}),
             auth=auth,
@@ -147,14 +146,14 @@ class Fence(object):
         return response
 
     def get_url_for_data_upload_for_existing_file(self, guid: str, user: str) -> dict:
-        auth = Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=self.BASE_URL)
+        auth = get_auth(user, endpoint=self.BASE_URL)
         response = auth.curl(path=f"{self.DATA_UPLOAD_ENDPOINT}/{guid}")
         return response
 
     @retry(times=6, delay=20, exceptions=(AssertionError,))
     def get_file(self, url: str) -> str:
         """Gets the file content from the presigned url"""
-        response = requests.get(url=url)
+        response = get_session().get(url=url)
         assert (
             response.status_code == 200
         ), f"Expected response was 200 but got {response.status_code}"
@@ -170,7 +169,7 @@ class Fence(object):
 
     def delete_file(self, guid: str, user: str) -> int:
         """Deletes the file based on guid"""
-        auth = Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=pytest.root_url)
+        auth = get_auth(user, endpoint=pytest.root_url)
         gen3file = Gen3File(auth_provider=auth)
         response = gen3file.delete_file_locations(guid)
         return response.status_code
@@ -180,7 +179,7 @@ class Fence(object):
     ):
         """Get user info"""
         if access_token:
-            user_info_response = requests.get(
+            user_info_response = get_session().get(
                 f"{self.BASE_URL}{self.USER_ENDPOINT}",
                 headers={
                     "Content-Type": "application/json",
@@ -188,7 +187,7 @@ class Fence(object):
                 },
             )
         else:
-            auth = Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=self.BASE_URL)
+            auth = get_auth(user, endpoint=self.BASE_URL)
             access_token = auth.get_access_token()
             user_info_response = auth.curl(path=f"{self.USER_ENDPOINT}")
         assert (
@@ -278,7 +277,7 @@ class Fence(object):
             "Content-Type": "application/json",
             "Authorization": f"Basic {auth}",
         }
-        response = requests.post(url=url, data=json.dumps(data), headers=headers)
+        response = get_session().post(url=url, data=json.dumps(data), headers=headers)
         return response
 
     def assert_token_response(
@@ -329,11 +328,11 @@ class Fence(object):
         return page.url
 
     def initialize_multipart_upload(self, file_name, user):
-        auth = Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=self.BASE_URL)
+        auth = get_auth(user, endpoint=self.BASE_URL)
         headers = {
             "Content-Type": "application/json",
         }
-        response = requests.post(
+        response = get_session().post(
             url=f"{self.BASE_URL}{self.MULTIPART_UPLOAD_INIT_ENDPOINT}",
             data=json.dumps({"file_name": file_name}),
             auth=auth,
@@ -345,11 +344,11 @@ class Fence(object):
         return response.json()
 
     def get_url_for_multipart_upload(self, key, upload_id, part_number, user):
-        auth = Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=self.BASE_URL)
+        auth = get_auth(user, endpoint=self.BASE_URL)
         headers = {
             "Content-Type": "application/json",
         }
-        response = requests.post(
+        response = get_session().post(
             url=f"{self.BASE_URL}{self.MULTIPART_UPLOAD_ENDPOINT}",
             data=json.dumps(
                 {"key": key, "uploadId": upload_id, "partNumber": part_number}
@@ -366,8 +365,8 @@ class Fence(object):
         headers = {
             "Content-Type": "application/json",
         }
-        auth = Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=self.BASE_URL)
-        response = requests.post(
+        auth = get_auth(user, endpoint=self.BASE_URL)
+        response = get_session().post(
             url=f"{self.BASE_URL}{self.MULTIPART_UPLOAD_COMPLETE_ENDPOINT}",
             data=json.dumps({"key": key, "uploadId": upload_id, "parts": parts}),
             auth=auth,
@@ -378,9 +377,9 @@ class Fence(object):
     def upload_file_using_presigned_url(self, presigned_url, file_data, file_size):
         headers = {"Content-Length": str(file_size)}
         if isinstance(file_data, dict):
-            response = requests.put(url=presigned_url, data=file_data, headers=headers)
+            response = get_session().put(url=presigned_url, data=file_data, headers=headers)
         else:
-            response = requests.put(
+            response = get_session().put(
                 url=presigned_url, data=open(file_data, "rb"), headers=headers
             )
         assert (
@@ -388,13 +387,13 @@ class Fence(object):
         ), f"Upload to S3 didn't happen properly. Status code : {response.status_code}"
 
     def upload_data_using_presigned_url(self, presigned_url, file_data):
-        response = requests.put(url=presigned_url, data=file_data)
+        response = get_session().put(url=presigned_url, data=file_data)
         assert (
             response.status_code == 200
         ), f"Upload to S3 didn't happen properly. Status code : {response.status_code}"
         return response.headers["ETag"].strip('"')
 
-    @retry(times=10, delay=30, exceptions=(AssertionError))
+    @poll(timeout=300, exceptions=(AssertionError,))
     def wait_upload_file_updated_from_indexd_listener(self, indexd, file_node):
         logger.info(f"Waiting for uploaded file '{file_node.did}' to be updated")
         response = indexd.get_record(file_node.did)
@@ -416,7 +415,7 @@ class Fence(object):
             "Content-Type": "application/json",
             "Authorization": f"bearer {token}",
         }
-        res = requests.post(
+        res = get_session().post(
             url=f"{self.BASE_URL}{self.API_CREDENTIALS_ENDPOINT}/",
             json=data,
             headers=headers,
@@ -430,7 +429,7 @@ class Fence(object):
             "Content-Type": "application/json",
             "Authorization": f"bearer {token}",
         }
-        res = requests.delete(
+        res = get_session().delete(
             url=f"{self.BASE_URL}{self.API_CREDENTIALS_ENDPOINT}/{api_key}",
             headers=headers,
         )
@@ -441,7 +440,7 @@ class Fence(object):
 
     def get_version(self, user="main_account"):
         """Get fence version"""
-        auth = Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=self.BASE_URL)
+        auth = get_auth(user, endpoint=self.BASE_URL)
         response = auth.curl(path=f"{self.VERSION_ENDPOINT}")
         assert (
             response.status_code == 200
@@ -459,7 +458,7 @@ class Fence(object):
             "Content-Type": "application/json",
             "Authorization": f"bearer {token}",
         }
-        response = requests.get(
+        response = get_session().get(
             f"{self.BASE_URL}{self.GOOGLE_SA_KEYS_ENDPOINT}", headers=headers
         )
         return response.json()["access_keys"], token
@@ -473,7 +472,7 @@ class Fence(object):
         }
         for key_item in list_sa_keys:
             sa_key = key_item["name"].split("/")[-1]
-            delete_resp = requests.delete(
+            delete_resp = get_session().delete(
                 f"{self.BASE_URL}/{self.GOOGLE_SA_KEYS_ENDPOINT}/{sa_key}",
                 headers=headers,
             )
@@ -484,7 +483,7 @@ class Fence(object):
     def verify_authorized_username(self, verify_username, user="main_account"):
         """verifies a username using fence admin endpoint"""
         logger.info(f"Verifying {verify_username} is authorized")
-        auth = Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=self.BASE_URL)
+        auth = get_auth(user, endpoint=self.BASE_URL)
         response = auth.curl(
             path=f"{self.ADMIN_FENCE_ENDPOINT}/{pytest.users[verify_username]}"
         )
@@ -493,12 +492,12 @@ class Fence(object):
     def create_user(self, username, user="main_account"):
         """creates a username using fence admin endpoint"""
         logger.info(f"Creating {username}")
-        auth = Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=self.BASE_URL)
+        auth = get_auth(user, endpoint=self.BASE_URL)
         headers = {
             "Content-Type": "application/json",
         }
         data = {"username": pytest.users[username], "email": pytest.users[username]}
-        response = requests.post(
+        response = get_session().post(
             url=f"{self.BASE_URL}{self.ADMIN_FENCE_ENDPOINT}",
             data=json.dumps(data),
             auth=auth,
@@ -509,17 +508,17 @@ class Fence(object):
     def deactivate_user(self, username, user="main_account"):
         """deactivates a username using fence admin endpoint"""
         logger.info(f"Deactivating {username}")
-        auth = Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=self.BASE_URL)
+        auth = get_auth(user, endpoint=self.BASE_URL)
         url = (
             f"{self.BASE_URL}{self.ADMIN_FENCE_ENDPOINT}/{pytest.users[username]}/soft"
         )
-        response = requests.delete(url=url, auth=auth)
+        response = get_session().delete(url=url, auth=auth)
         return response
 
     def reactivate_fence_user(self, username, user="main_account"):
         """activates a username using fence admin endpoint"""
         logger.info(f"Reactivaing {username}")
-        auth = Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=self.BASE_URL)
+        auth = get_auth(user, endpoint=self.BASE_URL)
         url = f"{self.BASE_URL}{self.ADMIN_FENCE_ENDPOINT}/{pytest.users[username]}/reactivate"
-        response = requests.post(url=url, auth=auth)
+        response = get_session().post(url=url, auth=auth)
         return response
@@ -1,6 +1,5 @@
 import json
 import os
-import subprocess
 import time
 from dataclasses import dataclass
 from pathlib import Path
@@ -11,14 +10,15 @@ import boto3
 import botocore.exceptions
 import nextflow
 import pytest
-import requests
 from botocore.config import Config
 from gen3.auth import (
-    Gen3Auth,
     endpoint_from_token,
     remove_trailing_whitespace_and_slashes_in_url,
 )
 from utils import logger
+from utils.http_session import get_session
+from utils.k8s import get_job_condition, get_kube_gateway
+from utils.token_cache import get_auth
 
 
 @dataclass(frozen=True)
@@ -62,82 +62,58 @@ class WorkflowStorageConfig:
 
 
 def _print_tes_apps_logs(describe_task_pods=False, with_arborist=False):
+    kube = get_kube_gateway(pytest.namespace)
     apps = ["gen3-workflow", "funnel"]
     if with_arborist:
         apps.append("arborist")
     for app in apps:
         logger.info(f"********** {app} logs begin **********")
-        cmd = [
-            "kubectl",
-            "-n",
-            pytest.namespace,
-            "logs",
-            "-l",
-            f"app={app}",
-            "--all-containers",
-            "--tail",
-            "10" if app == "arborist" else "150",
-        ]
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        if result.returncode == 0:
-            logger.info(result.stdout.decode("utf-8"))
-        else:
+        try:
             logger.info(
-                f"Unable to get {app} logs: code {result.returncode}. Stderr: {result.stderr.decode('utf-8')}"
+                kube.get_logs(f"app={app}", tail=10 if app == "arborist" else 150)
             )
+        except Exception as e:
+            logger.info(f"Unable to get {app} logs: {e}")
         logger.info(f"********** {app} logs end **********")
 
     if describe_task_pods:
-        # list the jobs in the JobsNamespace
-        cmd = [
-            "kubectl",
-            "-n",
-            f"workflow-pods-{pytest.namespace}",
-            "get",
-            "jobs",
-        ]
-        logger.info(f"********** {" ".join(cmd)} **********")
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        if result.returncode == 0:
-            logger.info(result.stdout.decode("utf-8"))
-        else:
-            logger.info(
-                f"{" ".join(cmd)} failed: code {result.returncode}. Stderr: {result.stderr.decode('utf-8')}"
-            )
-
-        # list the pods in the JobsNamespace
-        cmd = [
-            "kubectl",
-            "-n",
-            f"workflow-pods-{pytest.namespace}",
-            "get",
-            "pods",
-        ]
-        logger.info(f"********** {" ".join(cmd)} **********")
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        if result.returncode == 0:
-            logger.info(result.stdout.decode("utf-8"))
-        else:
-            logger.info(
-                f"{" ".join(cmd)} failed: code {result.returncode}. Stderr: {result.stderr.decode('utf-8')}"
-            )
+        jobs_namespace = f"workflow-pods-{pytest.namespace}"
+        try:
+            # list the jobs in the JobsNamespace
+            logger.info(f"********** jobs in {jobs_namespace} **********")
+            for job in kube.list("jobs", namespace=jobs_namespace):
+                status = job.get("status", {})
+                logger.info(
+                    f"{job['metadata']['name']}: active={status.get('active', 0)} "
+                    f"succeeded={status.get('succeeded', 0)} failed={status.get('failed', 0)} "
+                    f"condition={get_job_condition(job)}"
+                )
 
-        # describe all the pods in the JobsNamespace
-        cmd = [
-            "kubectl",
-            "-n",
-            f"workflow-pods-{pytest.namespace}",
-            "describe",
-            "pod",
-        ]
-        logger.info(f"********** {" ".join(cmd)} **********")
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        if result.returncode == 0:
-            logger.info(result.stdout.decode("utf-8"))
-        else:
-            logger.info(
-                f"Unable to get {app} logs: code {result.returncode}. Stderr: {result.stderr.decode('utf-8')}"
-            )
+            # describe all the pods in the JobsNamespace
+            logger.info(f"********** pods in {jobs_namespace} **********")
+            for pod in kube.list_pods(namespace=jobs_namespace):
+                pod_name = pod["metadata"]["name"]
+                events = kube.list(
+                    "events",
+                    field_selector=f"involvedObject.name={pod_name}",
+                    namespace=jobs_namespace,
+                )
+                logger.info(
+                    json.dumps(
+                        {
+                            "name": pod_name,
+                            "labels": pod["metadata"].get("labels"),
+                            "status": pod.get("status"),
+                            "events": [
+                                f"{event.get('type')} {event.get('reason')}: {event.get('message')}"
+                                for event in events
+                            ],
+                        },
+                        indent=2,
+                    )
+                )
+        except Exception as e:
+            logger.info(f"Unable to describe the pods of {jobs_namespace}: {e}")
 
 
 class Gen3Workflow:
@@ -160,7 +136,7 @@ class Gen3Workflow:
         if not user:
             return None
 
-        auth = Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=self.BASE_URL)
+        auth = get_auth(user, endpoint=self.BASE_URL)
 
         # When running the tests in a Kind cluster:
         # - Fence's `BASE_URL` is set to `http://fence-service.<namespace>.svc.cluster.local`, so
@@ -354,7 +330,7 @@ class Gen3Workflow:
             else {}
         )
 
-        response = requests.get(url=storage_url, headers=headers)
+        response = get_session().get(url=storage_url, headers=headers)
         if response.status_code != expected_status:
             _print_tes_apps_logs(with_arborist=response.status_code == 403)
         assert (
@@ -396,7 +372,7 @@ class Gen3Workflow:
             if user
             else {}
         )
-        response = requests.delete(url=cleanup_url, headers=headers)
+        response = get_session().delete(url=cleanup_url, headers=headers)
 
         # If ignore_missing is True, we allow 404 as a valid response status
         allowed_statuses = (
@@ -419,7 +395,7 @@ class Gen3Workflow:
         access_token = self._get_access_token(user)
         s3_url = f"{self.S3_ENDPOINT_URL}/{object_path}"
         headers = {"Authorization": f"bearer {access_token}"}
-        response = requests.get(url=s3_url, headers=headers)
+        response = get_session().get(url=s3_url, headers=headers)
         assert (
             response.status_code == expected_status
         ), f"Expected {expected_status}, got {response.status_code} when attempting to make an unsigned GET request to {s3_url}: {response.text}"
@@ -510,7 +486,7 @@ class Gen3Workflow:
         access_token = self._get_access_token(user)
         tes_task_url = f"{self.TES_URL}/tasks"
         headers = {"Authorization": f"bearer {access_token}"} if user else {}
-        response = requests.post(
+        response = get_session().post(
             url=tes_task_url,
             headers=headers,
             json=request_body,
@@ -528,7 +504,7 @@ class Gen3Workflow:
         """
         access_token = self._get_access_token(user)
         tes_task_url = f"{self.TES_URL}/tasks"
-        response = requests.get(
+        response = get_session().get(
             url=tes_task_url,
             headers={"Authorization": f"bearer {access_token}"} if user else {},
         )
@@ -548,7 +524,7 @@ class Gen3Workflow:
         access_token = self._get_access_token(user)
         tes_task_url = f"{self.TES_URL}/tasks/{task_id}?view=FULL"
 
-        response = requests.get(
+        response = get_session().get(
             url=tes_task_url,
             headers={"Authorization": f"bearer {access_token}"} if user else {},
         )
@@ -568,7 +544,7 @@ class Gen3Workflow:
         access_token = self._get_access_token(user)
         tes_task_url = f"{self.TES_URL}/tasks/{task_id}:cancel"
 
-        response = requests.post(
+        response = get_session().post(
             url=tes_task_url,
             headers={"Authorization": f"bearer {access_token}"} if user else {},
         )
@@ -18,7 +18,9 @@ from gen3.auth import Gen3Auth
 from gen3.submission import Gen3Submission
 from packaging.version import Version
 from utils import TEST_DATA_PATH_OBJECT, logger
+from utils.http_session import get_session
 from utils.misc import retry
+from utils.token_cache import get_auth
 
 
 class GraphRecord:
@@ -327,7 +329,7 @@ class GraphDataTools:
         Args:
             unique_id: sheepdog record id
         """
-        response = requests.get(
+        response = get_session().get(
             url=pytest.root_url
             + self.BASE_URL
             + "{}/{}/export?ids={}&format=json".format(
@@ -525,7 +527,7 @@ class GraphDataTools:
         min_monthly_release = "2023.04.0"
         monthly_release_cutoff = "2020"
 
-        auth = Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=pytest.root_url)
+        auth = get_auth(user, endpoint=pytest.root_url)
         response = auth.curl(path=self.GRAPHQL_VERSION_ENDPOINT)
         assert response.status_code == 200, response.text
         peregrine_version = response.json()["version"]
@@ -551,7 +553,7 @@ class GraphDataTools:
             "Authorization": authorization,
             "Accept": format,
         }
-        response = requests.get(url=url + file.indexd_guid, headers=headers)
+        response = get_session().get(url=url + file.indexd_guid, headers=headers)
         assert response.status_code == expected_status, f"{response}"
         return response
 
@@ -1,31 +1,44 @@
 import os
 
 import pytest
-import requests
-from gen3.auth import Gen3Auth
 from utils import TEST_DATA_PATH_OBJECT, logger
-from utils.misc import retry
+from utils.http_session import get_session
+from utils.index_sets import IndexSet
+from utils.misc import poll
+from utils.token_cache import get_auth
 
 
 class Guppy(object):
-    def __init__(self):
+    def __init__(self, index_set=None):
+        """
+        index_set - the IndexSet (see utils.index_sets) queried, the "ci" indices served by
+            the environment's guppy by default
+        """
         self.BASE_ENDPOINT = "/guppy"
+        self.index_set = index_set or IndexSet(pytest.namespace)
 
-    @retry(times=3, delay=30, exceptions=(Exception))
+    def _url(self, path):
+        if self.index_set.guppy_url:
+            return self.index_set.guppy_url + path
+        return pytest.root_url + self.BASE_ENDPOINT + path
+
+    @poll(timeout=90, exceptions=(Exception,))
     def validate_guppy_status(self, user, expected_status):
         """
         Validate the status of Guppy
         user - pick one from conftest.py - main_account / indexing_account / dummy_one /
             smarty_two / user0_account
         """
-        auth = Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=pytest.root_url)
-        url = self.BASE_ENDPOINT + "/_status"
-        response = auth.curl(path=url)
+        auth = get_auth(user, endpoint=pytest.root_url)
+        response = get_session().get(
+            url=self._url("/_status"),
+            headers={"Authorization": "bearer {}".format(auth.get_access_token())},
+        )
         logger.info("Guppy status code : " + str(response.status_code))
         assert expected_status == response.status_code, f"Got status {expected_status}"
         data = response.json()
-        subject_indices_name = "ci_subject_1"
-        file_indices_name = "ci_file_1"
+        subject_indices_name = self.index_set.index("subject")
+        file_indices_name = self.index_set.index("file")
         assert (
             subject_indices_name in data["indices"]
         ), f"{subject_indices_name} not found in {data['indices']}"
@@ -56,14 +69,13 @@ class Guppy(object):
         )
         queryToSubmit = "".join(queryFile.split("\n"))
         logger.info(queryToSubmit)
-        auth = Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=pytest.root_url)
-        url = self.BASE_ENDPOINT + endpoint
+        auth = get_auth(user, endpoint=pytest.root_url)
         headers = {
             "Content-Type": "application/json",
             "Authorization": "bearer {}".format(auth.get_access_token()),
         }
-        response = requests.post(
-            url=pytest.root_url + url, data=queryToSubmit, headers=headers
+        response = get_session().post(
+            url=self._url(endpoint), data=queryToSubmit, headers=headers
         )
         logger.info(f"Status code: {response.status_code}")
         assert expected_status == response.status_code
@@ -1,41 +1,74 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
 from uuid import uuid4
 
 import pytest
-import requests
 from gen3.auth import Gen3Auth
 from gen3.index import Gen3Index
 from utils import logger
+from utils.http_session import get_session
+from utils.token_cache import get_auth
+
+# Maximum number of concurrent indexd requests made by the bulk methods
+INDEXD_BULK_MAX_WORKERS = int(os.getenv("INDEXD_BULK_MAX_WORKERS", "8"))
 
 
 class Indexd(object):
     def __init__(self):
         self.BASE_URL = f"{pytest.root_url}/index/index"
 
-    def create_records(self, records: dict, user="indexing_account", access_token=None):
-        """Create new indexd record"""
+    def _get_index(self, user="indexing_account", access_token=None):
         if access_token:
             auth = Gen3Auth(access_token=access_token)
         else:
-            auth = Gen3Auth(refresh_token=pytest.api_keys[user])
-        index = Gen3Index(auth_provider=auth)
-        indexed_files = []
-        # Create record for each file
-        for record_data in records.values():
+            auth = get_auth(user)
+        return Gen3Index(auth_provider=auth)
+
+    def bulk_create_records(
+        self,
+        records: dict,
+        user="indexing_account",
+        access_token=None,
+        max_workers=INDEXD_BULK_MAX_WORKERS,
+    ) -> dict:
+        """
+        Create indexd records concurrently with one shared auth.
+        Returns {record key: {"success": bool, "record": dict, "error": str}}
+        in the same order as `records`.
+        """
+        index = self._get_index(user=user, access_token=access_token)
+
+        def create_record(record_data):
             record_data.setdefault("did", str(uuid4()))
             try:
-                record = index.create_record(**record_data)
-                indexed_files.append(record)
+                return {"success": True, "record": index.create_record(**record_data)}
             except Exception as e:
                 logger.exception(msg=f"Failed indexd submission got exception {e}")
-        return indexed_files
+                return {"success": False, "error": str(e)}
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(create_record, records.values())
+            return dict(zip(records.keys(), results))
+
+    def create_records(self, records: dict, user="indexing_account", access_token=None):
+        """Create new indexd records. Raises if any of them couldn't be created."""
+        results = self.bulk_create_records(
+            records, user=user, access_token=access_token
+        )
+        errors = {
+            key: result["error"]
+            for key, result in results.items()
+            if not result["success"]
+        }
+        if errors:
+            raise Exception(
+                f"Failed to create {len(errors)} of {len(records)} indexd records: {errors}"
+            )
+        return [result["record"] for result in results.values()]
 
     def get_record(self, indexd_guid: str, user="indexing_account", access_token=None):
         """Get record from indexd"""
-        if access_token:
-            auth = Gen3Auth(access_token=access_token)
-        else:
-            auth = Gen3Auth(refresh_token=pytest.api_keys[user])
-        indexd = Gen3Index(auth_provider=auth)
+        indexd = self._get_index(user=user, access_token=access_token)
         try:
             record = indexd.get_record(guid=indexd_guid)
             logger.info(f"Indexd Record found {record}")
@@ -54,13 +87,13 @@ class Indexd(object):
     ):
         """Update indexd record"""
         if not access_token:
-            auth = Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=self.BASE_URL)
+            auth = get_auth(user, endpoint=self.BASE_URL)
             access_token = auth.get_access_token()
         headers = {
             "Authorization": f"bearer {access_token}",
             "Content-Type": "application/json",
         }
-        update_res = requests.put(
+        update_res = get_session().put(
             f"{self.BASE_URL}/{guid}?rev={rev}",
             json=data,
             headers=headers,
@@ -73,28 +106,44 @@ class Indexd(object):
     ):
         """Delete indexd record if upload is not happening through gen3-sdk"""
         if not access_token:
-            auth = Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=self.BASE_URL)
+            auth = get_auth(user, endpoint=self.BASE_URL)
             access_token = auth.get_access_token()
         headers = {
             "Authorization": f"bearer {access_token}",
             "Content-Type": "application/json",
         }
-        delete_resp = requests.delete(
+        delete_resp = get_session().delete(
             f"{self.BASE_URL}/{guid}?rev={rev}", headers=headers
         )
         return delete_resp.status_code
 
     # Use this if indexd record is created with the sdk client
-    def delete_records(self, guids: list, user="indexing_account"):
-        """Delete indexd records list via gen3-sdk"""
-        for guid in guids:
-            user = "indexing_account"
-            auth = Gen3Auth(refresh_token=pytest.api_keys[user])
-            index = Gen3Index(auth_provider=auth)
+    def bulk_delete_records(
+        self,
+        guids: list,
+        user="indexing_account",
+        max_workers=INDEXD_BULK_MAX_WORKERS,
+    ) -> dict:
+        """
+        Delete indexd records concurrently via gen3-sdk with one shared auth.
+        Returns {guid: {"success": bool, "error": str}}
+        """
+        index = self._get_index(user=user)
+
+        def delete_record(guid):
             try:
                 index.delete_record(guid=guid)
+                return {"success": True}
             except Exception as e:
                 logger.exception(msg=f"Failed to delete record with guid {guid} : {e}")
+                return {"success": False, "error": str(e)}
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return dict(zip(guids, executor.map(delete_record, guids)))
+
+    def delete_records(self, guids: list, user="indexing_account"):
+        """Delete indexd records list via gen3-sdk"""
+        self.bulk_delete_records(guids, user=user)
 
     def file_equals(self, res: dict, file_record: dict) -> None:
         logger.info(f"Response data: {res}")
@@ -127,7 +176,7 @@ class Indexd(object):
 
     def clear_previous_upload_files(self, user="main_account"):
         """Delete indexd record if upload is not happening through gen3-sdk"""
-        auth = Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=pytest.root_url)
+        auth = get_auth(user, endpoint=pytest.root_url)
         url = f"/index/index/?acl=null&authz=null&uploader={pytest.users[user]}"
         response = auth.curl(path=url)
         logger.info(response.json())
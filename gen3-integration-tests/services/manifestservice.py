@@ -1,9 +1,9 @@
 import os
 
 import pytest
-import requests
-from gen3.auth import Gen3Auth
 from utils import logger
+from utils.http_session import get_session
+from utils.token_cache import get_auth
 
 
 class ManifestService(object):
@@ -20,10 +20,10 @@ class ManifestService(object):
             smarty_two / user0_account
         """
         logger.info(f"Posting manifest for user {user} with data {data}")
-        res = requests.post(
+        res = get_session().post(
             f"{self.BASE_URL}",
             json=data,
-            auth=Gen3Auth(refresh_token=pytest.api_keys[user]),
+            auth=get_auth(user),
         )
         status = res.status_code
         resp = res.json()
@@ -36,7 +36,7 @@ class ManifestService(object):
         Returns the response text as a string
         """
         logger.info(f"Fetching manifest data for user {user}")
-        auth = Gen3Auth(refresh_token=pytest.api_keys[user])
+        auth = get_auth(user)
         res = auth.curl(self.BASE_ENDPOINT)
         logger.info(res.text)
         return res.text
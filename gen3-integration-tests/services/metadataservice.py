@@ -1,10 +1,10 @@
 import pytest
-import requests
-from gen3.auth import Gen3Auth
 from gen3.metadata import Gen3Metadata
 from gen3.object import Gen3Object
 from utils import logger
-from utils.misc import retry
+from utils.http_session import get_session
+from utils.misc import poll, retry
+from utils.token_cache import get_auth
 
 
 class MetadataService(object):
@@ -15,7 +15,7 @@ class MetadataService(object):
     @retry(times=3, delay=20, exceptions=(AssertionError))
     def get_metadata(self, study_id, user="main_account"):
         """Get mds record for the study id specified"""
-        auth = Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=pytest.root_url)
+        auth = get_auth(user, endpoint=pytest.root_url)
         gen3metadata = Gen3Metadata(auth_provider=auth, admin_endpoint_suffix="")
         try:
             response = gen3metadata.get(guid=study_id)
@@ -23,12 +23,12 @@ class MetadataService(object):
         except Exception as e:
             raise Exception(f"Unable to get metadata, exception: {e}")
 
-    @retry(times=8, delay=30, exceptions=(AssertionError))
+    @poll(timeout=240, exceptions=(AssertionError,))
     def get_aggregate_metadata(self, study_id, user="main_account"):
         """Get aggregate mds record for the study id specified"""
-        res = requests.get(
+        res = get_session().get(
             f"{self.AGG_MDS_ENDPOINT}/guid/{study_id}",
-            auth=Gen3Auth(refresh_token=pytest.api_keys[user]),
+            auth=get_auth(user),
         )
         assert (
             res.status_code == 200
@@ -41,7 +41,7 @@ class MetadataService(object):
         metadata-aggregate-sync job must be run to update the record in aggregate metadata.
         """
         logger.info(f"Creating study with id {study_id}")
-        auth = Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=pytest.root_url)
+        auth = get_auth(user, endpoint=pytest.root_url)
         gen3metadata = Gen3Metadata(auth_provider=auth, admin_endpoint_suffix="")
         try:
             response = gen3metadata.create(
@@ -58,7 +58,7 @@ class MetadataService(object):
         metadata-aggregate-sync job must be run to update the record in aggregate metadata.
         """
         logger.info(f"Updating study with id {study_id}")
-        auth = Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=pytest.root_url)
+        auth = get_auth(user, endpoint=pytest.root_url)
         gen3metadata = Gen3Metadata(auth_provider=auth, admin_endpoint_suffix="")
         try:
             response = gen3metadata.update(
@@ -76,7 +76,7 @@ class MetadataService(object):
         metadata-aggregate-sync job must be run to update the record in aggregate metadata.
         """
         logger.info(f"Deleting study with id {study_id}")
-        auth = Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=pytest.root_url)
+        auth = get_auth(user, endpoint=pytest.root_url)
         gen3metadata = Gen3Metadata(auth_provider=auth, admin_endpoint_suffix="")
         try:
             response = gen3metadata.delete(
@@ -92,7 +92,7 @@ class MetadataService(object):
         Delete study metadata record and indexd record
         """
         logger.info(f"Deleting object with id {study_id}")
-        auth = Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=pytest.root_url)
+        auth = get_auth(user, endpoint=pytest.root_url)
         gen3object = Gen3Object(auth_provider=auth)
         try:
             response = gen3object.delete_object(
@@ -3,11 +3,11 @@ import re
 import time
 
 import pytest
-import requests
 from pages.login import LoginPage
 from pages.user_register import UserRegister
 from playwright.sync_api import Page, expect
 from utils import logger
+from utils.http_session import get_session
 from utils.misc import retry
 from utils.test_execution import screenshot
 
@@ -41,7 +41,7 @@ class RAS(object):
             scope, username, password, client_id, page=page, email=email
         )
         payload = f"grant_type=authorization_code&code={auth_code}&client_id={client_id}&client_secret={client_secret}&scope=openid user&redirect_uri={pytest.root_url}"
-        get_ras_token = requests.post(
+        get_ras_token = get_session().post(
             url=self.RAS_TOKEN_ENDPOINT,
             data=payload,
             headers={"Content-Type": "application/x-www-form-urlencoded"},
@@ -81,7 +81,7 @@ class RAS(object):
         self, refresh_token: str, client_id: str, client_secret: str, scope: str
     ):
         payload = f"grant_type=refresh_token&refresh_token={refresh_token}&client_id={client_id}&client_secret={client_secret}&scope={scope}"
-        token_from_refresh = requests.post(
+        token_from_refresh = get_session().post(
             url=self.RAS_TOKEN_ENDPOINT,
             data=payload,
             headers={"Content-Type": "application/x-www-form-urlencoded"},
@@ -90,7 +90,7 @@ class RAS(object):
         return token_from_refresh_json
 
     def get_passport(self, access_token):
-        get_passport_req = requests.get(
+        get_passport_req = get_session().get(
             url=self.USER_INFO_ENDPOINT,
             headers={
                 "Content-Type": "application/json",
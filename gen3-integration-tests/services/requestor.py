@@ -2,10 +2,10 @@ import json
 import os
 
 import pytest
-import requests
-from gen3.auth import Gen3Auth
 from services.fence import Fence
 from utils import logger
+from utils.http_session import get_session
+from utils.token_cache import get_auth
 
 
 class Requestor(object):
@@ -16,7 +16,7 @@ class Requestor(object):
 
     def create_request_with_client_token(self, data, client_token):
         """Create a new request in requestor with client token"""
-        create_req = requests.post(
+        create_req = get_session().post(
             f"{self.BASE_URL}",
             json=data,
             headers={"Authorization": f"bearer {client_token}"},
@@ -46,7 +46,7 @@ class Requestor(object):
     ):
         """Create a new request in requestor with auth_headers"""
         data = {}
-        gen3auth = Gen3Auth(refresh_token=pytest.api_keys[user])
+        gen3auth = get_auth(user)
         # if policy_id is argument
         if policy_id and not (resource_paths or role_ids):
             logger.info(
@@ -77,7 +77,7 @@ class Requestor(object):
         # if revoke=true using revoke url else using base_url
         endpoint = f"{self.REVOKE_URL}" if revoke else f"{self.BASE_URL}"
         # send post request
-        create_req = requests.post(
+        create_req = get_session().post(
             endpoint,
             json=data,
             headers={"Authorization": f"bearer {gen3auth.get_access_token()}"},
@@ -87,10 +87,10 @@ class Requestor(object):
 
     def get_request_id(self, user: str):
         """Gets the request_id for the user"""
-        gen3auth = Gen3Auth(refresh_token=pytest.api_keys[user])
+        gen3auth = get_auth(user)
         url = f"{self.USER_ENDPOINT}?policy_id=programs.jnkns.projects.jenkins_accessor"
         logger.info(url)
-        id_res = requests.get(
+        id_res = get_session().get(
             url,
             headers={
                 "Authorization": f"Bearer {gen3auth.get_access_token()}",
@@ -115,7 +115,7 @@ class Requestor(object):
 
     def get_request_status(self, request_id: str, user: str = "main_account"):
         """Gets the request_status for the user's request_id in requestor"""
-        auth = Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=self.BASE_URL)
+        auth = get_auth(user, endpoint=self.BASE_URL)
         status_res = auth.curl(path=request_id)
         assert status_res.status_code == 200, status_res.text
         status_data_json = status_res.json()
@@ -126,14 +126,14 @@ class Requestor(object):
     def request_signed(self, request_id: str, user: str = "main_account"):
         """Updates the request to SIGNED status"""
         logger.info(f"Updating the {request_id} to SIGNED status ...")
-        auth = Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=self.BASE_URL)
+        auth = get_auth(user, endpoint=self.BASE_URL)
         access_token = auth.get_access_token()
         headers = {
             "Accept": "application/json",
             "Authorization": f"bearer {access_token}",
             "Content-Type": "application/json",
         }
-        requests.put(
+        get_session().put(
             f"{self.BASE_URL}/{request_id}",
             json={"status": "SIGNED"},
             headers=headers,
@@ -142,14 +142,14 @@ class Requestor(object):
     def request_approved(self, request_id: str, user: str = "main_account"):
         """Updates the request to APPROVED status"""
         logger.info(f"Updating the {request_id} to APPROVED status ...")
-        auth = Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=self.BASE_URL)
+        auth = get_auth(user, endpoint=self.BASE_URL)
         access_token = auth.get_access_token()
         headers = {
             "Accept": "application/json",
             "Authorization": f"bearer {access_token}",
             "Content-Type": "application/json",
         }
-        requests.put(
+        get_session().put(
             f"{self.BASE_URL}/{request_id}",
             json={"status": "APPROVED"},
             headers=headers,
@@ -158,21 +158,21 @@ class Requestor(object):
     def request_delete(self, request_id: str, user: str = "main_account"):
         """Deletes the request fro requestor"""
         logger.info(f"Deleting the {request_id} ...")
-        auth = Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=self.BASE_URL)
+        auth = get_auth(user, endpoint=self.BASE_URL)
         access_token = auth.get_access_token()
         headers = {
             "Accept": "application/json",
             "Authorization": f"bearer {access_token}",
             "Content-Type": "application/json",
         }
-        response = requests.delete(f"{self.BASE_URL}/{request_id}", headers=headers)
+        response = get_session().delete(f"{self.BASE_URL}/{request_id}", headers=headers)
         response.raise_for_status()
 
     def get_request_list(self, user: str):
         """Gets te list of requests for the user"""
-        gen3auth = Gen3Auth(refresh_token=pytest.api_keys[user])
+        gen3auth = get_auth(user)
         logger.info(f"Getting user request list ...")
-        requests.get(
+        get_session().get(
             f"{self.BASE_URL}",
             headers={"Authorization": f"Bearer {gen3auth.get_access_token()}"},
         )
@@ -1,8 +1,8 @@
 import pytest
-import requests
-from gen3.auth import Gen3Auth
 from utils import logger
+from utils.http_session import get_session
 from utils.misc import retry
+from utils.token_cache import get_auth
 
 
 class UserDataLibrary(object):
@@ -13,13 +13,13 @@ class UserDataLibrary(object):
     def create_list(self, user, data, expected_status=201):
         """helper function to create list in data library"""
         logger.info("Creating Data Library List")
-        auth = Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=pytest.root_url)
+        auth = get_auth(user, endpoint=pytest.root_url)
         url = f"{pytest.root_url}/{self.LISTS_ENDPOINT}"
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {auth.get_access_token()}",
         }
-        response = requests.put(
+        response = get_session().put(
             url,
             json=data,
             headers=headers,
@@ -36,7 +36,7 @@ class UserDataLibrary(object):
         reads all lists if list_id is not passed
         """
         logger.info("Reading Data Library List")
-        auth = Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=pytest.root_url)
+        auth = get_auth(user, endpoint=pytest.root_url)
         if list_id:
             url = f"{self.LISTS_ENDPOINT}/{list_id}"
         else:
@@ -52,13 +52,13 @@ class UserDataLibrary(object):
     def update_list(self, user, list_id, data, expected_status=200):
         """helper function to update list in data library"""
         logger.info("Updating Data Library List")
-        auth = Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=pytest.root_url)
+        auth = get_auth(user, endpoint=pytest.root_url)
         headers = {
             "Authorization": f"bearer {auth.get_access_token()}",
             "Content-Type": "application/json",
         }
         url = f"{pytest.root_url}/{self.LISTS_ENDPOINT}/{list_id}"
-        response = requests.put(
+        response = get_session().put(
             url,
             json=data,
             headers=headers,
@@ -74,7 +74,7 @@ class UserDataLibrary(object):
         deletes all lists if list_id is None
         """
         logger.info("Deleting Data Library List")
-        auth = Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=pytest.root_url)
+        auth = get_auth(user, endpoint=pytest.root_url)
         if list_id:
             url = f"{pytest.root_url}/{self.LISTS_ENDPOINT}/{list_id}"
         else:
@@ -83,7 +83,7 @@ class UserDataLibrary(object):
         headers = {
             "Authorization": f"bearer {auth.get_access_token()}",
         }
-        response = requests.delete(
+        response = get_session().delete(
             url,
             headers=headers,
         )
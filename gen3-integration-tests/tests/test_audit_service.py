@@ -25,6 +25,7 @@ from utils import logger
 @pytest.mark.ras
 @pytest.mark.fence
 @pytest.mark.requires_fence_client
+@pytest.mark.uses("ras_account")
 class TestAuditService:
     def test_audit_unauthorized_log_query(self):
         """
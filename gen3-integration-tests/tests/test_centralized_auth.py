@@ -209,12 +209,12 @@ class TestCentralizedAuth:
             self.indexd.create_records(records=new_gen3_records, user="user2_account")
         except Exception as e:
             if "401" not in f"{e}":
-                raise f"401 status code not returned. Exception : {e}"
+                raise Exception(f"401 status code not returned. Exception : {e}")
         try:
             self.indexd.create_records(records=new_abc_records, user="user2_account")
         except Exception as e:
             if "401" not in f"{e}":
-                raise f"401 status code not returned. Exception : {e}"
+                raise Exception(f"401 status code not returned. Exception : {e}")
 
         # Create indexd records using indexing_user
         self.indexd.create_records(records=new_gen3_records)
@@ -288,7 +288,7 @@ class TestCentralizedAuth:
             self.indexd.create_records(records=new_gen3_records, user="main_account")
         except Exception as e:
             if "401" not in f"{e}":
-                raise f"401 status code not returned. Exception : {e}"
+                raise Exception(f"401 status code not returned. Exception : {e}")
 
         self.indexd.create_records(records=new_abc_records, user="main_account")
 
@@ -381,7 +381,7 @@ class TestCentralizedAuth:
                 records=new_gen3_records, access_token=access_token
             )
         except Exception as e:
-            if "401" not in e:
+            if "401" not in f"{e}":
                 logger.error(f"Expected 401 but got {e}")
                 raise
         self.indexd.create_records(records=new_abc_records, access_token=access_token)
@@ -28,6 +28,7 @@ NOTE: To setup the index data for image study follow setup under
 )
 @pytest.mark.guppy
 @pytest.mark.dicom_viewer
+@pytest.mark.uses("guppy:config", mode="shared")
 class TestDicomViewer(object):
     @classmethod
     def setup_class(cls):
@@ -51,6 +51,7 @@ def page_setup(page):
 @pytest.mark.wts
 @pytest.mark.sower
 @pytest.mark.frontend
+@pytest.mark.uses("workspace:main_account")
 class TestDiscoveryPage(object):
     @classmethod
     def setup_class(cls):
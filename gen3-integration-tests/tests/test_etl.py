@@ -20,6 +20,7 @@ from utils import logger
 )
 @pytest.mark.tube
 @pytest.mark.etl
+@pytest.mark.uses("graph:jnkns/jenkins2", "es:etl_aliases")
 class TestETL:
     @classmethod
     def setup_class(cls):
@@ -11,6 +11,7 @@ from gen3.query import Gen3Query
 import utils.gen3_admin_tasks as gat
 from services.guppy import Guppy
 from utils import TEST_DATA_PATH_OBJECT, logger
+from utils.index_sets import ES_INDEX_SET_PER_WORKER
 
 skip_on_old_guppy = pytest.mark.skipif(
     gat.service_version_greater_than("guppy", "2026.06", "0.22.0"),
@@ -23,10 +24,17 @@ skip_on_old_guppy = pytest.mark.skipif(
     reason="guppy service is not running on this environment",
 )
 @pytest.mark.guppy
+# without an index set per worker, the class queries the environment's guppy
+@pytest.mark.uses(
+    *([] if ES_INDEX_SET_PER_WORKER else ["guppy:config"]), mode="shared"
+)
 class TestGuppyService:
-    @classmethod
-    def setup_class(cls):
-        guppy = Guppy()
+    @pytest.fixture(autouse=True, scope="class")
+    def setup_index_set(self, request, index_set):
+        # the CI indices and guppy of this worker, so the class can run next to the
+        # tests using the environment's guppy
+        request.cls.index_set = index_set
+        guppy = Guppy(index_set)
         # this may be needed once these new tests are used for manifest PRs
         # TODO: remove if not needed
         # assert mutate_manifest_for_guppy_test(pytest.namespace)
@@ -42,7 +50,7 @@ class TestGuppyService:
             1. Call API guppy/graphql using Query in test_query1.json
             2. Validate API response against data in tesResponse1.json
         """
-        guppy = Guppy()
+        guppy = Guppy(self.index_set)
         queryFile = "test_query1.json"
         responseFile = "test_response1.json"
         queryType = "data"
@@ -60,7 +68,7 @@ class TestGuppyService:
             1. Call API guppy/graphql using Query in test_query2.json
             2. Validate API response against data in tesResponse2.json
         """
-        guppy = Guppy()
+        guppy = Guppy(self.index_set)
         queryFile = "test_query2.json"
         responseFile = "test_response2.json"
         queryType = "aggregation"
@@ -79,7 +87,7 @@ class TestGuppyService:
             1. Call API guppy/graphql using Query in test_query3.json
             2. Validate API response against data in tesResponse3.json
         """
-        guppy = Guppy()
+        guppy = Guppy(self.index_set)
         queryFile = "test_query3.json"
         responseFile = "test_response3.json"
         queryType = "histogram"
@@ -96,7 +104,7 @@ class TestGuppyService:
             1. Call API guppy/graphql using Query in test_query4.json
             2. Validate API response against data in tesResponse4.json
         """
-        guppy = Guppy()
+        guppy = Guppy(self.index_set)
         queryFile = "test_query4.json"
         responseFile = "test_response4.json"
         queryType = "histogram"
@@ -113,7 +121,7 @@ class TestGuppyService:
             1. Call API guppy/graphql using Query in test_query5.json
             2. Validate API response against data in tesResponse5.json
         """
-        guppy = Guppy()
+        guppy = Guppy(self.index_set)
         queryFile = "test_query5.json"
         responseFile = "test_response5.json"
         queryType = "mapping"
@@ -131,7 +139,7 @@ class TestGuppyService:
             1. Call API guppy/graphql using Query in test_query6.json
             2. Validate API response against data in tesResponse6.json
         """
-        guppy = Guppy()
+        guppy = Guppy(self.index_set)
         queryFile = "test_query6.json"
         responseFile = "test_response6.json"
         queryType = "histogram"
@@ -149,7 +157,7 @@ class TestGuppyService:
             1. Call API guppy/graphql using Query in test_query7.json
             2. Validate API response against data in tesResponse7.json
         """
-        guppy = Guppy()
+        guppy = Guppy(self.index_set)
         queryFile = "test_query7.json"
         responseFile = "test_response7.json"
         queryType = "histogram"
@@ -166,7 +174,7 @@ class TestGuppyService:
             1. Call API guppy/download using Query in test_query8.json
             2. Validate API response against data in tesResponse8.json
         """
-        guppy = Guppy()
+        guppy = Guppy(self.index_set)
         queryFile = "test_query8.json"
         responseFile = "test_response8.json"
         queryType = "download"
@@ -179,58 +187,6 @@ class TestGuppyService:
             endpoint="/download",
         )
 
-    def test_gen3_query_raw_data_download(self):
-        """
-        Scenario: Download raw data using Gen3Query from gen3sdk
-
-        Steps:
-            1. Call raw_data_download() to download the data
-            2. Verify the number of records returned is 100 (Subject index has 100 records)
-        """
-        auth = Gen3Auth(
-            refresh_token=pytest.api_keys["main_account"], endpoint=pytest.root_url
-        )
-        gen3query = Gen3Query(auth_provider=auth)
-        response = gen3query.raw_data_download(
-            data_type="subject",
-            fields=[
-                "file_id",
-                "project_id",
-                "submitter_id",
-            ],
-        )
-        assert len(response) == 100, f"Expected 100 records but got {len(response)}"
-
-    def test_gen3_query_graphql_query(self):
-        """
-        Scenario: Perform graphql query using Gen3Query from gen3sdk
-
-        Steps:
-            1. Call graphql_query() to perform graphql query
-            2.
-        """
-        guppy = Guppy()
-        auth = Gen3Auth(
-            refresh_token=pytest.api_keys["main_account"], endpoint=pytest.root_url
-        )
-        gen3query = Gen3Query(auth_provider=auth)
-
-        query_file = json.loads(
-            (TEST_DATA_PATH_OBJECT / "guppy" / "test_query1.json").read_text(
-                encoding="UTF-8"
-            )
-        )
-        response_file = (
-            TEST_DATA_PATH_OBJECT / "guppy" / "test_response1.json"
-        ).read_text(encoding="UTF-8")
-        response = gen3query.graphql_query(
-            query_string=query_file["query"],
-            variables=query_file["variables"],
-        )
-        actualResponse = response["data"]["subject"]
-        expectedResponse = eval(response_file)["data"]["subject"]
-        assert guppy.match_data_query(actualResponse, expectedResponse)
-
     @skip_on_old_guppy
     def test_guppy_test_query_9(self):
         """
@@ -241,7 +197,7 @@ class TestGuppyService:
             1. Call API guppy/graphql using Query in test_query9.json
             2. Validate API response against data in test_response9.json
         """
-        guppy = Guppy()
+        guppy = Guppy(self.index_set)
         queryFile = "test_query9.json"
         responseFile = "test_response9.json"
         queryType = "data"
@@ -259,7 +215,7 @@ class TestGuppyService:
         Scenario:
         Verify EXCLUDES_ANY removes records with matching values.
         """
-        guppy = Guppy()
+        guppy = Guppy(self.index_set)
         queryFile = "test_query10.json"
         responseFile = "test_response10.json"
         queryType = "data"
@@ -277,7 +233,7 @@ class TestGuppyService:
         Scenario:
         Verify filter operators are case insensitive.
         """
-        guppy = Guppy()
+        guppy = Guppy(self.index_set)
         queryFile = "test_query11.json"
         responseFile = "test_response11.json"
         queryType = "data"
@@ -288,3 +244,65 @@ class TestGuppyService:
             "main_account",
             200,
         )
+
+
+@pytest.mark.skipif(
+    "guppy" not in pytest.deployed_services,
+    reason="guppy service is not running on this environment",
+)
+@pytest.mark.guppy
+@pytest.mark.uses("guppy:config", mode="shared")
+class TestGen3Query:
+    """Gen3Query goes through the environment's guppy, which serves the "ci" indices"""
+
+    def test_gen3_query_raw_data_download(self):
+        """
+        Scenario: Download raw data using Gen3Query from gen3sdk
+
+        Steps:
+            1. Call raw_data_download() to download the data
+            2. Verify the number of records returned is 100 (Subject index has 100 records)
+        """
+        auth = Gen3Auth(
+            refresh_token=pytest.api_keys["main_account"], endpoint=pytest.root_url
+        )
+        gen3query = Gen3Query(auth_provider=auth)
+        response = gen3query.raw_data_download(
+            data_type="subject",
+            fields=[
+                "file_id",
+                "project_id",
+                "submitter_id",
+            ],
+        )
+        assert len(response) == 100, f"Expected 100 records but got {len(response)}"
+
+    def test_gen3_query_graphql_query(self):
+        """
+        Scenario: Perform graphql query using Gen3Query from gen3sdk
+
+        Steps:
+            1. Call graphql_query() to perform graphql query
+            2.
+        """
+        guppy = Guppy()
+        auth = Gen3Auth(
+            refresh_token=pytest.api_keys["main_account"], endpoint=pytest.root_url
+        )
+        gen3query = Gen3Query(auth_provider=auth)
+
+        query_file = json.loads(
+            (TEST_DATA_PATH_OBJECT / "guppy" / "test_query1.json").read_text(
+                encoding="UTF-8"
+            )
+        )
+        response_file = (
+            TEST_DATA_PATH_OBJECT / "guppy" / "test_response1.json"
+        ).read_text(encoding="UTF-8")
+        response = gen3query.graphql_query(
+            query_string=query_file["query"],
+            variables=query_file["variables"],
+        )
+        actualResponse = response["data"]["subject"]
+        expectedResponse = eval(response_file)["data"]["subject"]
+        assert guppy.match_data_query(actualResponse, expectedResponse)
@@ -13,6 +13,13 @@ from playwright.sync_api import Page
 from services.graph import GraphDataTools
 from utils import logger
 
+# guppy is pointed to the indices of the manifest's etlMapping.yaml during the test
+MUTATES_GUPPY_CONFIG = os.getenv("REPO") in (
+    "cdis-manifest",
+    "gitops-qa",
+    "gen3-gitops",
+)
+
 
 @pytest.mark.skipif(
     not gat.validate_button_in_portal_config(
@@ -35,6 +42,10 @@ from utils import logger
 @pytest.mark.guppy
 @pytest.mark.frontend
 @pytest.mark.sower
+@pytest.mark.uses("graph:jnkns/jenkins2", "es:etl_aliases")
+@pytest.mark.uses(
+    "guppy:config", mode="exclusive" if MUTATES_GUPPY_CONFIG else "shared"
+)
 class TestPFBExport(object):
     @classmethod
     def setup_class(cls):
@@ -31,6 +31,7 @@ from utils import gen3_admin_tasks as gat
 @pytest.mark.fence
 @pytest.mark.ras
 @pytest.mark.requires_fence_client
+@pytest.mark.uses("ras_account", "ras_account_2")
 class TestRasAuthN:
     @classmethod
     def setup_class(cls):
@@ -51,6 +51,7 @@ indexd_files = {
 @pytest.mark.fence
 @pytest.mark.ras
 @pytest.mark.skip(reason="RAS Passport creation is broken")
+@pytest.mark.uses("ras_account", "ras_account_2")
 class TestRasDrs:
     @classmethod
     def setup_class(cls):
@@ -50,6 +50,7 @@ indexd_files = {
 @pytest.mark.fence
 @pytest.mark.ras
 @pytest.mark.requires_fence_client
+@pytest.mark.uses("ras_account")
 class TestRasPassport:
     @classmethod
     def setup_class(cls):
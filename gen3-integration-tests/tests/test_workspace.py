@@ -33,6 +33,7 @@ def page_setup(page):
 )
 @pytest.mark.workspace
 @pytest.mark.frontend
+@pytest.mark.uses("workspace:main_account")
 class TestWorkspacePage:
     def test_launch_workspace(self, page_setup):
         """
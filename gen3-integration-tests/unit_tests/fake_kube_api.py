@@ -0,0 +1,267 @@
+"""
+Minimal in-memory Kubernetes API server, enough for the KubeGateway calls:
+get/list/create/replace/patch/delete of namespaced objects, namespaces and watches
+"""
+
+import copy
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+PATH_RE = re.compile(
+    r"^/(?:api/v1|apis/[^/]+/v1)/namespaces/(?P<namespace>[^/]+)"
+    r"(?:/(?P<kind>[^/]+)(?:/(?P<name>[^/]+))?)?$"
+)
+
+
+def merge(target, patch):
+    """JSON merge patch (RFC 7386) of `patch` into `target`, in place"""
+    for key, value in patch.items():
+        if value is None:
+            target.pop(key, None)
+        elif isinstance(value, dict) and isinstance(target.get(key), dict):
+            merge(target[key], value)
+        else:
+            target[key] = copy.deepcopy(value)
+    return target
+
+
+def matches(obj, label_selector, field_selector):
+    labels = obj["metadata"].get("labels") or {}
+    for requirement in filter(None, (label_selector or "").split(",")):
+        key, value = requirement.split("=")
+        if labels.get(key) != value:
+            return False
+    for requirement in filter(None, (field_selector or "").split(",")):
+        key, value = requirement.split("=")
+        assert key == "metadata.name", f"Unsupported field selector {key}"
+        if obj["metadata"]["name"] != value:
+            return False
+    return True
+
+
+class FakeKubeApi(object):
+    """
+    Objects are kept in `objects[(namespace, kind)][name]`. Tests can change them
+    with `put`, which wakes up the watches.
+    """
+
+    def __init__(self):
+        self.objects = {}
+        self.namespaces = {}
+        self._version = 0
+        self._changed = threading.Condition()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def put(self, namespace, kind, obj):
+        """Create or replace `obj`, as the cluster would (e.g. a job finishing)"""
+        with self._changed:
+            self._version += 1
+            obj = copy.deepcopy(obj)
+            obj["metadata"].setdefault("namespace", namespace)
+            obj["metadata"].setdefault("uid", f"uid-{obj['metadata']['name']}")
+            obj["metadata"]["resourceVersion"] = str(self._version)
+            self.objects.setdefault((namespace, kind), {})[
+                obj["metadata"]["name"]
+            ] = obj
+            self._changed.notify_all()
+            return copy.deepcopy(obj)
+
+    def remove(self, namespace, kind, name):
+        with self._changed:
+            obj = self.objects.get((namespace, kind), {}).pop(name, None)
+            self._version += 1
+            self._changed.notify_all()
+            return obj
+
+    def find(self, namespace, kind, name):
+        obj = self.objects.get((namespace, kind), {}).get(name)
+        return copy.deepcopy(obj)
+
+    def select(self, namespace, kind, label_selector=None, field_selector=None):
+        return [
+            copy.deepcopy(obj)
+            for obj in self.objects.get((namespace, kind), {}).values()
+            if matches(obj, label_selector, field_selector)
+        ]
+
+    def watch(self, namespace, kind, label_selector, field_selector, timeout, send):
+        """`send` an ADDED event per matching object, then an event per change"""
+        seen = {}
+        with self._changed:
+            deadline = threading.Event()
+            timer = threading.Timer(timeout, deadline.set)
+            timer.start()
+            try:
+                while not deadline.is_set():
+                    current = {
+                        obj["metadata"]["name"]: obj
+                        for obj in self.select(
+                            namespace, kind, label_selector, field_selector
+                        )
+                    }
+                    for name, obj in current.items():
+                        if name not in seen:
+                            send("ADDED", obj)
+                        elif (
+                            seen[name]["metadata"]["resourceVersion"]
+                            != obj["metadata"]["resourceVersion"]
+                        ):
+                            send("MODIFIED", obj)
+                    for name in set(seen) - set(current):
+                        send("DELETED", seen[name])
+                    seen = current
+                    self._changed.wait(0.1)
+            finally:
+                timer.cancel()
+
+    def _handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _not_found(self, kind, name):
+                self._reply(
+                    404,
+                    {
+                        "kind": "Status",
+                        "status": "Failure",
+                        "reason": "NotFound",
+                        "message": f'{kind} "{name}" not found',
+                        "code": 404,
+                    },
+                )
+
+            def _body(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                return json.loads(self.rfile.read(length) or b"null")
+
+            def _route(self):
+                url = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                match = PATH_RE.match(url.path)
+                return match, query
+
+            def do_GET(self):
+                match, query = self._route()
+                if match is None:
+                    return self._not_found("path", self.path)
+                namespace, kind, name = match.group("namespace", "kind", "name")
+                if kind is None:
+                    if namespace not in api.namespaces:
+                        return self._not_found("namespaces", namespace)
+                    return self._reply(200, api.namespaces[namespace])
+                if name is not None:
+                    obj = api.find(namespace, kind, name)
+                    if obj is None:
+                        return self._not_found(kind, name)
+                    return self._reply(200, obj)
+                selectors = (query.get("labelSelector"), query.get("fieldSelector"))
+                if query.get("watch", "").lower() == "true":
+                    return self._watch(namespace, kind, selectors, query)
+                self._reply(
+                    200,
+                    {
+                        "kind": "List",
+                        "metadata": {"resourceVersion": str(api._version)},
+                        "items": api.select(namespace, kind, *selectors),
+                    },
+                )
+
+            def _watch(self, namespace, kind, selectors, query):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+                def send(event_type, obj):
+                    line = json.dumps({"type": event_type, "object": obj}) + "\n"
+                    data = line.encode()
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                    self.wfile.flush()
+
+                try:
+                    api.watch(
+                        namespace,
+                        kind,
+                        *selectors,
+                        float(query.get("timeoutSeconds", 5)),
+                        send,
+                    )
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    # the client stopped watching
+                    pass
+                self.close_connection = True
+
+            def do_POST(self):
+                match, _ = self._route()
+                namespace, kind = match.group("namespace", "kind")
+                body = self._body()
+                if api.find(namespace, kind, body["metadata"]["name"]) is not None:
+                    return self._reply(
+                        409, {"kind": "Status", "reason": "AlreadyExists", "code": 409}
+                    )
+                self._reply(201, api.put(namespace, kind, body))
+
+            def do_PUT(self):
+                match, _ = self._route()
+                namespace, kind, name = match.group("namespace", "kind", "name")
+                current = api.find(namespace, kind, name)
+                if current is None:
+                    return self._not_found(kind, name)
+                body = self._body()
+                if (
+                    body["metadata"].get("resourceVersion")
+                    != current["metadata"]["resourceVersion"]
+                ):
+                    return self._reply(
+                        409, {"kind": "Status", "reason": "Conflict", "code": 409}
+                    )
+                self._reply(200, api.put(namespace, kind, body))
+
+            def do_PATCH(self):
+                match, _ = self._route()
+                namespace, kind, name = match.group("namespace", "kind", "name")
+                patch = self._body()
+                if kind is None:
+                    if namespace not in api.namespaces:
+                        return self._not_found("namespaces", namespace)
+                    merge(api.namespaces[namespace], patch)
+                    return self._reply(200, api.namespaces[namespace])
+                current = api.find(namespace, kind, name)
+                if current is None:
+                    return self._not_found(kind, name)
+                self._reply(200, api.put(namespace, kind, merge(current, patch)))
+
+            def do_DELETE(self):
+                match, _ = self._route()
+                namespace, kind, name = match.group("namespace", "kind", "name")
+                obj = api.remove(namespace, kind, name)
+                if obj is None:
+                    return self._not_found(kind, name)
+                self._reply(200, obj)
+
+        return Handler
@@ -0,0 +1,139 @@
+"""
+Stand-in for the `kubectl` commands KubeGateway runs, forwarding them to the fake API
+server at FAKE_KUBE_API_URL. Prints what kubectl prints, and exits with 1 on errors.
+"""
+
+import argparse
+import json
+import os
+import sys
+import urllib.error
+import urllib.parse
+import urllib.request
+
+API_URL = os.environ["FAKE_KUBE_API_URL"]
+GROUPS = {
+    "deployments": "/apis/apps/v1",
+    "jobs": "/apis/batch/v1",
+    "cronjobs": "/apis/batch/v1",
+}
+
+
+def path(namespace, kind=None, name=None, **query):
+    if kind is None:
+        result = f"/api/v1/namespaces/{namespace}"
+    else:
+        result = f"{GROUPS.get(kind, '/api/v1')}/namespaces/{namespace}/{kind}"
+    if name:
+        result += f"/{name}"
+    query = {k: v for k, v in query.items() if v}
+    return result + ("?" + urllib.parse.urlencode(query) if query else "")
+
+
+def request(method, url_path, body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(
+        API_URL + url_path,
+        data=data,
+        method=method,
+        headers={"Content-Type": "application/json"},
+    )
+    try:
+        with urllib.request.urlopen(req) as res:
+            return json.loads(res.read())
+    except urllib.error.HTTPError as e:
+        status = json.loads(e.read() or b"{}")
+        sys.stderr.write(
+            f"Error from server ({status.get('reason')}): {status.get('message')}\n"
+        )
+        sys.exit(1)
+
+
+def kind_of(body):
+    return body["kind"].lower() + "s"
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", dest="namespace")
+    parser.add_argument("verb")
+    parser.add_argument("args", nargs="*")
+    parser.add_argument("-o", dest="output")
+    parser.add_argument("-f", dest="filename")
+    parser.add_argument("-l", dest="label_selector")
+    parser.add_argument("-p", dest="patch")
+    parser.add_argument("--type")
+    parser.add_argument("--field-selector")
+    parser.add_argument("--from", dest="from_")
+    parser.add_argument("--watch", action="store_true")
+    parser.add_argument("--output-watch-events", action="store_true")
+    parser.add_argument("--ignore-not-found", action="store_true")
+    parser.add_argument("--wait")
+    parser.add_argument("--timeout")
+    options = parser.parse_intermixed_args(argv)
+    namespace = options.namespace
+
+    if options.verb == "get" and options.args[0] == "namespace":
+        result = request("GET", path(options.args[1]))
+    elif options.verb == "get" and options.watch:
+        url_path = path(
+            namespace,
+            options.args[0],
+            watch="true",
+            timeoutSeconds="60",
+            labelSelector=options.label_selector,
+            fieldSelector=options.field_selector,
+        )
+        with urllib.request.urlopen(API_URL + url_path) as res:
+            for line in res:
+                print(json.dumps(json.loads(line), indent=4), flush=True)
+        return
+    elif options.verb == "get" and len(options.args) == 2:
+        result = request("GET", path(namespace, *options.args))
+    elif options.verb == "get":
+        result = request(
+            "GET",
+            path(
+                namespace,
+                options.args[0],
+                labelSelector=options.label_selector,
+                fieldSelector=options.field_selector,
+            ),
+        )
+    elif options.verb == "create" and options.args and options.args[0] == "job":
+        cronjob = request("GET", path(namespace, "cronjobs", options.from_[8:]))
+        body = {
+            "kind": "Job",
+            "metadata": {"name": options.args[1]},
+            "spec": cronjob["spec"]["jobTemplate"]["spec"],
+        }
+        result = request("POST", path(namespace, "jobs"), body)
+    elif options.verb in ("create", "replace"):
+        body = json.loads(sys.stdin.read())
+        name = body["metadata"]["name"] if options.verb == "replace" else None
+        method = "POST" if options.verb == "create" else "PUT"
+        result = request(method, path(namespace, kind_of(body), name), body)
+    elif options.verb == "patch" and options.args[0] == "namespace":
+        result = request("PATCH", path(options.args[1]), json.loads(options.patch))
+    elif options.verb == "patch":
+        result = request(
+            "PATCH", path(namespace, *options.args), json.loads(options.patch)
+        )
+    elif options.verb == "delete":
+        kind, name = options.args
+        items = request("GET", path(namespace, kind))["items"]
+        exists = any(item["metadata"]["name"] == name for item in items)
+        if not exists and options.ignore_not_found:
+            return
+        request("DELETE", path(namespace, kind, name))
+        print(f'{kind[:-1]} "{name}" deleted')
+        return
+    else:
+        sys.stderr.write(f"Unsupported command: {argv}\n")
+        sys.exit(2)
+    if options.output == "json":
+        print(json.dumps(result, indent=4))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,121 @@
+"""
+BOOTSTRAP
+"""
+
+import threading
+
+import pytest
+from utils import bootstrap as bootstrap_module
+from utils.bootstrap import BOOTSTRAP_INPUTS_ANNOTATION, Bootstrap
+
+
+class FakeKube(object):
+    """Namespace annotations of a KubeGateway"""
+
+    def __init__(self, annotations=None):
+        self.annotations = dict(annotations or {})
+
+    def get_namespace_annotations(self):
+        return dict(self.annotations)
+
+    def annotate_namespace(self, annotations):
+        self.annotations.update(annotations)
+
+
+def make_bootstrap(kube, calls, inputs=None, fail=()):
+    def step(name):
+        def run():
+            if name in fail:
+                raise Exception(f"{name} failed")
+            calls.append(name)
+
+        return run
+
+    bootstrap = Bootstrap("ci-env", kube)
+    bootstrap.add("fence_clients", step("fence_clients"))
+    bootstrap.add(
+        "google_buckets",
+        step("google_buckets"),
+        inputs=lambda: inputs if inputs is not None else ["buckets", "1"],
+    )
+    bootstrap.add(
+        "usersync",
+        step("usersync"),
+        requires=["google_buckets"],
+        inputs=lambda: ["user.yaml"],
+    )
+    return bootstrap
+
+
+def test_steps_run_after_the_steps_they_require():
+    order = []
+    lock = threading.Lock()
+
+    def step(name):
+        def run():
+            with lock:
+                order.append(name)
+
+        return run
+
+    bootstrap = Bootstrap("ci-env", FakeKube())
+    bootstrap.add("a", step("a"))
+    bootstrap.add("b", step("b"))
+    bootstrap.add("c", step("c"), requires=["a", "b"])
+    bootstrap.run()
+    assert sorted(order[:2]) == ["a", "b"]
+    assert order[2] == "c"
+
+
+def test_unknown_required_step():
+    bootstrap = Bootstrap("ci-env", FakeKube())
+    with pytest.raises(Exception, match="requires unknown step 'a'"):
+        bootstrap.add("b", lambda: None, requires=["a"])
+
+
+def test_steps_are_skipped_when_their_inputs_did_not_change():
+    kube = FakeKube()
+    calls = []
+    make_bootstrap(kube, calls).run()
+    assert sorted(calls) == ["fence_clients", "google_buckets", "usersync"]
+    assert BOOTSTRAP_INPUTS_ANNOTATION.format(step="google_buckets") in kube.annotations
+
+    # the state is read from the namespace, not from the runner
+    calls = []
+    bootstrap = make_bootstrap(FakeKube(kube.annotations), calls)
+    bootstrap.run()
+    assert calls == ["fence_clients"]
+    assert bootstrap.steps["google_buckets"].status == "skipped"
+    assert bootstrap.steps["usersync"].status == "skipped"
+
+
+def test_changed_inputs_run_the_step_and_its_dependents():
+    kube = FakeKube()
+    make_bootstrap(kube, []).run()
+    calls = []
+    make_bootstrap(kube, calls, inputs=["buckets", "2"]).run()
+    # usersync's inputs didn't change, but a step it requires ran
+    assert sorted(calls) == ["fence_clients", "google_buckets", "usersync"]
+
+
+def test_force(monkeypatch):
+    kube = FakeKube()
+    make_bootstrap(kube, []).run()
+    monkeypatch.setattr(bootstrap_module, "BOOTSTRAP_FORCE", True)
+    calls = []
+    make_bootstrap(kube, calls).run()
+    assert sorted(calls) == ["fence_clients", "google_buckets", "usersync"]
+
+
+def test_failed_steps_cancel_their_dependents():
+    kube = FakeKube()
+    calls = []
+    bootstrap = make_bootstrap(kube, calls, fail=["google_buckets"])
+    with pytest.raises(Exception, match="google_buckets failed"):
+        bootstrap.run()
+    assert calls == ["fence_clients"]
+    assert bootstrap.steps["usersync"].status == "cancelled"
+    # nothing is recorded for the failed step, so it runs next time
+    assert BOOTSTRAP_INPUTS_ANNOTATION.format(step="google_buckets") not in (
+        kube.annotations
+    )
@@ -0,0 +1,227 @@
+"""
+KUBE GATEWAY
+"""
+
+import base64
+import gzip
+import json
+import stat
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from utils import k8s
+from utils.k8s import KubeGateway
+
+from unit_tests.fake_kube_api import FakeKubeApi
+
+NAMESPACE = "ci-env"
+
+
+@pytest.fixture
+def api():
+    api = FakeKubeApi().start()
+    api.namespaces[NAMESPACE] = {
+        "kind": "Namespace",
+        "metadata": {"name": NAMESPACE, "annotations": {"existing": "1"}},
+    }
+    yield api
+    api.stop()
+
+
+@pytest.fixture(params=["client", "kubectl"])
+def gateway(request, api, monkeypatch, tmp_path):
+    """KubeGateway of each backend, talking to the fake API server"""
+    if request.param == "client":
+        monkeypatch.setattr(k8s, "KUBE_API_URL", api.url)
+        monkeypatch.setattr(k8s, "_api_client", None)
+    else:
+        kubectl = tmp_path / "kubectl"
+        fake_kubectl = Path(__file__).parent / "fake_kubectl.py"
+        kubectl.write_text(f'#!/bin/sh\nexec {sys.executable} {fake_kubectl} "$@"\n')
+        kubectl.chmod(kubectl.stat().st_mode | stat.S_IEXEC)
+        monkeypatch.setenv("PATH", str(tmp_path), prepend=":")
+        monkeypatch.setenv("FAKE_KUBE_API_URL", api.url)
+    return KubeGateway(NAMESPACE, backend=request.param)
+
+
+def configmap(name, labels=None, data=None):
+    return {
+        "apiVersion": "v1",
+        "kind": "ConfigMap",
+        "metadata": {"name": name, "labels": labels or {}},
+        "data": data or {},
+    }
+
+
+def job(name, conditions=None):
+    return {
+        "apiVersion": "batch/v1",
+        "kind": "Job",
+        "metadata": {"name": name},
+        "spec": {"template": {"spec": {"containers": [{"name": "main"}]}}},
+        "status": {"conditions": conditions or []},
+    }
+
+
+def complete(name):
+    return job(name, [{"type": "Complete", "status": "True"}])
+
+
+def test_default_backend_is_the_client():
+    assert k8s.KUBE_BACKEND == "client"
+
+
+def test_get(gateway, api):
+    api.put(NAMESPACE, "configmaps", configmap("manifest-fence", data={"a": "1"}))
+    assert gateway.get("configmaps", "manifest-fence")["data"] == {"a": "1"}
+    assert gateway.get_configmap_data("manifest-fence") == {"a": "1"}
+    assert gateway.get("configmaps", "missing") is None
+    assert gateway.get_configmap_data("missing") is None
+
+
+def test_list_with_label_selector(gateway, api):
+    api.put(NAMESPACE, "configmaps", configmap("a", labels={"app": "fence"}))
+    api.put(NAMESPACE, "configmaps", configmap("b", labels={"app": "indexd"}))
+    api.put(NAMESPACE, "configmaps", configmap("c", labels={"app": "fence"}))
+    items = gateway.list("configmaps", label_selector="app=fence")
+    assert sorted(item["metadata"]["name"] for item in items) == ["a", "c"]
+
+
+def test_create_patch_replace_delete(gateway, api):
+    created = gateway.create("configmaps", configmap("cm", data={"a": "1"}))
+    assert created["metadata"]["resourceVersion"]
+
+    gateway.patch("configmaps", "cm", {"data": {"b": "2"}})
+    assert api.find(NAMESPACE, "configmaps", "cm")["data"] == {"a": "1", "b": "2"}
+
+    current = gateway.get("configmaps", "cm")
+    current["data"] = {"c": "3"}
+    gateway.replace("configmaps", current)
+    assert api.find(NAMESPACE, "configmaps", "cm")["data"] == {"c": "3"}
+
+    gateway.delete("configmaps", "cm")
+    assert api.find(NAMESPACE, "configmaps", "cm") is None
+    # deleting what doesn't exist is not an error
+    gateway.delete("configmaps", "cm")
+
+
+def test_errors_are_raised(gateway, api):
+    with pytest.raises(Exception, match="Unable to patch configmaps/missing"):
+        gateway.patch("configmaps", "missing", {"data": {}})
+
+
+def test_namespace_annotations(gateway, api):
+    gateway.annotate_namespace({"gen3.io/usersync": "abc"})
+    assert gateway.get_namespace_annotations() == {
+        "existing": "1",
+        "gen3.io/usersync": "abc",
+    }
+
+
+def test_helm_revision_from_release_secrets(gateway, api):
+    for version, status in (("1", "superseded"), ("2", "deployed"), ("3", "failed")):
+        api.put(
+            NAMESPACE,
+            "secrets",
+            {
+                "kind": "Secret",
+                "metadata": {
+                    "name": f"sh.helm.release.v1.{NAMESPACE}.v{version}",
+                    "labels": {
+                        "owner": "helm",
+                        "name": NAMESPACE,
+                        "status": status,
+                        "version": version,
+                    },
+                },
+            },
+        )
+    assert gateway.get_helm_revision(NAMESPACE) == "2"
+    assert gateway.get_helm_revision("other-release") is None
+
+
+def test_wait_for_job_sees_the_job_finish(gateway, api):
+    api.put(NAMESPACE, "jobs", job("usersync"))
+    finisher = threading.Timer(
+        0.5, api.put, args=(NAMESPACE, "jobs", complete("usersync"))
+    )
+    finisher.start()
+    start = time.time()
+    assert gateway.wait_for_job("usersync", timeout=30) == "Complete"
+    # woken up by the watch, not by a timeout
+    assert time.time() - start < 10
+    finisher.join()
+
+
+def test_wait_for_job_timeout(gateway, api):
+    api.put(NAMESPACE, "jobs", job("usersync"))
+    start = time.time()
+    assert gateway.wait_for_job("usersync", timeout=1) is None
+    assert time.time() - start < 5
+
+
+def test_stream_events_can_be_stopped(gateway, api):
+    api.put(NAMESPACE, "jobs", job("usersync"))
+    stop = threading.Event()
+    events = []
+    for event_type, obj in gateway.stream_events("jobs", timeout=30, stop=stop):
+        events.append((event_type, obj["metadata"]["name"]))
+        stop.set()
+    assert events == [("ADDED", "usersync")]
+
+
+def test_create_job_from_cronjob(gateway, api):
+    api.put(
+        NAMESPACE,
+        "cronjobs",
+        {
+            "kind": "CronJob",
+            "metadata": {"name": "usersync"},
+            "spec": {"jobTemplate": {"spec": job("")["spec"]}},
+        },
+    )
+    gateway.create_job_from_cronjob("usersync", "usersync-manual")
+    created = api.find(NAMESPACE, "jobs", "usersync-manual")
+    assert created["spec"] == job("")["spec"]
+
+
+def test_rerun_job(gateway, api):
+    first = api.put(NAMESPACE, "jobs", complete("usersync"))
+    gateway.rerun_job("usersync")
+    rerun = api.find(NAMESPACE, "jobs", "usersync")
+    assert rerun["metadata"]["resourceVersion"] != first["metadata"]["resourceVersion"]
+    assert "status" not in rerun
+
+
+def test_helm_values_from_the_deployed_release(gateway, api):
+    for version, status, tag in (
+        ("1", "superseded", "2025.01"),
+        ("2", "deployed", "2026.04"),
+    ):
+        release = {"name": NAMESPACE, "config": {"fence": {"image": {"tag": tag}}}}
+        encoded = base64.b64encode(gzip.compress(json.dumps(release).encode()))
+        api.put(
+            NAMESPACE,
+            "secrets",
+            {
+                "kind": "Secret",
+                "metadata": {
+                    "name": f"sh.helm.release.v1.{NAMESPACE}.v{version}",
+                    "labels": {
+                        "owner": "helm",
+                        "name": NAMESPACE,
+                        "status": status,
+                        "version": version,
+                    },
+                },
+                # secret data is base64 encoded on top of helm's own encoding
+                "data": {"release": base64.b64encode(encoded).decode()},
+            },
+        )
+    assert gateway.get_helm_values(NAMESPACE) == {
+        "fence": {"image": {"tag": "2026.04"}}
+    }
+    assert gateway.get_helm_values("other-release") is None
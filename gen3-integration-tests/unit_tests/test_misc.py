@@ -0,0 +1,119 @@
+"""
+MISC
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from uuid import uuid4
+
+import pytest
+
+PROJECT_PATH = Path(__file__).parent.parent
+WORKER_SCRIPT = """
+import json, os, sys, time
+from pathlib import Path
+
+from utils import misc
+
+misc.ONE_WORKER_ONLY_PATH_OBJECT = Path(sys.argv[1])
+calls_path = Path(sys.argv[2])
+
+
+@misc.one_worker_only
+def setup_once():
+    with calls_path.open("a") as f:
+        f.write(os.environ["PYTEST_XDIST_WORKER"] + "\\n")
+    time.sleep(1)
+    if os.getenv("FAIL"):
+        raise ValueError("setup failed")
+    return {"worker": os.environ["PYTEST_XDIST_WORKER"]}
+
+
+try:
+    print(json.dumps({"result": setup_once()}))
+except ValueError as e:
+    print(json.dumps({"error": str(e)}))
+"""
+
+
+@pytest.fixture
+def run_workers(tmp_path):
+    """Run the worker script in `count` processes of the same session, concurrently"""
+    script = tmp_path / "worker.py"
+    script.write_text(WORKER_SCRIPT)
+    calls_path = tmp_path / "calls"
+    run_uid = uuid4().hex
+
+    def run(count, fail=False):
+        processes = []
+        for i in range(count):
+            env = {
+                **os.environ,
+                "PYTHONPATH": str(PROJECT_PATH),
+                "PYTEST_XDIST_WORKER": f"gw{i}",
+                "PYTEST_XDIST_TESTRUNUID": run_uid,
+                "LOG_LEVEL": "error",
+            }
+            if fail:
+                env["FAIL"] = "1"
+            processes.append(
+                subprocess.Popen(
+                    [
+                        sys.executable,
+                        str(script),
+                        str(tmp_path / "one_worker_only"),
+                        str(calls_path),
+                    ],
+                    env=env,
+                    stdout=subprocess.PIPE,
+                    text=True,
+                )
+            )
+        outputs = [
+            json.loads(process.communicate(timeout=60)[0]) for process in processes
+        ]
+        calls = calls_path.read_text().split() if calls_path.exists() else []
+        return outputs, calls
+
+    return run
+
+
+def test_one_worker_only_runs_once_and_shares_the_result(run_workers):
+    start = time.time()
+    outputs, calls = run_workers(4)
+    assert len(calls) == 1
+    # every worker gets the result of the worker which ran the function
+    assert outputs == [{"result": {"worker": calls[0]}}] * 4
+    # the waiting workers are woken up once it is done, they don't poll
+    assert time.time() - start < 10
+
+    # workers getting there afterwards read the shared result
+    outputs, calls = run_workers(1)
+    assert len(calls) == 1
+    assert outputs[0]["result"] == {"worker": calls[0]}
+
+
+def test_one_worker_only_shares_the_error(run_workers):
+    outputs, calls = run_workers(3, fail=True)
+    assert len(calls) == 1
+    assert outputs == [{"error": "setup failed"}] * 3
+
+
+def test_one_worker_only_without_xdist(monkeypatch):
+    from utils.misc import one_worker_only
+
+    monkeypatch.delenv("PYTEST_XDIST_WORKER", raising=False)
+    calls = []
+
+    @one_worker_only(max_wait_minutes=1)
+    def setup_once(value):
+        calls.append(value)
+        return value * 2
+
+    assert setup_once(2) == 4
+    assert setup_once(3) == 6
+    assert calls == [2, 3]
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from utils import logger
+
+# Namespace annotation holding the inputs hash of the last successful run of a step
+BOOTSTRAP_INPUTS_ANNOTATION = "gen3-code-vigil/bootstrap-{step}-inputs"
+# Run every step, even the ones whose inputs didn't change since they last ran
+BOOTSTRAP_FORCE = os.getenv("BOOTSTRAP_FORCE", "false").lower() == "true"
+
+
+def hash_inputs(inputs):
+    """Content hash of `inputs`: paths are hashed by content, other values as JSON"""
+    sha = hashlib.sha256()
+    for value in inputs:
+        if isinstance(value, Path):
+            sha.update(value.read_bytes() if value.exists() else b"<missing>")
+        else:
+            sha.update(json.dumps(value, sort_keys=True, default=str).encode())
+        sha.update(b"\0")
+    return sha.hexdigest()
+
+
+class BootstrapStep(object):
+    def __init__(self, name, func, requires, inputs):
+        self.name = name
+        self.func = func
+        self.requires = list(requires)
+        # function returning the inputs of the step, None if it always runs
+        self.inputs = inputs
+        # "done", "skipped", "failed" or "cancelled" (a required step failed)
+        self.status = None
+        self.duration = None
+        self.error = None
+
+
+class Bootstrap(object):
+    """
+    Session setup steps and the steps they require.
+
+    A step starts as soon as the steps it requires are done, so independent steps run
+    concurrently. A step with `inputs` is skipped when the hash of its inputs is the
+    same as the last time it succeeded and none of the steps it requires ran. The
+    hashes are kept as annotations of the namespace with `kube` (a KubeGateway), since
+    nothing on the runner survives between CI jobs.
+    """
+
+    def __init__(self, name, kube):
+        self.name = name
+        self.kube = kube
+        self.steps = {}
+
+    def add(self, name, func, requires=(), inputs=None):
+        for required in requires:
+            if required not in self.steps:
+                raise Exception(
+                    f"Bootstrap step '{name}' requires unknown step '{required}'"
+                )
+        self.steps[name] = BootstrapStep(name, func, requires, inputs)
+
+    def ran(self, name):
+        """Whether the step `name` was added and ran, instead of being skipped"""
+        return name in self.steps and self.steps[name].status == "done"
+
+    def _get_inputs_hash(self, step):
+        """Hash of the step's inputs, None if the step always runs"""
+        if step.inputs is None:
+            return None
+        try:
+            return hash_inputs(step.inputs())
+        except Exception as e:
+            logger.info(f"Unable to hash the inputs of '{step.name}', running it: {e}")
+            return None
+
+    def _run_step(self, step, annotations):
+        """
+        Run the step, unless its inputs didn't change and none of the steps it
+        requires ran
+        """
+        annotation = BOOTSTRAP_INPUTS_ANNOTATION.format(step=step.name)
+        inputs_hash = self._get_inputs_hash(step)
+        if (
+            inputs_hash is not None
+            and not BOOTSTRAP_FORCE
+            and not any(self.ran(required) for required in step.requires)
+            and annotations.get(annotation) == inputs_hash
+        ):
+            step.status = "skipped"
+            logger.info(
+                f"Skipping bootstrap step '{step.name}', its inputs didn't change"
+            )
+            return
+        logger.info(f"Running bootstrap step '{step.name}'")
+        start = time.time()
+        step.func()
+        step.duration = round(time.time() - start, 1)
+        step.status = "done"
+        if inputs_hash is not None:
+            try:
+                self.kube.annotate_namespace({annotation: inputs_hash})
+            except Exception as e:
+                logger.info(f"Unable to save the inputs hash of '{step.name}': {e}")
+
+    def run(self, max_workers=4):
+        """Run all the steps, raises once they are all finished if one of them failed"""
+        try:
+            annotations = self.kube.get_namespace_annotations()
+        except Exception as e:
+            logger.info(
+                f"Unable to get the last bootstrap state, running every step: {e}"
+            )
+            annotations = {}
+        pending = dict(self.steps)
+        running = {}
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while pending or running:
+                for name, step in list(pending.items()):
+                    required = [self.steps[r].status for r in step.requires]
+                    if any(status in ("failed", "cancelled") for status in required):
+                        step.status = "cancelled"
+                        del pending[name]
+                    elif all(status in ("done", "skipped") for status in required):
+                        future = executor.submit(self._run_step, step, annotations)
+                        running[future] = step
+                        del pending[name]
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    step = running.pop(future)
+                    try:
+                        future.result()
+                    except Exception as e:
+                        step.status = "failed"
+                        step.error = e
+                        logger.error(f"Bootstrap step '{step.name}' failed: {e}")
+                        continue
+                    if step.status == "done":
+                        logger.info(
+                            f"Bootstrap step '{step.name}' took {step.duration}s"
+                        )
+        logger.info(
+            f"Bootstrap of {self.name} took {time.time() - start:.1f}s: "
+            + ", ".join(f"{step.name} {step.status}" for step in self.steps.values())
+        )
+        failed = [step for step in self.steps.values() if step.status == "failed"]
+        if failed:
+            raise Exception(
+                "Bootstrap steps failed: "
+                + ", ".join(f"{step.name} ({step.error})" for step in failed)
+            ) from failed[0].error
@@ -0,0 +1,89 @@
+import heapq
+import json
+import os
+import statistics
+from pathlib import Path
+
+from utils import logger
+
+DURATIONS_CACHE_KEY = "gen3/test_durations"
+# Optional file the durations are also read from / written to, so CI can keep them
+# between runs (the pytest cache only lives as long as the checkout)
+DURATIONS_FILE = os.getenv("TEST_DURATIONS_FILE")
+# Weight of the latest run when merging it into the stored durations
+DURATIONS_SMOOTHING = float(os.getenv("TEST_DURATIONS_SMOOTHING", "0.5"))
+# Duration assumed for a test with no history when no other test has any either
+DEFAULT_TEST_DURATION = float(os.getenv("DEFAULT_TEST_DURATION_SECS", "30"))
+
+_current_durations = {}
+_ran_tests = set()
+
+
+def load_durations(config):
+    """Load the per-test durations (in seconds) recorded by previous runs"""
+    durations = config.cache.get(DURATIONS_CACHE_KEY, {}) if config.cache else {}
+    if DURATIONS_FILE:
+        try:
+            durations.update(json.loads(Path(DURATIONS_FILE).read_text()))
+        except (FileNotFoundError, ValueError) as e:
+            logger.info(f"Unable to read test durations from {DURATIONS_FILE}: {e}")
+    return durations
+
+
+def record_duration(report):
+    """Add up the setup, call and teardown durations of a test report"""
+    _current_durations[report.nodeid] = (
+        _current_durations.get(report.nodeid, 0) + report.duration
+    )
+    # skipped tests say nothing about how long the test takes when it runs
+    if report.when == "call":
+        _ran_tests.add(report.nodeid)
+
+
+def save_durations(config):
+    """Merge the durations of this run into the stored ones"""
+    durations = load_durations(config)
+    for nodeid in _ran_tests:
+        duration = _current_durations[nodeid]
+        if nodeid in durations:
+            duration = (
+                DURATIONS_SMOOTHING * duration
+                + (1 - DURATIONS_SMOOTHING) * durations[nodeid]
+            )
+        durations[nodeid] = round(duration, 3)
+    if config.cache:
+        config.cache.set(DURATIONS_CACHE_KEY, durations)
+    if DURATIONS_FILE:
+        Path(DURATIONS_FILE).write_text(json.dumps(durations, indent=2, sort_keys=True))
+    logger.info(f"Saved durations of {len(_ran_tests)} tests")
+
+
+def estimate_scope_durations(scopes, durations):
+    """
+    Estimate how long each scope takes by adding up the durations of its tests.
+    Tests with no history are assumed to take the median duration of the known tests.
+
+    Args:
+        scopes (dict): scope => list of test node ids
+        durations (dict): test node id => duration in seconds
+    """
+    default = (
+        statistics.median(durations.values()) if durations else DEFAULT_TEST_DURATION
+    )
+    return {
+        scope: sum(durations.get(nodeid, default) for nodeid in nodeids)
+        for scope, nodeids in scopes.items()
+    }
+
+
+def estimate_makespan(scope_durations, workers):
+    """
+    Estimate the wall-clock time of running the scopes longest-first on `workers`
+    workers, each scope going to the worker which frees up first
+    """
+    if workers < 1:
+        return sum(scope_durations.values())
+    worker_loads = [0] * workers
+    for duration in sorted(scope_durations.values(), reverse=True):
+        heapq.heappush(worker_loads, heapq.heappop(worker_loads) + duration)
+    return max(worker_loads)
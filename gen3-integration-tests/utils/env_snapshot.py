@@ -0,0 +1,79 @@
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import TEST_DATA_PATH_OBJECT, logger
+from utils import gen3_admin_tasks as gat
+from utils.k8s import get_kube_gateway
+from utils.session_cache import get_helm_revision
+
+ENV_SNAPSHOT_PATH_OBJECT = TEST_DATA_PATH_OBJECT / "env_snapshot"
+
+
+def _probes(test_env_namespace):
+    """Snapshot key => function probing the environment"""
+    return {
+        "deployed_services": gat.get_list_of_services_deployed,
+        "enabled_sower_jobs": gat.get_enabled_sower_jobs,
+        "use_agg_mdg_flag": gat.is_agg_mds_enabled,
+        "indexs3client_job_deployed": gat.check_indexs3client_job_deployed,
+        "google_enabled": gat.is_google_enabled,
+        "is_register_user_enabled": lambda: gat.is_register_user_enabled(
+            test_env_namespace
+        ),
+        "helm_revision": lambda: get_helm_revision(test_env_namespace),
+    }
+
+
+def get_snapshot_key(test_env_namespace):
+    """
+    Hash of the resourceVersion of every configmap and deployment of the namespace,
+    changes whenever the environment is reconfigured or redeployed
+    """
+    versions = get_kube_gateway(test_env_namespace).list_resource_versions(
+        ["configmaps", "deployments"]
+    )
+    versions = "\n".join(
+        f"{name}={version}" for name, version in sorted(versions.items())
+    )
+    return hashlib.sha1(versions.encode()).hexdigest()[:16]
+
+
+def build_snapshot(test_env_namespace):
+    """Run all the probes concurrently"""
+    start = time.time()
+    probes = _probes(test_env_namespace)
+    with ThreadPoolExecutor(max_workers=len(probes) + 1) as executor:
+        futures = {key: executor.submit(probe) for key, probe in probes.items()}
+        snapshot = {key: future.result() for key, future in futures.items()}
+    snapshot["skip_portal_tests"] = gat.skip_portal_tests(snapshot["deployed_services"])
+    snapshot["ff_commons_info"] = (
+        gat.get_ff_commons_info()
+        if "frontend-framework" in snapshot["deployed_services"]
+        else None
+    )
+    logger.info(f"Probed environment in {time.time() - start:.1f}s")
+    return snapshot
+
+
+def load_or_build_snapshot(test_env_namespace):
+    """
+    Get the environment snapshot from disk if the environment didn't change since it
+    was saved, otherwise probe the environment and save the snapshot
+    """
+    key = get_snapshot_key(test_env_namespace)
+    snapshot_path = ENV_SNAPSHOT_PATH_OBJECT / f"{test_env_namespace}_{key}.json"
+    if snapshot_path.exists():
+        logger.info(f"Using environment snapshot {snapshot_path}")
+        return json.loads(snapshot_path.read_text())
+    snapshot = build_snapshot(test_env_namespace)
+    ENV_SNAPSHOT_PATH_OBJECT.mkdir(parents=True, exist_ok=True)
+    # drop the snapshots of previous versions of the environment
+    for old_snapshot_path in ENV_SNAPSHOT_PATH_OBJECT.glob(
+        f"{test_env_namespace}_*.json"
+    ):
+        os.remove(old_snapshot_path)
+    snapshot_path.write_text(json.dumps(snapshot, indent=2))
+    return snapshot
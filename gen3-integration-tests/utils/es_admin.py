@@ -0,0 +1,161 @@
+import os
+import threading
+
+import yaml
+from utils import logger
+from utils.http_session import create_session
+from utils.k8s import get_kube_gateway
+from utils.port_forward import port_forwards
+
+ES_SERVICE = "service/gen3-elasticsearch-master"
+ES_PORT = 9200
+# Talk to this ES instead of port-forwarding to the cluster, e.g. a local stub ES
+ES_URL = os.getenv("ES_URL")
+# Max number of index names sent in a single multi-index request, keeps URLs short
+MAX_INDICES_PER_REQUEST = 50
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+class ESAdminClient(object):
+    """
+    Elasticsearch admin client for a test environment.
+
+    Goes through the session-wide port-forward to the ES service (see utils.port_forward)
+    and sends every request through a pooled HTTP session. Listing and deleting indices use
+    the `_cat` and multi-index APIs, so each operation is a single round trip whatever
+    the number of aliases.
+    """
+
+    def __init__(self, test_env_namespace, base_url=ES_URL):
+        self.namespace = test_env_namespace
+        self.base_url = base_url
+        self.session = create_session()
+
+    def _url(self, path):
+        base_url = self.base_url
+        if base_url is None:
+            base_url = port_forwards.get(self.namespace, ES_SERVICE, ES_PORT).url
+        return f"{base_url}/{path}"
+
+    def list_indices(self, patterns):
+        """Names of the indices matching any of the `patterns` (wildcards allowed)"""
+        if not patterns:
+            return []
+        res = self.session.get(
+            self._url(f"_cat/indices/{','.join(patterns)}"),
+            params={"h": "index", "format": "json"},
+        )
+        if res.status_code == 404:
+            return []
+        if res.status_code != 200:
+            raise Exception(
+                f"Unable to list indices {patterns}. Status: {res.status_code}, response: {res.text}"
+            )
+        return sorted(row["index"] for row in res.json())
+
+    def delete_indices(self, indices):
+        """Delete the `indices`, a handful of requests at most"""
+        for i in range(0, len(indices), MAX_INDICES_PER_REQUEST):
+            chunk = indices[i : i + MAX_INDICES_PER_REQUEST]
+            res = self.session.delete(self._url(",".join(chunk)))
+            if res.status_code not in (200, 404):
+                raise Exception(
+                    f"Unable to delete indices {chunk}. Status: {res.status_code}, response: {res.text}"
+                )
+            logger.info(f"Deleted indices: {chunk}")
+
+    def get_alias_indices(self, aliases):
+        """
+        Map each alias to the names of the indices it points to. Missing aliases map to
+        an empty list.
+        """
+        alias_indices = {alias: [] for alias in aliases}
+        if not aliases:
+            return alias_indices
+        res = self.session.get(self._url(f"_alias/{','.join(aliases)}"))
+        # ES answers 404 as soon as one alias is missing, with the found ones in the body
+        if res.status_code not in (200, 404):
+            raise Exception(
+                f"Unable to get aliases {aliases}. Status: {res.status_code}, response: {res.text}"
+            )
+        for index_name, data in res.json().items():
+            if not isinstance(data, dict):
+                continue  # "error" and "status" keys of a 404 response
+            for alias in data.get("aliases", {}):
+                if alias in alias_indices:
+                    alias_indices[alias].append(index_name)
+        return alias_indices
+
+    def get_alias_versions(self, aliases):
+        """
+        Map each alias to the version of the index it points to (the index name ends
+        with `_<version>`), or -1 when the alias doesn't exist
+        """
+        versions = {}
+        for alias, indices in self.get_alias_indices(aliases).items():
+            if not indices:
+                logger.info(f"Alias {alias} not found")
+                versions[alias] = -1
+                continue
+            versions[alias] = int(sorted(indices)[0].split("_")[-1])
+        return versions
+
+    def create_index(self, index, body):
+        """Create `index` with the settings and mappings in `body`"""
+        res = self.session.put(self._url(index), json=body)
+        if res.status_code != 200:
+            raise Exception(
+                f"Unable to create index {index}. Status: {res.status_code}, response: {res.text}"
+            )
+
+    def update_aliases(self, actions):
+        """Apply the alias `actions` (e.g. [{"add": {"index": ..., "alias": ...}}]) at once"""
+        res = self.session.post(self._url("_aliases"), json={"actions": actions})
+        if res.status_code != 200:
+            raise Exception(
+                f"Unable to update aliases. Status: {res.status_code}, response: {res.text}"
+            )
+
+    def bulk(self, index, ndjson):
+        """Index the documents of the `ndjson` bulk body into `index`, searchable on return"""
+        res = self.session.post(
+            self._url(f"{index}/_bulk"),
+            params={"refresh": "wait_for"},
+            data=ndjson.encode(),
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        if res.status_code != 200 or res.json().get("errors"):
+            raise Exception(
+                f"Unable to index documents into {index}. Status: {res.status_code}, response: {res.text[:1000]}"
+            )
+
+    def close(self):
+        self.session.close()
+
+
+def get_es_client(test_env_namespace):
+    """Get the ES admin client of `test_env_namespace`, shared for the whole session"""
+    with _clients_lock:
+        if test_env_namespace not in _clients:
+            _clients[test_env_namespace] = ESAdminClient(test_env_namespace)
+        return _clients[test_env_namespace]
+
+
+def close_es_clients():
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
+
+def get_etl_aliases(test_env_namespace):
+    """Names of the aliases created by the ETL, from the etl-mapping configmap"""
+    data = get_kube_gateway(test_env_namespace).get_configmap_data("etl-mapping")
+    if data is None:
+        raise Exception("Unable to get alias. Error: configmap etl-mapping not found")
+    etl_mapping = yaml.safe_load(data.get("etlMapping.yaml") or "{}") or {}
+    aliases = [mapping["name"] for mapping in etl_mapping.get("mappings", [])]
+    logger.info(f"List of aliases: {' '.join(aliases)}")
+    return aliases
@@ -0,0 +1,139 @@
+import shlex
+import threading
+from uuid import uuid4
+
+from utils import logger
+from utils.k8s import get_kube_gateway
+from utils.misc import retry
+
+_admins = {}
+_admins_lock = threading.Lock()
+
+
+class FenceCommandResult(object):
+    def __init__(self, args, returncode, stdout, stderr):
+        self.args = args
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+
+    def __repr__(self):
+        return f"FenceCommandResult(args={self.args}, returncode={self.returncode})"
+
+
+class FenceAdmin(object):
+    """
+    Runs admin commands (`fence-create` ...) in a fence pod.
+
+    The pod name is looked up once and reused until an exec fails because the pod is
+    gone. `run_batch` runs many commands in a single exec and splits the
+    output back per command.
+    """
+
+    def __init__(self, test_env_namespace):
+        self.namespace = test_env_namespace
+        self._pod_name = None
+        self._lock = threading.Lock()
+
+    @retry(times=2, delay=30, exceptions=(AssertionError,))
+    def _find_pod_name(self):
+        # Get the pod name for fence app
+        pods = get_kube_gateway(self.namespace).list_pods(
+            label_selector="app=fence", ready_only=True
+        )
+        assert pods, "No running fence pod found"
+        fence_pod_name = pods[-1]["metadata"]["name"]
+        logger.info(f"Found running fence pod - {fence_pod_name}")
+        return fence_pod_name
+
+    @property
+    def pod_name(self):
+        with self._lock:
+            if self._pod_name is None:
+                self._pod_name = self._find_pod_name()
+            return self._pod_name
+
+    def _exec(self, cmd, timeout=None, retry_on_missing_pod=True):
+        pod_name = self.pod_name
+        result = get_kube_gateway(self.namespace).exec(pod_name, cmd, timeout=timeout)
+        # the pod was replaced since we looked it up: find the new one and try again once.
+        # If that one is gone too, return the error instead of chasing a crash-looping pod
+        if (
+            retry_on_missing_pod
+            and result.returncode != 0
+            and f'pods "{pod_name}" not found' in result.stderr
+        ):
+            logger.info(f"Fence pod {pod_name} is gone, looking up the new one")
+            with self._lock:
+                if self._pod_name == pod_name:
+                    self._pod_name = None
+            return self._exec(cmd, timeout=timeout, retry_on_missing_pod=False)
+        return result
+
+    def run(self, args, timeout=None):
+        """Run one command in the fence pod, e.g. ["fence-create", "client-delete-expired"]"""
+        result = self._exec(args, timeout=timeout)
+        return FenceCommandResult(
+            args, result.returncode, result.stdout.strip(), result.stderr.strip()
+        )
+
+    def run_batch(self, commands, timeout=None):
+        """
+        Run `commands` (lists of args) one after the other in a single exec.
+        A failing command doesn't stop the next ones.
+
+        Returns one FenceCommandResult per command, in order. Raises if the exec itself
+        fails before all the commands ran.
+        """
+        if not commands:
+            return []
+        marker = f"__FENCE_ADMIN_{uuid4().hex}"
+        script = []
+        for i, args in enumerate(commands):
+            script += [
+                f"echo {marker}_BEGIN_{i}; echo {marker}_BEGIN_{i} >&2",
+                shlex.join(args),
+                f"echo {marker}_END_{i} $?; echo {marker}_END_{i} >&2",
+            ]
+        result = self._exec(["sh", "-c", "\n".join(script)], timeout=timeout)
+        stdout_parts = self._split_output(result.stdout, marker)
+        stderr_parts = self._split_output(result.stderr, marker)
+        results = []
+        for i, args in enumerate(commands):
+            if i not in stdout_parts or stdout_parts[i][1] is None:
+                raise Exception(
+                    f"Batch of fence commands stopped at '{shlex.join(args)}'. "
+                    f"Error: {result.stderr.strip()}"
+                )
+            stdout, returncode = stdout_parts[i]
+            stderr = stderr_parts.get(i, ("", None))[0]
+            results.append(FenceCommandResult(args, returncode, stdout, stderr))
+        return results
+
+    @staticmethod
+    def _split_output(output, marker):
+        """Map command index => (output, exit code) from the markers echoed around each command"""
+        parts = {}
+        current, lines = None, []
+        for line in output.splitlines():
+            if line.startswith(f"{marker}_BEGIN_"):
+                current, lines = int(line.rsplit("_", 1)[-1]), []
+            elif line.startswith(f"{marker}_END_"):
+                fields = line.split()
+                returncode = int(fields[1]) if len(fields) > 1 else None
+                parts[current] = ("\n".join(lines).strip(), returncode)
+                current = None
+            elif current is not None:
+                lines.append(line)
+        # a command that never reached its END marker (exec killed...)
+        if current is not None:
+            parts[current] = ("\n".join(lines).strip(), None)
+        return parts
+
+
+def get_fence_admin(test_env_namespace):
+    """Get the FenceAdmin of `test_env_namespace`, shared for the whole session"""
+    with _admins_lock:
+        if test_env_namespace not in _admins:
+            _admins[test_env_namespace] = FenceAdmin(test_env_namespace)
+        return _admins[test_env_namespace]
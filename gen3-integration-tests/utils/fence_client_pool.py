@@ -0,0 +1,190 @@
+import base64
+import hashlib
+import json
+import os
+import re
+import time
+
+from filelock import FileLock
+from utils import TEST_DATA_PATH_OBJECT
+from utils import gen3_admin_tasks as gat
+from utils import logger
+from utils.k8s import get_kube_gateway
+
+# Secret of the test environment's namespace holding the credentials of the clients
+FENCE_CLIENT_POOL_SECRET = "gen3-code-vigil-fence-clients"
+# Clients created with an expiration are recreated once this fraction of their
+# lifetime passed, so tests about expiration see the lifetime they expect
+EXPIRATION_TOLERANCE = float(os.getenv("FENCE_CLIENT_EXPIRATION_TOLERANCE", "0.05"))
+# Clients whose credentials are rotated at setup
+ROTATED_CLIENTS = ["jenkins-client-tester"]
+
+
+def parse_client_info(client_info):
+    """(client id, client secret) from the "('<id>', '<secret>')" printed by fence-create"""
+    client_id, client_secret = re.sub(r"[\'()]", "", client_info).split(", ")
+    return client_id, client_secret
+
+
+class SecretCache(object):
+    """JSON document stored in a secret of the namespace"""
+
+    def __init__(self, test_env_namespace, name=FENCE_CLIENT_POOL_SECRET):
+        self.kube = get_kube_gateway(test_env_namespace)
+        self.name = name
+
+    def load(self):
+        secret = self.kube.get("secrets", self.name)
+        if secret is None:
+            return {}
+        try:
+            return json.loads(base64.b64decode(secret["data"]["pool"]))
+        except (KeyError, ValueError):
+            logger.info(f"Unable to read secret {self.name}, starting over")
+            return {}
+
+    def save(self, data):
+        encoded = base64.b64encode(json.dumps(data).encode()).decode()
+        if self.kube.get("secrets", self.name) is None:
+            self.kube.create(
+                "secrets",
+                {
+                    "apiVersion": "v1",
+                    "kind": "Secret",
+                    "metadata": {"name": self.name},
+                    "type": "Opaque",
+                    "data": {"pool": encoded},
+                },
+            )
+        else:
+            self.kube.patch("secrets", self.name, {"data": {"pool": encoded}})
+
+    def delete(self):
+        self.kube.delete("secrets", self.name, wait=False)
+
+
+class FenceClientPool(object):
+    """
+    The fence test clients of clients.csv, kept from one session to the next.
+
+    Fence only stores hashed client secrets, so the credentials of the clients created
+    here are kept in a secret of the namespace, which outlives the CI runners. At
+    setup, a single `fence-create client-list` tells which kept clients still exist:
+    only the missing, changed (clients.csv row or hostname) or expiring clients are
+    created again, and only the clients whose rotated credentials are gone are
+    rotated again.
+    """
+
+    def __init__(self, test_env_namespace):
+        self.namespace = test_env_namespace
+        self.cache = SecretCache(test_env_namespace)
+
+    @staticmethod
+    def _spec_hash(client_data):
+        # the redirect urls of the clients are built from the hostname
+        spec = list(client_data) + [os.getenv("HOSTNAME")]
+        return hashlib.sha256(json.dumps(spec).encode()).hexdigest()
+
+    @staticmethod
+    def _is_fresh(cached, expires_in):
+        if not expires_in:
+            return True
+        lifetime = float(expires_in) * 24 * 60 * 60
+        age = time.time() - cached["created_at"]
+        return age <= lifetime * EXPIRATION_TOLERANCE
+
+    def _is_reusable(self, client_data, cached, existing):
+        client_name, _, _, _, expires_in, _ = client_data
+        existing_ids = [client["client_id"] for client in existing.get(client_name, [])]
+        return (
+            cached is not None
+            and cached["spec_hash"] == self._spec_hash(client_data)
+            and cached["client_id"] in existing_ids
+            and self._is_fresh(cached, expires_in)
+        )
+
+    def ensure(self, clients_data, max_workers=8):
+        """
+        Make sure every client of `clients_data` (rows of clients.csv) exists.
+        Returns (client name => (id, secret), rotated client name => (id, secret))
+        """
+        # the sessions sharing this runner set the clients up one at a time
+        with FileLock(TEST_DATA_PATH_OBJECT / "fence_clients.lock"):
+            cache = self.cache.load()
+            cached_clients = cache.get("clients", {})
+            cached_rotated = cache.get("rotated", {})
+            existing = gat.list_fence_clients(self.namespace)
+
+            to_create = [
+                client_data
+                for client_data in clients_data
+                if not self._is_reusable(
+                    client_data, cached_clients.get(client_data[0]), existing
+                )
+            ]
+            logger.info(
+                f"Reusing {len(clients_data) - len(to_create)} fence clients, "
+                f"creating {[client_data[0] for client_data in to_create]}"
+            )
+            specs = {client_data[0]: client_data for client_data in clients_data}
+            for client_name, client_info in gat.setup_fence_test_clients(
+                to_create, test_env_namespace=self.namespace, max_workers=max_workers
+            ):
+                client_id, client_secret = parse_client_info(client_info)
+                cached_clients[client_name] = {
+                    "client_id": client_id,
+                    "client_secret": client_secret,
+                    "spec_hash": self._spec_hash(specs[client_name]),
+                    "created_at": time.time(),
+                }
+            cache["clients"] = cached_clients
+            # save the new clients now in case the rotation fails
+            self.cache.save(cache)
+
+            to_rotate = []
+            for client_name in ROTATED_CLIENTS:
+                if client_name not in specs:
+                    continue
+                rotated = cached_rotated.get(client_name)
+                existing_ids = [
+                    client["client_id"] for client in existing.get(client_name, [])
+                ]
+                if (
+                    rotated is None
+                    or rotated["base_client_id"]
+                    != cached_clients[client_name]["client_id"]
+                    or rotated["client_id"] not in existing_ids
+                ):
+                    to_rotate.append(client_name)
+            for client_name, client_info in gat.rotate_fence_clients(
+                to_rotate, test_env_namespace=self.namespace
+            ):
+                client_id, client_secret = parse_client_info(client_info)
+                cached_rotated[client_name] = {
+                    "client_id": client_id,
+                    "client_secret": client_secret,
+                    "base_client_id": cached_clients[client_name]["client_id"],
+                }
+            cache["rotated"] = cached_rotated
+            self.cache.save(cache)
+
+        clients = {
+            name: (
+                cached_clients[name]["client_id"],
+                cached_clients[name]["client_secret"],
+            )
+            for name in specs
+        }
+        rotated_clients = {
+            name: (
+                cached_rotated[name]["client_id"],
+                cached_rotated[name]["client_secret"],
+            )
+            for name in ROTATED_CLIENTS
+            if name in specs
+        }
+        return clients, rotated_clients
+
+    def forget(self):
+        """Drop the kept credentials, e.g. after deleting the clients"""
+        self.cache.delete()
@@ -6,7 +6,6 @@ import re
 import shutil
 import string
 import subprocess
-import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
@@ -14,16 +13,34 @@ import pytest
 import requests
 from dotenv import load_dotenv
 from packaging.version import InvalidVersion, Version
-from utils import TEST_DATA_PATH_OBJECT, logger
+from utils import logger
+from utils.es_admin import get_es_client, get_etl_aliases
+from utils.fence_admin import get_fence_admin
+from utils.job_monitor import JobMonitor, monitor_jobs
+from utils.k8s import get_kube_gateway
 from utils.misc import retry
+from utils.session_cache import session_cached
 
 load_dotenv()
 
+# Google test buckets => auth id of their project
+GOOGLE_TEST_BUCKETS = {"dcf-integration-qa": "QA", "dcf-integration-test": "test"}
+# Project auth ids => Google test bucket linked to them
+GOOGLE_TEST_BUCKET_PROJECTS = {
+    "phs000179": "dcf-integration-qa",
+    "phs000178": "dcf-integration-test",
+    "phs001194": "dcf-integration-test",
+    "phs000571": "dcf-integration-test",
+}
 
+
+@session_cached("portal_config")
 @retry(times=5, delay=60, exceptions=(AssertionError))
 def get_portal_config(json_file_name=None):
     """Fetch portal config from the GUI"""
-    deployed_services = get_list_of_services_deployed()
+    deployed_services = (
+        getattr(pytest, "deployed_services", None) or get_list_of_services_deployed()
+    )
     if pytest.frontend_url:
         if os.getenv("REPO") == "commons-frontend-app":
             folder_name = "ci"
@@ -104,48 +121,32 @@ def get_env_configurations(test_env_namespace: str = ""):
     Fetch environment configs.
     Returns dict { file name: file contents }
     """
-    cmd = [
-        "kubectl",
-        "-n",
-        test_env_namespace,
-        "get",
-        "configmap",
-        "manifest-global",
-        "-o",
-        "json",
-    ]
-    result = subprocess.run(
-        cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-    )
-    if result.returncode == 0:
-        jq_command = ["jq", "-r", ".data"]
-        jq_result = subprocess.run(
-            jq_command,
-            input=result.stdout,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
+    try:
+        data = get_kube_gateway(test_env_namespace).get_configmap_data(
+            "manifest-global"
         )
-        if jq_result.returncode == 0:
-            return {"manifest.json": '{ "global": ' + jq_result.stdout + "}"}
-        else:
-            logger.info(f"Error in jq command: {jq_result.stderr}")
-    else:
-        logger.info(f"Error in kubectl command: {result.stderr}")
+    except Exception as e:
+        logger.info(f"Error getting manifest-global configmap: {e}")
+        return None
+    if data is None:
+        logger.info("Configmap manifest-global not found")
+        return None
+    return {"manifest.json": json.dumps({"global": data}, indent=2)}
 
 
-def run_gen3_job(
+def start_gen3_job(
     job_name: str,
     test_env_namespace: str = "",
     job_type: str = "cronjob",
 ):
     """
-    Run gen3 job (e.g., metadata-aggregate-sync).
+    Start gen3 job (e.g., metadata-aggregate-sync) without waiting for it.
+    Returns the name of the started job.
     """
+    kube = get_kube_gateway(test_env_namespace)
     if job_type == "job":
-        cmd = [
-            f"kubectl -n {test_env_namespace} get job {job_name} -o json | jq 'del(.spec.selector, .spec.template.metadata.labels, .status, .metadata.uid, .metadata.resourceVersion, .metadata.creationTimestamp)' | kubectl -n {test_env_namespace} replace --force -f -"
-        ]
+        logger.info(f"[run_gen3_job] Re-running job {job_name}")
+        run_job = lambda: kube.rerun_job(job_name)
     elif job_type == "cronjob":
         cronjob_name = job_name
         if job_name == "etl":
@@ -153,148 +154,95 @@ def run_gen3_job(
         job_name += "-" + "".join(
             random.choices(string.ascii_lowercase + string.digits, k=4)
         )
-        cmd = [
-            f"kubectl -n {test_env_namespace} create job --from=cronjob/{cronjob_name} {job_name}"
-        ]
-    else:
-        raise Exception(f"[run_gen3_job] Job type '{job_type}' unknown")
-
-    logger.info(f"[run_gen3_job] Running command: {cmd}")
-    result = subprocess.run(
-        cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE
-    )
-    if result.returncode == 0:
         logger.info(
-            f"[run_gen3_job] '{job_name}' job triggered - {result.stdout.decode('utf-8')}"
+            f"[run_gen3_job] Creating job {job_name} from cronjob {cronjob_name}"
         )
+        run_job = lambda: kube.create_job_from_cronjob(cronjob_name, job_name)
     else:
-        raise Exception(
-            f"[run_gen3_job] '{job_name}' failed to start - {result.stderr.decode('utf-8')}"
-        )
-    check_job_pod(job_name=job_name, test_env_namespace=pytest.namespace)
+        raise Exception(f"[run_gen3_job] Job type '{job_type}' unknown")
 
+    try:
+        run_job()
+    except Exception as e:
+        raise Exception(f"[run_gen3_job] '{job_name}' failed to start - {e}")
+    logger.info(f"[run_gen3_job] '{job_name}' job triggered")
+    return job_name
 
-def fence_delete_expired_clients():
-    cmd = ["kubectl", "-n", pytest.namespace, "get", "pods", "-l", "app=fence"]
-    result = subprocess.run(
-        cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-    )
-    if result.returncode == 0:
-        fence_pod_name = result.stdout.splitlines()[-1].split()[0]
-    else:
-        raise Exception("Unable to retrieve fence-deployment pod")
-
-    delete_explired_clients_cmd = [
-        "kubectl",
-        "exec",
-        "-n",
-        pytest.namespace,
-        "-i",
-        fence_pod_name,
-        "--",
-        "fence-create",
-        "client-delete-expired",
+
+def run_gen3_job(
+    job_name: str,
+    test_env_namespace: str = "",
+    job_type: str = "cronjob",
+):
+    """
+    Run gen3 job (e.g., metadata-aggregate-sync).
+    """
+    job_name = start_gen3_job(job_name, test_env_namespace, job_type)
+    return check_job_pod(job_name=job_name, test_env_namespace=pytest.namespace)
+
+
+def run_gen3_jobs(jobs, test_env_namespace: str = ""):
+    """
+    Run several gen3 jobs at the same time, e.g. [("usersync", "cronjob"), ("etl", "cronjob")].
+    Returns job name => JobTimeline.
+    """
+    job_names = [
+        start_gen3_job(job_name, test_env_namespace, job_type)
+        for job_name, job_type in jobs
     ]
-    delete_explired_client_result = subprocess.run(
-        delete_explired_clients_cmd,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-        timeout=30,
+    monitors = monitor_jobs(test_env_namespace, job_names)
+    failures = []
+    for job_name, monitor in monitors.items():
+        if monitor.timeline.condition != "Complete":
+            _log_job_failure(monitor)
+            failures.append(str(monitor.timeline))
+    if failures:
+        raise Exception(f"Jobs failed: {failures}")
+    return {job_name: monitor.timeline for job_name, monitor in monitors.items()}
+
+
+def fence_delete_expired_clients():
+    result = get_fence_admin(pytest.namespace).run(
+        ["fence-create", "client-delete-expired"], timeout=30
     )
-    if not delete_explired_client_result.returncode == 0:
-        logger.info(delete_explired_client_result.stderr)
+    if not result.returncode == 0:
+        logger.info(result.stderr)
         raise Exception("Unable to delete expired clients.")
-    return delete_explired_client_result.stdout.strip()
+    return result.stdout
+
+
+def _log_job_failure(monitor):
+    logger.info(f"********** {monitor.job_name} logs begin **********")
+    if monitor.logs:
+        logger.info("\n".join(monitor.logs))
+    else:
+        # no container ran long enough to stream its logs
+        try:
+            logger.info(monitor.kube.get_logs(f"job-name={monitor.job_name}"))
+        except Exception as e:
+            logger.info(f"Unable to get {monitor.job_name} logs: {e}")
+    logger.info(f"********** {monitor.job_name} logs end **********")
 
 
 def check_job_pod(
     job_name: str,
     test_env_namespace: str = "",
 ):
-    timeout = "30m"
-    cmd = [
-        "kubectl",
-        "-n",
-        test_env_namespace,
-        "wait",
-        "--for=condition=complete",
-        f"job/{job_name}",
-        f"--timeout={timeout}",
-    ]
-    result = subprocess.run(
-        cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-    )
-    if result.returncode == 0:
+    """Wait for the job to complete, fails as soon as it fails. Returns its JobTimeline"""
+    monitor = JobMonitor(test_env_namespace, job_name)
+    timeline = monitor.run()
+    if timeline.condition == "Complete":
         logger.info(f"Job {job_name} completed successfully")
-    else:
-        logger.info(f"********** {job_name} logs begin **********")
-        cmd = [
-            "kubectl",
-            "-n",
-            pytest.namespace,
-            "logs",
-            f"job/{job_name}",
-            "--all-containers",
-            "--tail",
-            "-1",
-        ]
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        if result.returncode == 0:
-            logger.info(result.stdout.decode("utf-8"))
-        else:
-            logger.info(
-                f"Unable to get {job_name} logs: code {result.returncode}. Stderr: {result.stderr.decode('utf-8')}"
-            )
-        logger.info(f"********** {job_name} logs end **********")
-        raise Exception(
-            f"Job {job_name} failed to complete in {timeout}. Info: {result.stderr.strip()}"
-        )
+        return timeline
+    _log_job_failure(monitor)
+    raise Exception(f"Job {job_name} failed to complete. Info: {timeline}")
 
 
-@retry(times=2, delay=30, exceptions=(AssertionError,))
-def _get_fence_pod_name(test_env_namespace):
-    # Get the pod name for fence app
-    cmd = [
-        "kubectl",
-        "-n",
-        test_env_namespace,
-        "get",
-        "pods",
-        "-l",
-        "app=fence",
-        "-o",
-        'jsonpath={range .items[?(@.status.containerStatuses[0].ready==true)]}{.metadata.name}{"\\n"}{end}',
-    ]
-    logger.info(f"Running command - {' '.join(cmd)}")
-    result = subprocess.run(
-        cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-    )
-    assert result.returncode == 0
-    fence_pod_name = result.stdout.splitlines()[-1].split()[0]
-    logger.info(f"Found running fence pod - {fence_pod_name}")
-    return fence_pod_name
-
-
-def _get_delete_cmd(test_env_namespace, client_name):
-    fence_pod_name = _get_fence_pod_name(test_env_namespace)
-    return [
-        "kubectl",
-        "-n",
-        test_env_namespace,
-        "exec",
-        "-i",
-        fence_pod_name,
-        "--",
-        "fence-create",
-        "client-delete",
-        "--client",
-        client_name,
-    ]
+def _get_delete_args(client_name):
+    return ["fence-create", "client-delete", "--client", client_name]
 
 
-def _get_create_cmd(
-    test_env_namespace,
+def _get_create_args(
     arborist_policies,
     client_type,
     client_name,
@@ -303,17 +251,7 @@ def _get_create_cmd(
     scopes,
 ):
     hostname = os.getenv("HOSTNAME")
-    fence_pod_name = _get_fence_pod_name(test_env_namespace)
-    create_cmd = [
-        "kubectl",
-        "-n",
-        test_env_namespace,
-        "exec",
-        "-i",
-        fence_pod_name,
-        "--",
-        "fence-create",
-    ]
+    create_cmd = ["fence-create"]
 
     if arborist_policies:
         create_cmd = create_cmd + ["client-create", "--policies", arborist_policies]
@@ -368,566 +306,287 @@ def _get_create_cmd(
 
 
 @retry(times=2, delay=30, exceptions=(subprocess.TimeoutExpired,))
-def setup_fence_test_client(test_env_namespace, client_data):
+def setup_fence_test_client_batch(test_env_namespace, clients_data):
     """
-    Create fence test client
+    Create fence test clients, deleting existing clients with the same name first.
+    Runs in a single exec.
     """
-    client_name, username, client_type, arborist_policies, expires_in, scopes = (
-        client_data
-    )
-
-    logger.info(f"Creating fence client: {client_name}")
-
-    # Delete existing client
-    try:
-        subprocess.run(
-            _get_delete_cmd(test_env_namespace, client_name),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
+    commands = []
+    for client_data in clients_data:
+        client_name, username, client_type, arborist_policies, expires_in, scopes = (
+            client_data
         )
-    except Exception:
-        logger.info(f"Client {client_name} not present, deletion failed as expected.")
-
-    # Create the client
-    create_result = subprocess.run(
-        _get_create_cmd(
-            test_env_namespace,
-            arborist_policies,
-            client_type,
-            client_name,
-            username,
-            expires_in,
-            scopes,
-        ),
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-        timeout=60,
-    )
-    if create_result.returncode == 0:
-        client_info = create_result.stdout.strip().split("\n")[-1]
-    else:
-        raise Exception(
-            f"Unable to create client '{client_name}'. Response: {create_result.stderr.strip()}"
+        logger.info(f"Creating fence client: {client_name}")
+        commands.append(_get_delete_args(client_name))
+        commands.append(
+            _get_create_args(
+                arborist_policies,
+                client_type,
+                client_name,
+                username,
+                expires_in,
+                scopes,
+            )
         )
-    return (client_name, client_info)
+    results = get_fence_admin(test_env_namespace).run_batch(
+        commands, timeout=60 * len(clients_data)
+    )
+    clients = []
+    # results alternate between the delete and the create of each client
+    for client_data, create_result in zip(clients_data, results[1::2]):
+        client_name = client_data[0]
+        if create_result.returncode == 0:
+            client_info = create_result.stdout.split("\n")[-1]
+        else:
+            raise Exception(
+                f"Unable to create client '{client_name}'. Response: {create_result.stderr}"
+            )
+        clients.append((client_name, client_info))
+    return clients
+
+
+def setup_fence_test_client(test_env_namespace, client_data):
+    """
+    Create fence test client
+    """
+    return setup_fence_test_client_batch(test_env_namespace, [client_data])[0]
 
 
 def setup_fence_test_clients(
     clients_data: str,
     test_env_namespace: str = "",
+    max_workers: int = 8,
 ):
     """
-    Create fence clients
+    Create fence clients, in up to `max_workers` batches running in parallel.
+    Returns [(client name, client info)]
     """
-    clients_file_path = TEST_DATA_PATH_OBJECT / "fence_clients" / "clients_creds.txt"
-    rotated_clients_file_path = (
-        TEST_DATA_PATH_OBJECT / "fence_clients" / "client_rotate_creds.txt"
-    )
-    # Create clients
+    clients_data = list(clients_data)
+    batches = [clients_data[i::max_workers] for i in range(max_workers)]
     results = []
-    with ThreadPoolExecutor(max_workers=8) as executor:
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
         future_to_task = {
-            executor.submit(setup_fence_test_client, test_env_namespace, client_data)
-            for client_data in clients_data
+            executor.submit(setup_fence_test_client_batch, test_env_namespace, batch)
+            for batch in batches
+            if batch
         }
         for future in as_completed(future_to_task):
-            results.append(future.result())
-    with open(clients_file_path, "+a") as outfile:
-        for result in results:
-            outfile.write(f"{result[0]}:{result[1]}\n")
-
-    # Rotate Client
-    rotate_client_list = ["jenkins-client-tester"]
-    for client in rotate_client_list:
-        rotate_client_command = [
-            "kubectl",
-            "-n",
-            test_env_namespace,
-            "exec",
-            "-i",
-            _get_fence_pod_name(test_env_namespace),
-            "--",
-            "fence-create",
-            "client-rotate",
-            "--client",
-            client,
+            results.extend(future.result())
+    return results
+
+
+def rotate_fence_clients(client_names, test_env_namespace: str = ""):
+    """
+    Rotate the credentials of fence clients, in a single exec.
+    Returns [(client name, new client info)]
+    """
+    rotate_results = get_fence_admin(test_env_namespace).run_batch(
+        [
+            ["fence-create", "client-rotate", "--client", client]
+            for client in client_names
         ]
-        rotate_result = subprocess.run(
-            rotate_client_command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-        )
+    )
+    results = []
+    for client, rotate_result in zip(client_names, rotate_results):
         if rotate_result.returncode == 0:
-            client_info = rotate_result.stdout.strip().split("\n")[-1]
+            client_info = rotate_result.stdout.split("\n")[-1]
         else:
             raise Exception(
-                f"Unable to rotate client '{client}'. Response: {rotate_result.stderr.strip()}"
+                f"Unable to rotate client '{client}'. Response: {rotate_result.stderr}"
             )
-        with open(rotated_clients_file_path, "+a") as outfile:
-            outfile.write(f"{client}:{client_info}\n")
+        results.append((client, client_info))
+    return results
 
 
-def delete_fence_client(clients_data: str, test_env_namespace: str = ""):
+def list_fence_clients(test_env_namespace: str = ""):
     """
-    Delete client
+    The fence clients, as client name => [{"client_id": ..., "expires_at": ...}].
+    A rotated client has one entry per set of credentials.
     """
-    # Get the pod name for fence app
-    cmd = ["kubectl", "-n", test_env_namespace, "get", "pods", "-l", "app=fence"]
-    result = subprocess.run(
-        cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    result = get_fence_admin(test_env_namespace).run(
+        ["fence-create", "client-list"], timeout=60
     )
-    if result.returncode == 0:
-        fence_pod_name = result.stdout.splitlines()[-1].split()[0]
-    else:
-        raise Exception("Unable to retrieve fence-deployment pod")
+    if not result.returncode == 0:
+        raise Exception(f"Unable to list fence clients. Error: {result.stderr}")
+    clients = {}
+    # `client-list` pretty-prints each client's columns as a python dict
+    for block in re.split(r"^\{", result.stdout, flags=re.MULTILINE):
+        name = re.search(r"'name': '([^']*)'", block)
+        client_id = re.search(r"'client_id': '([^']*)'", block)
+        if not name or not client_id:
+            continue
+        expires_at = re.search(r"'expires_at': (\d+)", block)
+        clients.setdefault(name.group(1), []).append(
+            {
+                "client_id": client_id.group(1),
+                "expires_at": int(expires_at.group(1)) if expires_at else 0,
+            }
+        )
+    return clients
 
-    # Delete clients
+
+def delete_fence_client(clients_data: str, test_env_namespace: str = ""):
+    """
+    Delete client
+    """
+    # Delete existing clients if they exist, in a single exec
+    commands = []
     for line in clients_data.split("\n")[1:]:
         client_name = line.split(",")[0]
         logger.info(f"Deleting Client: {client_name}")
-
-        # Delete existing client if it exists
-        delete_cmd = [
-            "kubectl",
-            "-n",
-            test_env_namespace,
-            "exec",
-            "-i",
-            fence_pod_name,
-            "--",
-            "fence-create",
-            "client-delete",
-            "--client",
-            client_name,
-        ]
-        subprocess.run(
-            delete_cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-        )
+        commands.append(_get_delete_args(client_name))
+    try:
+        get_fence_admin(test_env_namespace).run_batch(commands)
+    except Exception as e:
+        logger.info(f"Unable to delete clients: {e}")
 
 
 def revoke_arborist_policy(username: str, policy: str, test_env_namespace: str = ""):
     """
     Revoke arborist policy
     """
-    cmd = [
-        "kubectl",
-        "-n",
-        test_env_namespace,
-        "get",
-        "pods",
-        "-l",
-        "app=fence",
-        "-o",
-        "jsonpath='{.items[0].metadata.name}'",
-    ]
-    result = subprocess.run(
-        cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-    )
-    if result.returncode == 0:
-        fence_pod_name = result.stdout.strip().replace("'", "")
-    else:
-        raise Exception("Unable to retrieve fence-deployment pod")
-
-    cmd = [
-        "kubectl",
-        "-n",
-        test_env_namespace,
-        "exec",
-        "-i",
-        fence_pod_name,
-        "--",
-        "curl",
-        "-X",
-        "DELETE",
-        f"arborist-service/user/{username}/policy/{policy}",
-    ]
-    result = subprocess.run(
-        cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    result = get_fence_admin(test_env_namespace).run(
+        [
+            "curl",
+            "-X",
+            "DELETE",
+            f"arborist-service/user/{username}/policy/{policy}",
+        ]
     )
     if not result.returncode == 0:
         raise Exception("Unable to revoke arborist policy")
 
 
+def _canonical(value):
+    """`value` with dict keys and list items in a stable order"""
+    if isinstance(value, dict):
+        return {key: _canonical(value[key]) for key in sorted(value)}
+    if isinstance(value, list):
+        return sorted(
+            (_canonical(item) for item in value),
+            key=lambda item: json.dumps(item, sort_keys=True),
+        )
+    return value
+
+
+def get_arborist_state(test_env_namespace: str = ""):
+    """Users, groups and policies in arborist, in a stable order"""
+    endpoints = ["user", "group", "policy"]
+    results = get_fence_admin(test_env_namespace).run_batch(
+        [["curl", "-sf", f"arborist-service/{endpoint}"] for endpoint in endpoints]
+    )
+    state = {}
+    for endpoint, result in zip(endpoints, results):
+        if not result.returncode == 0:
+            raise Exception(
+                f"Unable to get arborist {endpoint}s. Error: {result.stderr}"
+            )
+        state[endpoint] = _canonical(json.loads(result.stdout))
+    return state
+
+
+def _sed(pattern, replacement, text):
+    """Replace the first match of `pattern` on each line, like `sed 's/.../.../'`"""
+    return "\n".join(
+        re.sub(pattern, lambda _: replacement, line, count=1)
+        for line in text.split("\n")
+    )
+
+
 def mutate_manifest_for_guppy_test(
     test_env_namespace: str = "", indexname: str = "jenkins"
 ):
     """
     Point guppy to preferred indices
     """
-    # Command to get guppy config map
-    get_guppy_cm = f"kubectl -n {test_env_namespace} get cm manifest-guppy -o yaml > original_guppy_config.yaml"
-    get_guppy_cm_result = subprocess.run(
-        get_guppy_cm,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        shell=True,
-        text=True,
-    )
-    if not get_guppy_cm_result.returncode == 0:
+    kube = get_kube_gateway(test_env_namespace)
+    guppy_cm = kube.get("configmaps", "manifest-guppy")
+    if guppy_cm is None:
         raise Exception("Unable to get guppy confi map")
     # If indexname is set to jenkins set guppy config to default ci based changes
     if indexname == "jenkins":
-        cmd_list = [
-            'sed -i \'s/"index":"[^"]*_subject"/"index":"\'ci_subject_alias\'"/\' original_guppy_config.yaml',
-            'sed -i \'s/"index":"[^"]*_file"/"index":"\'ci_file_alias\'"/\' original_guppy_config.yaml',
-            'sed -i \'s/"config_index": "[^"]*config"/"config_index": "\'ci_configs_alias\'"/\' original_guppy_config.yaml',
+        replacements = [
+            (r'"index":"[^"]*_subject"', '"index":"ci_subject_alias"'),
+            (r'"index":"[^"]*_file"', '"index":"ci_file_alias"'),
+            (r'"config_index": "[^"]*config"', '"config_index": "ci_configs_alias"'),
         ]
-        for cmd in cmd_list:
-            cmd_result = subprocess.run(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                shell=True,
-                text=True,
-            )
-            if not cmd_result.returncode == 0:
-                raise Exception(f"Unable to execute {cmd}")
     # If indexname is not set to jenkins set guppy config to manifest based changes
     else:
-        cmd_list = [
-            f"kubectl -n {test_env_namespace} get cm etl-mapping -o jsonpath='{{.data.etlMapping\\.yaml}}' > etlMapping.yaml",
-            'sed -i \'s/"index":"[^"]*_subject_alias"/"index":"\'$(yq \'.mappings[].name\' etlMapping.yaml | grep subject)\'"/\' original_guppy_config.yaml',
-            'sed -i \'s/"index":"[^"]*_file_alias"/"index":"\'$(yq \'.mappings[].name\' etlMapping.yaml | grep -v index_file |grep file)\'"/\' original_guppy_config.yaml',
-        ]
-        for cmd in cmd_list:
-            logger.info(f"Executing command: {cmd}")
-            cmd_result = subprocess.run(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                shell=True,
-                text=True,
-            )
-            if not cmd_result.returncode == 0:
-                raise Exception(f"Unable to execute {cmd}")
-    # Run commands to set new guppy config and clear up files
-    cmd_list = [
-        f"kubectl -n {test_env_namespace} delete configmap manifest-guppy",
-        f"kubectl -n {test_env_namespace} apply -f original_guppy_config.yaml",
-        f"kubectl -n {test_env_namespace} rollout restart deployment/guppy-deployment",
-        f"kubectl -n {test_env_namespace} rollout status deployment/guppy-deployment --timeout=5m",
-        "cat original_guppy_config.yaml",
-        "rm -rf original_guppy_config.yaml",
-    ]
-    for cmd in cmd_list:
-        cmd_result = subprocess.run(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            shell=True,
-            text=True,
+        aliases = get_etl_aliases(test_env_namespace)
+        subject_alias = next(alias for alias in aliases if "subject" in alias)
+        file_alias = next(
+            alias for alias in aliases if "file" in alias and "index_file" not in alias
         )
-        if not cmd_result.returncode == 0:
-            raise Exception(f"Unable to execute {cmd}")
+        replacements = [
+            (r'"index":"[^"]*_subject_alias"', f'"index":"{subject_alias}"'),
+            (r'"index":"[^"]*_file_alias"', f'"index":"{file_alias}"'),
+        ]
+    data = guppy_cm.get("data") or {}
+    for key, value in data.items():
+        for pattern, replacement in replacements:
+            value = _sed(pattern, replacement, value)
+        data[key] = value
+    # Set new guppy config and restart guppy to pick it up
+    kube.replace("configmaps", guppy_cm)
+    logger.info(f"New guppy config: {json.dumps(data, indent=2)}")
+    kube.restart_deployment("guppy-deployment")
+    kube.wait_for_rollout("guppy-deployment", timeout=5 * 60)
 
 
 def clean_up_indices(test_env_namespace: str = ""):
     """
     Clean up indices before running the ETL tests
     """
-    kubectl_port_forward_process = subprocess.Popen(
-        [
-            "kubectl",
-            "port-forward",
-            "service/gen3-elasticsearch-master",
-            "9200:9200",
-            "-n",
-            test_env_namespace,
-        ],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-    )
-    for i in range(6):
-        line = kubectl_port_forward_process.stdout.readline().decode("utf-8").strip()
-        if "Forwarding from" in line:
-            break
-        time.sleep(5)
-    get_alias_cmd = (
-        "kubectl -n "
-        + test_env_namespace
-        + " get cm etl-mapping -o jsonpath='{.data.etlMapping\\.yaml}' | yq '.mappings[].name' | xargs"
-    )
-    get_alias_result = subprocess.run(
-        get_alias_cmd,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        shell=True,
-        text=True,
-    )
-    if not get_alias_result.returncode == 0:
-        raise Exception(
-            f"Unable to get alias. Error: {get_alias_result.stderr.strip()}"
-        )
-    logger.info(f"Stderr: {get_alias_result.stderr.strip()}")
-    logger.info(f"List of aliases: {get_alias_result.stdout.strip()}")
-    for alias_name in get_alias_result.stdout.strip().split(" "):
-        get_indices_cmd = [
-            "curl",
-            "-s",
-            f"http://localhost:9200/_cat/indices/{alias_name}*?h=index",
-        ]
-        logger.info(get_indices_cmd)
-        get_indices_result = subprocess.run(
-            get_indices_cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-        )
-
-        if not get_indices_result.returncode == 0:
-            raise Exception(
-                f"Unable to get indices code for {alias_name}. Error: {get_indices_result.stderr.strip()}"
-            )
-
-        indices = get_indices_result.stdout.strip().split("\n")
-        indices = [i for i in indices if i]
-        for index_name in indices:
-            delete_indices_cmd = [
-                "curl",
-                "-X",
-                "DELETE",
-                f"localhost:9200/{index_name}",
-            ]
-            delete_indices_result = subprocess.run(
-                delete_indices_cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-            )
-            if not delete_indices_result.returncode == 0:
-                raise Exception(
-                    f"Unable to delete index {alias_name}. Error: {delete_indices_result.stderr.strip()}"
-                )
-    os.kill(kubectl_port_forward_process.pid, 9)  # Send SIGKILL to the process
-    kubectl_port_forward_process.wait()
+    es = get_es_client(test_env_namespace)
+    aliases = get_etl_aliases(test_env_namespace)
+    indices = es.list_indices([f"{alias_name}*" for alias_name in aliases])
+    es.delete_indices(indices)
 
 
 def check_indices_after_etl(test_env_namespace: str):
     """
     Check indices after running the ETL tests
     """
-    kubectl_port_forward_process = subprocess.Popen(
-        [
-            "kubectl",
-            "port-forward",
-            "service/gen3-elasticsearch-master",
-            "9200:9200",
-            "-n",
-            test_env_namespace,
-        ],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-    )
-    for i in range(6):
-        line = kubectl_port_forward_process.stdout.readline().decode("utf-8").strip()
-        if "Forwarding from" in line:
-            break
-        time.sleep(5)
-    get_alias_cmd = (
-        "kubectl -n "
-        + test_env_namespace
-        + " get cm etl-mapping -o jsonpath='{.data.etlMapping\\.yaml}' | yq '.mappings[].name' | xargs"
-    )
-    get_alias_result = subprocess.run(
-        get_alias_cmd,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        shell=True,
-        text=True,
-    )
-    if not get_alias_result.returncode == 0:
-        raise Exception(
-            f"Unable to get alias. Error: {get_alias_result.stderr.strip()}"
-        )
-    logger.info(f"Stderr: {get_alias_result.stderr.strip()}")
-    logger.info(f"List of aliases: {get_alias_result.stdout.strip()}")
-    for alias_name in get_alias_result.stdout.strip().split(" "):
-        get_alias_status_cmd = [
-            "curl",
-            "-I",
-            "-s",
-            f"localhost:9200/_alias/{alias_name}",
-        ]
-        get_alias_status_result = subprocess.run(
-            get_alias_status_cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-        )
-
-        if not get_alias_status_result.returncode == 0:
-            raise Exception(
-                f"Unable to get status code for {alias_name}. Error: {get_alias_status_result.stderr.strip()}"
-            )
-        assert (
-            "200 OK" in get_alias_status_result.stdout.strip()
-        ), f"Expected 200 OK but got {get_alias_status_result.stdout.strip()} for {alias_name}"
+    es = get_es_client(test_env_namespace)
+    aliases = get_etl_aliases(test_env_namespace)
+    for alias_name, version in es.get_alias_versions(aliases).items():
+        assert version != -1, f"Alias {alias_name} not found"
         logger.info(f"{alias_name} is present")
-
-        get_indices_name_cmd = [
-            "curl",
-            "-X",
-            "GET",
-            "-s",
-            f"localhost:9200/_alias/{alias_name}",
-        ]
-        get_indices_name_result = subprocess.run(
-            get_indices_name_cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-        )
-        if not get_indices_name_result.returncode == 0:
-            raise Exception(
-                f"Unable to get status code for {alias_name}. Error: {get_indices_name_result.stderr.strip()}"
-            )
-        data = json.loads(get_indices_name_result.stdout.strip())
-        indices_name = list(data.keys())[0]
-        version = indices_name.split("_")[-1]
-        if version == "1":
+        if version == 1:
             logger.info(f"Index version has increased for {alias_name}")
         else:
-            logger.info(data)
             raise Exception(f"Index version has not increased for {alias_name}")
-    os.kill(kubectl_port_forward_process.pid, 9)  # Send SIGKILL to the process
-    kubectl_port_forward_process.wait()
 
 
 def check_indices_etl_version(test_env_namespace: str):
     """
     Check indices etl version
     """
-    kubectl_port_forward_process = subprocess.Popen(
-        [
-            "kubectl",
-            "port-forward",
-            "service/gen3-elasticsearch-master",
-            "9200:9200",
-            "-n",
-            test_env_namespace,
-        ],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-    )
-    for i in range(6):
-        line = kubectl_port_forward_process.stdout.readline().decode("utf-8").strip()
-        if "Forwarding from" in line:
-            break
-        time.sleep(5)
-    get_alias_cmd = (
-        "kubectl -n "
-        + test_env_namespace
-        + " get cm etl-mapping -o jsonpath='{.data.etlMapping\\.yaml}' | yq '.mappings[].name' | xargs"
-    )
-    get_alias_result = subprocess.run(
-        get_alias_cmd,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        shell=True,
-        text=True,
-    )
-    if not get_alias_result.returncode == 0:
-        raise Exception(
-            f"Unable to get alias. Error: {get_alias_result.stderr.strip()}"
-        )
-    logger.info(f"Stderr: {get_alias_result.stderr.strip()}")
-    logger.info(f"List of aliases: {get_alias_result.stdout.strip()}")
-    indices_versions = {}
-    for alias_name in get_alias_result.stdout.strip().split(" "):
-        get_alias_status_cmd = [
-            "curl",
-            "-I",
-            "-s",
-            f"localhost:9200/_alias/{alias_name}",
-        ]
-        get_alias_status_result = subprocess.run(
-            get_alias_status_cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-        )
-        logger.info(get_alias_status_result.stdout.strip())
-        if "404 Not Found" in get_alias_status_result.stdout.strip():
-            logger.info(
-                f"Unable to get status code for {alias_name}. Error: {get_alias_status_result.stdout.strip()}"
-            )
-            indices_versions[alias_name] = -1
-        else:
-            assert (
-                "200 OK" in get_alias_status_result.stdout.strip()
-            ), f"Expected 200 OK but got {get_alias_status_result.stdout.strip()} for {alias_name}"
-            logger.info(f"{alias_name} is present")
-
-            get_indices_name_cmd = [
-                "curl",
-                "-X",
-                "GET",
-                "-s",
-                f"localhost:9200/_alias/{alias_name}",
-            ]
-            get_indices_name_result = subprocess.run(
-                get_indices_name_cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-            )
-            if not get_indices_name_result.returncode == 0:
-                raise Exception(
-                    f"Unable to get status code for {alias_name}. Error: {get_indices_name_result.stderr.strip()}"
-                )
-            data = json.loads(get_indices_name_result.stdout.strip())
-            indices_name = list(data.keys())[0]
-            version = indices_name.split("_")[-1]
-            indices_versions[alias_name] = int(version)
-    os.kill(kubectl_port_forward_process.pid, 9)  # Send SIGKILL to the process
-    kubectl_port_forward_process.wait()
-    return indices_versions
+    es = get_es_client(test_env_namespace)
+    aliases = get_etl_aliases(test_env_namespace)
+    return es.get_alias_versions(aliases)
 
 
 def create_access_token(expired, username, test_env_namespace: str = ""):
     """
     Create access token
     """
-    # Get the pod name for fence app
-    cmd = ["kubectl", "-n", test_env_namespace, "get", "pods", "-l", f"app=fence"]
-    result = subprocess.run(
-        cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-    )
-    if result.returncode == 0:
-        fence_pod_name = result.stdout.splitlines()[-1].split()[0]
-    else:
-        raise Exception("Unable to retrieve fence-deployment pod")
-
-    cmd = [
-        "kubectl",
-        "exec",
-        "-n",
-        test_env_namespace,
-        "-i",
-        fence_pod_name,
-        "--",
-        "fence-create",
-        "token-create",
-        "--scopes",
-        "openid,user,fence,data,credentials,google_service_account,google_credentials",
-        "--type",
-        "access_token",
-        "--exp",
-        expired,
-        "--username",
-        username,
-    ]
-    result = subprocess.run(
-        cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    result = get_fence_admin(test_env_namespace).run(
+        [
+            "fence-create",
+            "token-create",
+            "--scopes",
+            "openid,user,fence,data,credentials,google_service_account,google_credentials",
+            "--type",
+            "access_token",
+            "--exp",
+            expired,
+            "--username",
+            username,
+        ]
     )
     if result.returncode == 0:
-        return result.stdout.strip()
+        return result.stdout
     else:
         logger.info(result.stderr)
         raise Exception("Unable to get expired access_token")
@@ -937,24 +596,9 @@ def create_link_google_test_buckets(test_env_namespace: str = ""):
     """
     Execute command for creating and linking Google test buckets
     """
-    cmd = ["kubectl", "-n", test_env_namespace, "get", "pods", "-l", "app=fence"]
-    result = subprocess.run(
-        cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-    )
-    if result.returncode == 0:
-        fence_pod_name = result.stdout.splitlines()[-1].split()[0]
-    else:
-        raise Exception("Unable to retrieve fence-deployment pod")
-    bukcet_info = {"dcf-integration-qa": "QA", "dcf-integration-test": "test"}
-    for bucket_name in bukcet_info.keys():
-        create_bucket_cmd = [
-            "kubectl",
-            "-n",
-            test_env_namespace,
-            "exec",
-            "-i",
-            fence_pod_name,
-            "--",
+    # Buckets are created before they are linked, all in a single exec
+    commands = [
+        [
             "fence-create",
             "google-bucket-create",
             "--unique-name",
@@ -962,149 +606,91 @@ def create_link_google_test_buckets(test_env_namespace: str = ""):
             "--google-project-id",
             "dcf-integration",
             "--project-auth-id",
-            bukcet_info[bucket_name],
+            GOOGLE_TEST_BUCKETS[bucket_name],
             "--public",
             "False",
         ]
-        create_bucket_result = subprocess.run(
-            create_bucket_cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-        )
-        if create_bucket_result.returncode == 0:
-            logger.info(f"Created bucket: {bucket_name}")
-        else:
-            raise Exception(f"Unable to create google bucket for {bucket_name}")
-    phs_info = {
-        "phs000179": "dcf-integration-qa",
-        "phs000178": "dcf-integration-test",
-        "phs001194": "dcf-integration-test",
-        "phs000571": "dcf-integration-test",
-    }
-    for phs in phs_info.keys():
-        link_phs_cmd = [
-            "kubectl",
-            "-n",
-            test_env_namespace,
-            "exec",
-            "-i",
-            fence_pod_name,
-            "--",
+        for bucket_name in GOOGLE_TEST_BUCKETS.keys()
+    ] + [
+        [
             "fence-create",
             "link-bucket-to-project",
             "--project_auth_id",
             phs,
             "--bucket_id",
-            phs_info[phs],
+            GOOGLE_TEST_BUCKET_PROJECTS[phs],
             "--bucket_provider",
             "google",
         ]
-        link_phs_result = subprocess.run(
-            link_phs_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-        )
+        for phs in GOOGLE_TEST_BUCKET_PROJECTS.keys()
+    ]
+    results = get_fence_admin(test_env_namespace).run_batch(commands)
+    for bucket_name, create_bucket_result in zip(GOOGLE_TEST_BUCKETS.keys(), results):
+        if create_bucket_result.returncode == 0:
+            logger.info(f"Created bucket: {bucket_name}")
+        else:
+            raise Exception(f"Unable to create google bucket for {bucket_name}")
+    for phs, link_phs_result in zip(
+        GOOGLE_TEST_BUCKET_PROJECTS.keys(), results[len(GOOGLE_TEST_BUCKETS) :]
+    ):
         if link_phs_result.returncode == 0:
             logger.info(f"Created link: {phs}")
         else:
-            raise Exception(f"Unable to create google bucket for {bucket_name}")
+            raise Exception(
+                f"Unable to create google bucket for {GOOGLE_TEST_BUCKET_PROJECTS[phs]}"
+            )
 
 
 def get_list_of_services_deployed():
-    cmd = [
-        "kubectl",
-        "-n",
-        pytest.namespace,
-        "get",
-        "deployments",
-        "-o=jsonpath='{range .items[*]}{.metadata.name}{\"\\n\"}{end}'",
-    ]
-    result = subprocess.run(
-        cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-    )
-    if result.returncode == 0:
-        return result.stdout.strip().replace("'", "")
-    else:
+    try:
+        return "\n".join(get_kube_gateway(pytest.namespace).list_deployment_names())
+    except Exception:
         raise Exception("Unable to retrieve deployed services")
 
 
 def get_enabled_sower_jobs():
-    cmd = [
-        "kubectl",
-        "-n",
-        pytest.namespace,
-        "get",
-        "cm",
-        "manifest-sower",
-        "-o=jsonpath='{.data.json}'",
-    ]
-    result = subprocess.run(
-        cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-    )
-    if result.returncode == 0:
-        return result.stdout.strip().replace("'", "")
-    else:
+    try:
+        data = get_kube_gateway(pytest.namespace).get_configmap_data("manifest-sower")
+    except Exception:
         return []
+    return (data or {}).get("json", "").strip() or []
 
 
 def is_agg_mds_enabled():
-    cmd = (
-        "kubectl describe deployment metadata-deployment -n "
-        + pytest.namespace
-        + " | grep USE_AGG_MDS"
-    )
-    result = subprocess.run(
-        cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, shell=True
-    )
-    if result.returncode == 0:
-        if "True" in result.stdout.strip():
-            return True
+    try:
+        containers = get_kube_gateway(pytest.namespace).get_deployment_containers(
+            "metadata-deployment"
+        )
+    except Exception:
+        return False
+    for container in containers:
+        for env in container.get("env") or []:
+            if env["name"] == "USE_AGG_MDS" and "True" in env.get("value", ""):
+                return True
     return False
 
 
 def check_indexs3client_job_deployed():
-    cmd = [
-        "kubectl",
-        "-n",
-        pytest.namespace,
-        "get",
-        "cm",
-        "manifest-ssjdispatcher",
-        "-o=jsonpath='{.data.job_images}'",
-    ]
-    result = subprocess.run(
-        cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-    )
-    if result.returncode == 0 and "indexs3client" in result.stdout.strip():
-        return True
-    else:
+    try:
+        data = get_kube_gateway(pytest.namespace).get_configmap_data(
+            "manifest-ssjdispatcher"
+        )
+    except Exception:
         return False
+    return "indexs3client" in (data or {}).get("job_images", "")
 
 
 def is_google_enabled():
-    cmd = [
-        "kubectl",
-        "-n",
-        pytest.namespace,
-        "get",
-        "cm",
-        "manifest-global",
-        "-o=jsonpath='{.data}'",
-    ]
-    result = subprocess.run(
-        cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-    )
-    if result.returncode == 0:
-        metadata_output = json.loads(result.stdout.strip().replace("'", ""))
-        if metadata_output.get("google_enabled", "").lower() == "true":
-            return True
-        else:
-            return False
-    else:
+    try:
+        data = get_kube_gateway(pytest.namespace).get_configmap_data("manifest-global")
+    except Exception:
         return False
+    return (data or {}).get("google_enabled", "").lower() == "true"
 
 
-def skip_portal_tests():
-    deployed_services = get_list_of_services_deployed()
+def skip_portal_tests(deployed_services=None):
+    if deployed_services is None:
+        deployed_services = get_list_of_services_deployed()
     if "data-ecosystem-portal" in deployed_services:
         return True
     if "dataguids" in deployed_services:
@@ -1115,22 +701,20 @@ def skip_portal_tests():
 
 
 def is_register_user_enabled(test_env_namespace: str = ""):
-    cmd = (
-        "kubectl get cm manifest-fence -o yaml -n "
-        + test_env_namespace
-        + " | grep REGISTER_USERS_ON"
-    )
-    result = subprocess.run(
-        cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, shell=True
-    )
-    if result.returncode == 0:
-        if "true" in result.stdout.strip():
-            return True
+    try:
+        data = get_kube_gateway(test_env_namespace).get_configmap_data("manifest-fence")
+    except Exception:
+        return False
+    for value in (data or {}).values():
+        for line in value.splitlines():
+            if "REGISTER_USERS_ON" in line and "true" in line:
+                return True
     return False
 
 
-def is_frontend_url():
-    deployed_services = get_list_of_services_deployed()
+def is_frontend_url(deployed_services=None):
+    if deployed_services is None:
+        deployed_services = get_list_of_services_deployed()
     if (
         "frontend-framework" in deployed_services
         and "portal" not in pytest.root_url_portal
@@ -1142,34 +726,25 @@ def is_frontend_url():
 
 def get_ff_commons_info():
     logger.info("Downloading commons-frontend-app repo")
-    cmd = [
-        "kubectl",
-        "get",
-        "deployment",
-        "frontend-framework-deployment",
-        "-o",
-        "jsonpath='{.spec.template.spec.containers[*].image}'",
-        "-n",
-        pytest.namespace,
-    ]
-    result = subprocess.run(
-        cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-    )
-    if result.returncode == 0:
-        repo_name = result.stdout.strip().split("/")[-1].split(":")[0]
-        branch_name = (
-            result.stdout.strip()
-            .split("/")[-1]
-            .split(":")[-1]
-            .replace("_test", "")
-            .replace("_", "/", 1)
-            .strip()
-            .replace("'", "")
+    try:
+        containers = get_kube_gateway(pytest.namespace).get_deployment_containers(
+            "frontend-framework-deployment"
         )
-        target_dir = "commons-frontend-app"
-        return repo_name, branch_name, target_dir
-    else:
+    except Exception:
+        containers = []
+    if not containers:
         raise Exception("Unable to get frontend-framework image name")
+    image = " ".join(container["image"] for container in containers)
+    repo_name = image.split("/")[-1].split(":")[0]
+    branch_name = (
+        image.split("/")[-1]
+        .split(":")[-1]
+        .replace("_test", "")
+        .replace("_", "/", 1)
+        .strip()
+    )
+    target_dir = "commons-frontend-app"
+    return repo_name, branch_name, target_dir
 
 
 def download_frontend_commons_app_repo(repo_name, branch_name, target_dir):
@@ -1188,23 +763,31 @@ def download_frontend_commons_app_repo(repo_name, branch_name, target_dir):
     )
 
 
+@session_cached("service_image_tag")
+def get_service_image_tag(service_name):
+    """
+    Image tag of `service_name` in the helm values of the namespace, None if the values
+    don't set it (the chart's default image is used)
+    """
+    values = get_kube_gateway(pytest.namespace).get_helm_values(pytest.namespace)
+    if values is None:
+        raise Exception(f"Helm release {pytest.namespace} not found")
+    tag = ((values.get(service_name) or {}).get("image") or {}).get("tag")
+    return str(tag) if tag is not None else None
+
+
 def service_version_greater_than(service_name, min_release_version, min_sem_version):
     """
     This function determines if a test can run based on the minimum supported version.
     min_release_version -> CALVER e.g. 2026.04
     min_sem_version -> SEMVER e.g. 13.1.0
     """
-    cmd = f"helm get values {pytest.namespace} -n {pytest.namespace} -o yaml | yq '.{service_name}.image.tag'"
-    result = subprocess.run(
-        cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, shell=True
-    )
-    if result.returncode == 0:
-        current_version = result.stdout.strip().replace('"', "")
-    else:
-        logger.info(f"Unable to run command. Error: {result.stderr}")
-        logger.info(f"Unable to run command. Output: {result.stdout}")
+    current_version = get_service_image_tag(service_name)
     logger.info(f"Current Version: {current_version}")
     logger.info(f"MinVersion: {min_release_version}")
+    if current_version is None:
+        # no pinned tag, so the test is executed
+        return False
     try:
         parsed_current = Version(current_version)
         CALVER_RE = re.compile(r"^\d{4}\.\d{2}(\.\d+)?$")
@@ -0,0 +1,134 @@
+import os
+import threading
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+from utils import logger
+
+# Number of per-host connection pools kept by each adapter
+POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))
+# Maximum number of connections kept open per host
+POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "20"))
+# Block instead of opening extra connections once a host's pool is full
+POOL_BLOCK = os.getenv("HTTP_POOL_BLOCK", "false").lower() == "true"
+MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", "0.5"))
+# Status codes retried for idempotent requests. Empty by default so that tests
+# asserting on error responses still get the original status code
+RETRY_STATUSES = [
+    int(status) for status in os.getenv("HTTP_RETRY_STATUSES", "").split(",") if status
+]
+# Per-host connection limits, e.g. "qa.planx-pla.net=8,s3.amazonaws.com=4"
+HOST_POOL_LIMITS = os.getenv("HTTP_HOST_POOL_LIMITS", "")
+
+_stats = {"requests": 0, "connections": 0}
+_stats_lock = threading.Lock()
+_session = None
+_session_lock = threading.Lock()
+
+
+def _count(key):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        _count("connections")
+        return super()._new_conn()
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        _count("connections")
+        return super()._new_conn()
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter which keeps track of how many requests reused an open connection"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool,
+        }
+
+    def send(self, request, **kwargs):
+        _count("requests")
+        return super().send(request, **kwargs)
+
+
+def _get_retry_policy():
+    return Retry(
+        total=MAX_RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+        raise_on_status=False,
+    )
+
+
+def _get_adapter(pool_maxsize=POOL_MAXSIZE, pool_block=POOL_BLOCK):
+    return PooledHTTPAdapter(
+        pool_connections=POOL_CONNECTIONS,
+        pool_maxsize=pool_maxsize,
+        pool_block=pool_block,
+        max_retries=_get_retry_policy(),
+    )
+
+
+def create_session():
+    """Create a keep-alive session with the pool size, retry and per-host limits configured"""
+    session = requests.Session()
+    # Don't keep cookies between calls, requests made by different users and
+    # unauthenticated requests must stay independent of each other
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    adapter = _get_adapter()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    for host_limit in HOST_POOL_LIMITS.split(","):
+        if not host_limit.strip():
+            continue
+        host, limit = host_limit.strip().split("=")
+        set_host_pool_limit(host, int(limit), session=session)
+    return session
+
+
+def set_host_pool_limit(host, limit, session=None):
+    """Cap the number of concurrent connections opened to `host`"""
+    session = session or get_session()
+    adapter = _get_adapter(pool_maxsize=limit, pool_block=True)
+    session.mount(f"https://{host}", adapter)
+    session.mount(f"http://{host}", adapter)
+
+
+def get_session():
+    """
+    Get the session shared by every service wrapper in this process.
+    Each xdist worker is its own process, so this is one session per worker.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+
+def get_connection_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["reused"] = max(stats["requests"] - stats["connections"], 0)
+    return stats
+
+
+def log_connection_stats():
+    stats = get_connection_stats()
+    logger.info(
+        f"HTTP session stats: {stats['requests']} requests over {stats['connections']} "
+        f"connections ({stats['reused']} reused a kept-alive connection)"
+    )
@@ -0,0 +1,182 @@
+import copy
+import json
+import os
+
+from utils import TEST_DATA_PATH_OBJECT, logger
+from utils.es_admin import get_es_client
+from utils.k8s import get_kube_gateway
+from utils.port_forward import port_forwards
+
+CI_INDEX_DATA_PATH_OBJECT = (
+    TEST_DATA_PATH_OBJECT / "test_setup" / "ci_es_setup" / "index_data"
+)
+# Give each xdist worker its own copy of the CI indices and its own guppy, so the suites
+# using them don't need to run on the same worker
+ES_INDEX_SET_PER_WORKER = os.getenv("ES_INDEX_SET_PER_WORKER", "true").lower() == "true"
+# Index types of the CI data => mapping file, bulk file
+CI_INDEX_TYPES = {
+    "subject": ("subject_mapping.json", "subject_batch.ndjson"),
+    "file": ("file_mapping.json", "file_batch.ndjson"),
+    "imaging_study": ("imaging_study_mapping.json", "imaging_study_batch.ndjson"),
+    "configs": ("array_mapping.json", None),
+}
+GUPPY_DEPLOYMENT = "guppy-deployment"
+GUPPY_CONFIGMAP = "manifest-guppy"
+GUPPY_ROLLOUT_TIMEOUT_SECS = 5 * 60
+
+
+class IndexSet(object):
+    """
+    The CI indices under a prefix: `<prefix>_<type>_1` indices behind `<prefix>_<type>_alias`
+    aliases, loaded from `test_data/test_setup/ci_es_setup` (what ci_setup.sh does for the
+    "ci" prefix).
+
+    A prefixed index set also gets its own guppy deployment (`guppy-<prefix>`), a copy of
+    guppy-deployment whose config points to the prefixed aliases, reached through a
+    port-forward. The "ci" index set is the one served by the environment's guppy.
+    """
+
+    def __init__(self, test_env_namespace, prefix="ci"):
+        self.namespace = test_env_namespace
+        self.prefix = prefix
+        self.guppy_name = "guppy-" + prefix.replace("_", "-")
+        self.guppy_port = None
+
+    @property
+    def is_shared(self):
+        return self.prefix == "ci"
+
+    def index(self, index_type):
+        return f"{self.prefix}_{index_type}_1"
+
+    def alias(self, index_type):
+        return f"{self.prefix}_{index_type}_alias"
+
+    @property
+    def guppy_url(self):
+        """Base URL of the guppy serving this index set, None for the environment's guppy"""
+        if self.is_shared:
+            return None
+        return port_forwards.get(
+            self.namespace, f"deployment/{self.guppy_name}", self.guppy_port
+        ).url
+
+    def load(self):
+        """(Re)create the indices and their aliases and index the CI documents"""
+        es = get_es_client(self.namespace)
+        es.delete_indices(es.list_indices([f"{self.prefix}_*"]))
+        for index_type, (mapping_file, bulk_file) in CI_INDEX_TYPES.items():
+            index = self.index(index_type)
+            es.create_index(
+                index,
+                json.loads((CI_INDEX_DATA_PATH_OBJECT / mapping_file).read_text()),
+            )
+            if bulk_file:
+                es.bulk(index, (CI_INDEX_DATA_PATH_OBJECT / bulk_file).read_text())
+        es.update_aliases(
+            [
+                {
+                    "add": {
+                        "index": self.index(index_type),
+                        "alias": self.alias(index_type),
+                    }
+                }
+                for index_type in CI_INDEX_TYPES
+            ]
+        )
+        logger.info(f"Loaded index set '{self.prefix}'")
+
+    def guppy_config(self, config):
+        """The guppy `config` (content of the manifest-guppy configmap) pointed to this index set"""
+        try:
+            config = json.loads(config)
+        except ValueError:  # not the guppy config
+            return config
+        if not isinstance(config, dict):
+            return json.dumps(config)
+        for index in config.get("indices", []):
+            if index.get("type") in CI_INDEX_TYPES:
+                index["index"] = self.alias(index["type"])
+        if "config_index" in config:
+            config["config_index"] = self.alias("configs")
+        return json.dumps(config)
+
+    def _guppy_deployment(self, deployment):
+        labels = {"app": self.guppy_name, "gen3-code-vigil/index-set": self.prefix}
+        spec = copy.deepcopy(deployment["spec"])
+        spec["replicas"] = 1
+        spec["selector"] = {"matchLabels": labels}
+        # the labels of guppy-deployment would add the pods to guppy-service
+        spec["template"]["metadata"] = {"labels": labels}
+        pod_spec = spec["template"]["spec"]
+        for volume in pod_spec.get("volumes", []):
+            if (volume.get("configMap") or {}).get("name") == GUPPY_CONFIGMAP:
+                volume["configMap"]["name"] = self.guppy_name
+        ports = pod_spec["containers"][0].get("ports") or [{"containerPort": 80}]
+        self.guppy_port = ports[0]["containerPort"]
+        return {
+            "apiVersion": "apps/v1",
+            "kind": "Deployment",
+            "metadata": {"name": self.guppy_name, "labels": labels},
+            "spec": spec,
+        }
+
+    def deploy_guppy(self):
+        """Start the guppy of this index set and wait until it is ready"""
+        kube = get_kube_gateway(self.namespace)
+        configmap = kube.get("configmaps", GUPPY_CONFIGMAP)
+        deployment = kube.get("deployments", GUPPY_DEPLOYMENT)
+        if configmap is None or deployment is None:
+            raise Exception(
+                f"Unable to copy guppy: {GUPPY_CONFIGMAP} or {GUPPY_DEPLOYMENT} not found"
+            )
+        # left over by an interrupted session
+        self.delete_guppy()
+        kube.create(
+            "configmaps",
+            {
+                "apiVersion": "v1",
+                "kind": "ConfigMap",
+                "metadata": {"name": self.guppy_name},
+                "data": {
+                    key: self.guppy_config(value)
+                    for key, value in (configmap.get("data") or {}).items()
+                },
+            },
+        )
+        kube.create("deployments", self._guppy_deployment(deployment))
+        kube.wait_for_rollout(self.guppy_name, timeout=GUPPY_ROLLOUT_TIMEOUT_SECS)
+        logger.info(f"Guppy '{self.guppy_name}' is serving index set '{self.prefix}'")
+
+    def delete_guppy(self):
+        kube = get_kube_gateway(self.namespace)
+        kube.delete("deployments", self.guppy_name)
+        kube.delete("configmaps", self.guppy_name)
+
+    def setup(self):
+        """Load the indices and start their guppy, nothing to do for the "ci" index set"""
+        if self.is_shared:
+            return
+        self.load()
+        self.deploy_guppy()
+
+    def teardown(self):
+        if self.is_shared:
+            return
+        try:
+            self.delete_guppy()
+            es = get_es_client(self.namespace)
+            es.delete_indices(es.list_indices([f"{self.prefix}_*"]))
+        except Exception as e:
+            logger.info(f"Unable to clean up index set '{self.prefix}': {e}")
+
+
+def get_worker_index_set(test_env_namespace):
+    """
+    The index set of this xdist worker: `ci_<worker id>`, or the shared "ci" index set
+    when not running with xdist or when ES_INDEX_SET_PER_WORKER is disabled
+    """
+    worker_id = os.getenv("PYTEST_XDIST_WORKER")
+    if not ES_INDEX_SET_PER_WORKER or not worker_id:
+        return IndexSet(test_env_namespace)
+    return IndexSet(test_env_namespace, prefix=f"ci_{worker_id}")
@@ -0,0 +1,295 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from utils import logger
+from utils.k8s import get_job_condition, get_kube_gateway
+
+JOB_TIMEOUT_SECS = int(os.getenv("JOB_TIMEOUT_SECS", str(30 * 60)))
+# Kubernetes retries image pulls forever, give up on a job after this long
+JOB_IMAGE_PULL_TIMEOUT_SECS = int(os.getenv("JOB_IMAGE_PULL_TIMEOUT_SECS", "300"))
+# Container waiting reasons which don't resolve by themselves
+FATAL_WAITING_REASONS = {
+    "CreateContainerConfigError",
+    "CreateContainerError",
+    "ErrImageNeverPull",
+    "InvalidImageName",
+}
+IMAGE_PULL_WAITING_REASONS = {"ErrImagePull", "ImagePullBackOff"}
+# Number of log lines kept to report a failed job
+LOG_TAIL_LINES = 200
+
+
+def _parse_time(value):
+    return datetime.fromisoformat(value).timestamp() if value else None
+
+
+class JobTimeline(object):
+    """
+    Phases of a job run, as epoch timestamps: job `created`, first pod `scheduled`,
+    first container `started` (once images are pulled) and job `finished`
+    """
+
+    def __init__(self, job_name):
+        self.job_name = job_name
+        self.created = None
+        self.scheduled = None
+        self.started = None
+        self.finished = None
+        # "Complete", "Failed", or None if the job was still running
+        self.condition = None
+        self.reason = None
+        # one pod per attempt
+        self.pods = []
+
+    @property
+    def durations(self):
+        """Seconds spent in each phase"""
+
+        def between(start, end):
+            if start is None or end is None:
+                return None
+            return round(end - start, 1)
+
+        return {
+            "scheduling": between(self.created, self.scheduled),
+            "image_pull": between(self.scheduled, self.started),
+            "run": between(self.started, self.finished),
+            "total": between(self.created, self.finished),
+        }
+
+    def to_dict(self):
+        return {
+            "job_name": self.job_name,
+            "condition": self.condition,
+            "reason": self.reason,
+            "attempts": len(self.pods),
+            "durations": self.durations,
+        }
+
+    def __str__(self):
+        durations = ", ".join(
+            f"{phase} {duration}s"
+            for phase, duration in self.durations.items()
+            if duration is not None
+        )
+        return (
+            f"Job {self.job_name}: {self.condition or 'still running'}"
+            + (f" ({self.reason})" if self.reason else "")
+            + f" after {len(self.pods)} attempt(s) - {durations}"
+        )
+
+
+class JobMonitor(object):
+    """
+    Follows a job through the events of the job and of its pods until it completes.
+
+    Fails as soon as the job fails (e.g. BackoffLimitExceeded) or one of its containers
+    can't start, instead of waiting for the timeout. The container logs are streamed
+    as they are written, and the last lines are kept to report failures.
+    """
+
+    def __init__(
+        self, test_env_namespace, job_name, timeout=JOB_TIMEOUT_SECS, stream_logs=True
+    ):
+        self.kube = get_kube_gateway(test_env_namespace)
+        self.job_name = job_name
+        self.timeout = timeout
+        self.stream_logs = stream_logs
+        self.timeline = JobTimeline(job_name)
+        self.logs = deque(maxlen=LOG_TAIL_LINES)
+        self._events = queue.Queue()
+        self._stop = threading.Event()
+        self._log_threads = {}
+        self._log_streams = []
+        self._image_pull_errors = {}
+
+    def _watch(self, kind, **selectors):
+        try:
+            for event_type, obj in self.kube.stream_events(
+                kind, self.timeout, stop=self._stop, **selectors
+            ):
+                self._events.put((kind, event_type, obj))
+        except Exception as e:
+            self._events.put((kind, "ERROR", e))
+
+    def _start_following_logs(self, pod_name, container):
+        prefix = f"[{self.job_name}/{pod_name}/{container}]"
+        try:
+            stream = self.kube.follow_logs(pod_name, container)
+        except Exception as e:
+            logger.info(f"{prefix} Unable to stream logs: {e}")
+            return
+        # kept so the stream can be closed when the monitor is done
+        self._log_streams.append(stream)
+        thread = threading.Thread(
+            target=self._follow_logs, args=(prefix, stream), daemon=True
+        )
+        thread.start()
+        self._log_threads[(pod_name, container)] = thread
+
+    def _follow_logs(self, prefix, stream):
+        try:
+            for line in stream:
+                self.logs.append(f"{prefix} {line}")
+                logger.debug(f"{prefix} {line}")
+        except Exception as e:
+            # including the error raised when the stream is closed while reading
+            if not self._stop.is_set():
+                logger.info(f"{prefix} Unable to stream logs: {e}")
+
+    def _on_job(self, job):
+        if self.timeline.created is None:
+            self.timeline.created = _parse_time(job["metadata"]["creationTimestamp"])
+        condition = get_job_condition(job)
+        if condition is None:
+            return None
+        for job_condition in job["status"]["conditions"]:
+            if job_condition["type"] == condition:
+                self.timeline.finished = _parse_time(
+                    job_condition.get("lastTransitionTime")
+                )
+                if condition == "Failed":
+                    self.timeline.reason = (
+                        f"{job_condition.get('reason')}: {job_condition.get('message')}"
+                    )
+        if condition == "Complete" and job["status"].get("completionTime"):
+            self.timeline.finished = _parse_time(job["status"]["completionTime"])
+        return condition
+
+    def _on_pod(self, pod):
+        """Record the phases of the pod, returns the error if it can't run"""
+        pod_name = pod["metadata"]["name"]
+        if pod_name not in self.timeline.pods:
+            self.timeline.pods.append(pod_name)
+        status = pod.get("status") or {}
+        for condition in status.get("conditions") or []:
+            if (
+                condition["type"] == "PodScheduled"
+                and condition["status"] == "True"
+                and self.timeline.scheduled is None
+            ):
+                self.timeline.scheduled = _parse_time(
+                    condition.get("lastTransitionTime")
+                )
+        container_statuses = (status.get("initContainerStatuses") or []) + (
+            status.get("containerStatuses") or []
+        )
+        for container_status in container_statuses:
+            container = container_status["name"]
+            state = container_status.get("state") or {}
+            ran = state.get("running") or state.get("terminated")
+            if ran:
+                if self.timeline.started is None:
+                    self.timeline.started = _parse_time(ran.get("startedAt"))
+                if self.stream_logs and (pod_name, container) not in self._log_threads:
+                    self._start_following_logs(pod_name, container)
+            waiting = state.get("waiting") or {}
+            reason = waiting.get("reason")
+            if reason in FATAL_WAITING_REASONS:
+                return f"{pod_name}/{container} {reason}: {waiting.get('message')}"
+            if reason in IMAGE_PULL_WAITING_REASONS:
+                self._image_pull_errors.setdefault(
+                    (pod_name, container), (time.time(), waiting.get("message"))
+                )
+            else:
+                self._image_pull_errors.pop((pod_name, container), None)
+        return None
+
+    def _check_image_pulls(self):
+        for (pod_name, container), (since, message) in self._image_pull_errors.items():
+            if time.time() - since > JOB_IMAGE_PULL_TIMEOUT_SECS:
+                return f"{pod_name}/{container} unable to pull image for {JOB_IMAGE_PULL_TIMEOUT_SECS}s: {message}"
+        return None
+
+    def run(self):
+        """Wait until the job completes or fails, and return its JobTimeline"""
+        job = self.kube.get("jobs", self.job_name)
+        if job is None:
+            raise Exception(f"Job {self.job_name} not found")
+        self.timeline.condition = self._on_job(job)
+        watchers = [
+            threading.Thread(
+                target=self._watch,
+                args=("jobs",),
+                kwargs={"field_selector": f"metadata.name={self.job_name}"},
+                daemon=True,
+            ),
+            threading.Thread(
+                target=self._watch,
+                args=("pods",),
+                kwargs={"label_selector": f"job-name={self.job_name}"},
+                daemon=True,
+            ),
+        ]
+        for watcher in watchers:
+            watcher.start()
+        try:
+            return self._wait()
+        finally:
+            self._stop.set()
+            # `kubectl logs -f` of a container still running (timeout, container
+            # that can't start...) would outlive the monitor
+            for stream in self._log_streams:
+                stream.close()
+
+    def _wait(self):
+        deadline = time.time() + self.timeout
+        try:
+            while self.timeline.condition is None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    self.timeline.reason = f"still running after {self.timeout}s"
+                    break
+                try:
+                    kind, event_type, obj = self._events.get(timeout=min(remaining, 5))
+                except queue.Empty:
+                    error = self._check_image_pulls()
+                else:
+                    if event_type == "ERROR":
+                        raise obj
+                    if kind == "jobs":
+                        if event_type == "DELETED":
+                            self.timeline.condition = "Failed"
+                            self.timeline.reason = "job deleted"
+                            break
+                        self.timeline.condition = self._on_job(obj)
+                        continue
+                    error = self._on_pod(obj) or self._check_image_pulls()
+                if error:
+                    self.timeline.condition = "Failed"
+                    self.timeline.reason = error
+        finally:
+            self._stop.set()
+        # the job events may arrive before the last pod events
+        try:
+            for pod in self.kube.list_pods(label_selector=f"job-name={self.job_name}"):
+                self._on_pod(pod)
+        except Exception as e:
+            logger.info(f"Unable to get the pods of job {self.job_name}: {e}")
+        # let the log streams of the finished job catch up with the last lines
+        logs_deadline = time.time() + (5 if self.timeline.condition else 0)
+        for thread in list(self._log_threads.values()):
+            thread.join(timeout=max(0, logs_deadline - time.time()))
+        logger.info(str(self.timeline))
+        return self.timeline
+
+
+def monitor_jobs(test_env_namespace, job_names, timeout=JOB_TIMEOUT_SECS):
+    """
+    Monitor several jobs at the same time, e.g. usersync and ETL.
+    Returns job name => JobMonitor once they are all done.
+    """
+    monitors = {
+        job_name: JobMonitor(test_env_namespace, job_name, timeout)
+        for job_name in job_names
+    }
+    with ThreadPoolExecutor(max_workers=max(1, len(monitors))) as executor:
+        futures = [executor.submit(monitor.run) for monitor in monitors.values()]
+        for future in futures:
+            future.result()
+    return monitors
@@ -0,0 +1,823 @@
+import base64
+import gzip
+import json
+import os
+import subprocess
+import threading
+import time
+
+from utils import logger
+
+try:
+    from kubernetes import client as k8s_client
+    from kubernetes import config as k8s_config
+    from kubernetes import watch as k8s_watch
+    from kubernetes.client.rest import ApiException
+    from kubernetes.stream import stream as k8s_stream
+except ImportError:
+    k8s_client = None
+
+# Talk to this API server instead of the kubeconfig one, e.g. a local fake API server
+KUBE_API_URL = os.getenv("KUBE_API_URL")
+# "client" goes through the python kubernetes client, "kubectl" spawns kubectl
+KUBE_BACKEND = os.getenv("KUBE_BACKEND", "client")
+# How often a `kubectl get --watch` checks whether its consumer stopped waiting
+KUBECTL_WATCH_CHECK_SECS = 0.5
+# Watches are restarted this often, so waiting can be interrupted
+WATCH_WINDOW_SECS = 10
+# Size of the HTTP connection pool shared by every thread of the process
+KUBE_CONNECTION_POOL_SIZE = int(os.getenv("KUBE_CONNECTION_POOL_SIZE", "16"))
+
+# kind => (API group class, namespaced resource name of the generated methods)
+RESOURCES = {
+    "configmaps": ("CoreV1Api", "config_map"),
+    "events": ("CoreV1Api", "event"),
+    "pods": ("CoreV1Api", "pod"),
+    "secrets": ("CoreV1Api", "secret"),
+    "deployments": ("AppsV1Api", "deployment"),
+    "jobs": ("BatchV1Api", "job"),
+    "cronjobs": ("BatchV1Api", "cron_job"),
+}
+
+_configuration = None
+_api_client = None
+_client_lock = threading.Lock()
+_gateways = {}
+_gateways_lock = threading.Lock()
+
+
+def _get_api_client():
+    """ApiClient shared by the whole process, so connections are reused"""
+    global _configuration, _api_client
+    with _client_lock:
+        if _api_client is None:
+            if KUBE_API_URL:
+                _configuration = k8s_client.Configuration(host=KUBE_API_URL)
+            else:
+                _configuration = k8s_client.Configuration()
+                try:
+                    k8s_config.load_incluster_config(
+                        client_configuration=_configuration
+                    )
+                except k8s_config.ConfigException:
+                    k8s_config.load_kube_config(client_configuration=_configuration)
+            _configuration.connection_pool_maxsize = KUBE_CONNECTION_POOL_SIZE
+            _api_client = k8s_client.ApiClient(_configuration)
+        return _api_client
+
+
+class ExecResult(object):
+    def __init__(self, returncode, stdout, stderr):
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+
+    def __repr__(self):
+        return f"ExecResult(returncode={self.returncode})"
+
+
+class LogStream(object):
+    """
+    Iterable over the lines of a followed log. `close` can be called from another
+    thread than the one iterating, and ends the iteration.
+    """
+
+    def __init__(self, lines, close):
+        self._lines = lines
+        self._close = close
+
+    def __iter__(self):
+        return self._lines
+
+    def close(self):
+        try:
+            self._close()
+        except Exception as e:
+            logger.debug(f"Unable to close log stream: {e}")
+
+
+class KubeGateway(object):
+    """
+    Kubernetes operations on a test environment namespace.
+
+    Goes through the python kubernetes client, with one connection pool for the whole
+    process and watches to wait on jobs, or through `kubectl ... -o json` when
+    KUBE_BACKEND is "kubectl". Both backends return the objects as the JSON dicts of the
+    Kubernetes API (camelCase keys), so callers don't depend on the backend.
+    """
+
+    def __init__(self, test_env_namespace, backend=KUBE_BACKEND):
+        self.namespace = test_env_namespace
+        self.backend = backend
+        if self.backend == "client" and k8s_client is None:
+            raise Exception("KUBE_BACKEND is 'client' but kubernetes is not installed")
+
+    ############################
+    # Backends
+    ############################
+
+    def _api(self, group):
+        return getattr(k8s_client, group)(_get_api_client())
+
+    def _call(self, kind, verb, *args, **kwargs):
+        """
+        Call the `verb` (list, read, delete...) method of `kind` and return the raw JSON
+        response, without deserializing it into the client's models
+        """
+        group, resource = RESOURCES[kind]
+        method = getattr(self._api(group), f"{verb}_namespaced_{resource}")
+        res = method(*args, _preload_content=False, **kwargs)
+        return json.loads(res.data or "null")
+
+    def _kubectl(self, args, namespace=None, input=None, timeout=None):
+        cmd = ["kubectl", "-n", namespace or self.namespace] + args
+        return subprocess.run(
+            cmd,
+            input=input,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            timeout=timeout,
+        )
+
+    ############################
+    # Generic objects
+    ############################
+
+    def get(self, kind, name, namespace=None):
+        """The `kind` object called `name`, or None if it doesn't exist"""
+        namespace = namespace or self.namespace
+        if self.backend == "client":
+            try:
+                return self._call(kind, "read", name, namespace)
+            except ApiException as e:
+                if e.status == 404:
+                    return None
+                raise Exception(f"Unable to get {kind}/{name}. Error: {e.body}")
+        result = self._kubectl(["get", kind, name, "-o", "json"], namespace=namespace)
+        if result.returncode != 0:
+            if "NotFound" in result.stderr:
+                return None
+            raise Exception(f"Unable to get {kind}/{name}. Error: {result.stderr}")
+        return json.loads(result.stdout)
+
+    def list(self, kind, label_selector=None, field_selector=None, namespace=None):
+        """The `kind` objects matching the selectors"""
+        namespace = namespace or self.namespace
+        if self.backend == "client":
+            kwargs = {}
+            if label_selector:
+                kwargs["label_selector"] = label_selector
+            if field_selector:
+                kwargs["field_selector"] = field_selector
+            try:
+                return self._call(kind, "list", namespace, **kwargs)["items"]
+            except ApiException as e:
+                raise Exception(f"Unable to list {kind}. Error: {e.body}")
+        args = ["get", kind, "-o", "json"]
+        if label_selector:
+            args += ["-l", label_selector]
+        if field_selector:
+            args += ["--field-selector", field_selector]
+        result = self._kubectl(args, namespace=namespace)
+        if result.returncode != 0:
+            raise Exception(f"Unable to list {kind}. Error: {result.stderr}")
+        return json.loads(result.stdout)["items"]
+
+    def create(self, kind, body):
+        if self.backend == "client":
+            try:
+                return self._call(kind, "create", self.namespace, body)
+            except ApiException as e:
+                raise Exception(
+                    f"Unable to create {kind}/{body['metadata']['name']}. Error: {e.body}"
+                )
+        result = self._kubectl(
+            ["create", "-o", "json", "-f", "-"], input=json.dumps(body)
+        )
+        if result.returncode != 0:
+            raise Exception(
+                f"Unable to create {kind}/{body['metadata']['name']}. Error: {result.stderr}"
+            )
+        return json.loads(result.stdout)
+
+    def delete(self, kind, name, wait=True, timeout=120):
+        """
+        Delete the `kind` object called `name` and its dependents (e.g. the pods of
+        a job). With `wait`, return once it is gone.
+        """
+        if self.backend == "client":
+            try:
+                self._call(
+                    kind,
+                    "delete",
+                    name,
+                    self.namespace,
+                    body={"propagationPolicy": "Background"},
+                )
+            except ApiException as e:
+                if e.status == 404:
+                    return
+                raise Exception(f"Unable to delete {kind}/{name}. Error: {e.body}")
+            start = time.time()
+            while wait and self.get(kind, name) is not None:
+                if time.time() - start > timeout:
+                    raise Exception(f"{kind}/{name} was not deleted in {timeout}s")
+                time.sleep(0.5)
+            return
+        result = self._kubectl(
+            [
+                "delete",
+                kind,
+                name,
+                "--ignore-not-found",
+                f"--wait={str(wait).lower()}",
+                f"--timeout={timeout}s",
+            ]
+        )
+        if result.returncode != 0:
+            raise Exception(f"Unable to delete {kind}/{name}. Error: {result.stderr}")
+
+    def list_resource_versions(self, kinds):
+        """Map "kind/name" => resourceVersion for every object of the `kinds`"""
+        versions = {}
+        for kind in kinds:
+            for item in self.list(kind):
+                versions[f"{kind}/{item['metadata']['name']}"] = item["metadata"][
+                    "resourceVersion"
+                ]
+        return versions
+
+    def replace(self, kind, body):
+        """Replace the `kind` object by `body`, which must have its current resourceVersion"""
+        name = body["metadata"]["name"]
+        if self.backend == "client":
+            try:
+                return self._call(kind, "replace", name, self.namespace, body)
+            except ApiException as e:
+                raise Exception(f"Unable to replace {kind}/{name}. Error: {e.body}")
+        result = self._kubectl(
+            ["replace", "-o", "json", "-f", "-"], input=json.dumps(body)
+        )
+        if result.returncode != 0:
+            raise Exception(f"Unable to replace {kind}/{name}. Error: {result.stderr}")
+        return json.loads(result.stdout)
+
+    def patch(self, kind, name, patch):
+        """Merge `patch` into the `kind` object called `name`"""
+        if self.backend == "client":
+            try:
+                return self._call(kind, "patch", name, self.namespace, patch)
+            except ApiException as e:
+                raise Exception(f"Unable to patch {kind}/{name}. Error: {e.body}")
+        result = self._kubectl(
+            [
+                "patch",
+                kind,
+                name,
+                "--type",
+                "merge",
+                "-o",
+                "json",
+                "-p",
+                json.dumps(patch),
+            ]
+        )
+        if result.returncode != 0:
+            raise Exception(f"Unable to patch {kind}/{name}. Error: {result.stderr}")
+        return json.loads(result.stdout)
+
+    def stream_events(
+        self, kind, timeout, label_selector=None, field_selector=None, stop=None
+    ):
+        """
+        Yield (event type, object) for the `kind` objects matching the selectors: an
+        "ADDED" event for each existing object, then an event for every change, until
+        `timeout` seconds passed or the `stop` threading.Event is set. The same state
+        may be yielded more than once.
+
+        Uses watches with the client backend, and `kubectl get --watch` with kubectl.
+        """
+        deadline = time.time() + timeout
+
+        def stopped():
+            return time.time() >= deadline or (stop is not None and stop.is_set())
+
+        if self.backend != "client":
+            yield from self._kubectl_stream_events(
+                kind, label_selector, field_selector, stopped
+            )
+            return
+
+        group, resource = RESOURCES[kind]
+        list_method = getattr(self._api(group), f"list_namespaced_{resource}")
+        kwargs = {}
+        if label_selector:
+            kwargs["label_selector"] = label_selector
+        if field_selector:
+            kwargs["field_selector"] = field_selector
+        while not stopped():
+            watch = k8s_watch.Watch()
+            # each watch starts with an ADDED event for the current state of every
+            # object, then streams their changes. Watches are kept short so `stop`
+            # is noticed even when nothing happens.
+            window = min(WATCH_WINDOW_SECS, deadline - time.time())
+            try:
+                for event in watch.stream(
+                    list_method,
+                    self.namespace,
+                    timeout_seconds=max(1, int(window)),
+                    **kwargs,
+                ):
+                    yield event["type"], event["raw_object"]
+                    if stopped():
+                        return
+            except ApiException as e:
+                # e.g. 410 Gone when the watch is too old: start a new one
+                logger.info(f"Watch on {kind} interrupted: {e.status}")
+            finally:
+                watch.stop()
+
+    def _kubectl_stream_events(self, kind, label_selector, field_selector, stopped):
+        """
+        `stream_events` for the kubectl backend: one long-lived `kubectl get --watch`,
+        restarted only if kubectl exits (e.g. the API server closed the watch)
+        """
+        args = [
+            "kubectl",
+            "-n",
+            self.namespace,
+            "get",
+            kind,
+            "--watch",
+            "--output-watch-events",
+            "-o",
+            "json",
+        ]
+        if label_selector:
+            args += ["-l", label_selector]
+        if field_selector:
+            args += ["--field-selector", field_selector]
+        while not stopped():
+            process = subprocess.Popen(
+                args, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+            )
+            # reading stdout blocks until kubectl prints something, so a separate
+            # thread ends kubectl once the deadline passed or `stop` is set
+            killer = threading.Thread(
+                target=_kill_when, args=(process, stopped), daemon=True
+            )
+            killer.start()
+            try:
+                # kubectl prints one indented JSON document per event
+                lines = []
+                for line in process.stdout:
+                    lines.append(line)
+                    if line.rstrip("\n") != "}":
+                        continue
+                    event = json.loads("".join(lines))
+                    lines = []
+                    yield event["type"], event["object"]
+                    if stopped():
+                        return
+                returncode = process.wait()
+                if not stopped():
+                    logger.info(f"Watch on {kind} interrupted: exit code {returncode}")
+                    time.sleep(1)
+            finally:
+                process.kill()
+                process.wait()
+                process.stdout.close()
+
+    def watch(self, kind, name, check, timeout):
+        """
+        Call `check` with the `kind` object called `name` (None once deleted) every
+        time it changes, until it returns something else than None, which is
+        returned. Returns None if that didn't happen in `timeout` seconds.
+        """
+        for event_type, obj in self.stream_events(
+            kind, timeout, field_selector=f"metadata.name={name}"
+        ):
+            result = check(obj if event_type != "DELETED" else None)
+            if result is not None:
+                return result
+        return None
+
+    ############################
+    # Configmaps and deployments
+    ############################
+
+    def get_configmap_data(self, name):
+        """The data of the configmap called `name`, or None if it doesn't exist"""
+        configmap = self.get("configmaps", name)
+        if configmap is None:
+            return None
+        return configmap.get("data") or {}
+
+    def list_deployment_names(self):
+        return [item["metadata"]["name"] for item in self.list("deployments")]
+
+    def get_deployment_containers(self, name):
+        """The container specs of the deployment called `name`, empty if it doesn't exist"""
+        deployment = self.get("deployments", name)
+        if deployment is None:
+            return []
+        return deployment["spec"]["template"]["spec"]["containers"]
+
+    def restart_deployment(self, name):
+        """Roll the pods of the deployment, like `kubectl rollout restart`"""
+        self.patch(
+            "deployments",
+            name,
+            {
+                "spec": {
+                    "template": {
+                        "metadata": {
+                            "annotations": {
+                                "kubectl.kubernetes.io/restartedAt": time.strftime(
+                                    "%Y-%m-%dT%H:%M:%SZ", time.gmtime()
+                                )
+                            }
+                        }
+                    }
+                }
+            },
+        )
+
+    def wait_for_rollout(self, name, timeout):
+        """Wait until every pod of the deployment runs its latest spec, like `kubectl rollout status`"""
+        done = self.watch(
+            "deployments",
+            name,
+            lambda deployment: (deployment and is_rollout_complete(deployment)) or None,
+            timeout,
+        )
+        if not done:
+            raise Exception(
+                f"Rollout of deployment {name} not complete after {timeout}s"
+            )
+
+    def get_helm_revision(self, release):
+        """
+        Deployed revision of the helm `release`, from the release secrets helm keeps
+        in the namespace. None if the release doesn't exist.
+        """
+        secret = self._get_deployed_helm_release_secret(release)
+        return secret["metadata"]["labels"]["version"] if secret else None
+
+    def get_helm_values(self, release):
+        """
+        Values supplied to the deployed revision of the helm `release`, like
+        `helm get values`. None if the release doesn't exist.
+        """
+        secret = self._get_deployed_helm_release_secret(release)
+        if secret is None:
+            return None
+        # helm stores the release as gzipped JSON, base64 encoded once more than
+        # the other secret data
+        encoded = base64.b64decode(base64.b64decode(secret["data"]["release"]))
+        return json.loads(gzip.decompress(encoded)).get("config") or {}
+
+    def _get_deployed_helm_release_secret(self, release):
+        secrets = self.list(
+            "secrets", label_selector=f"owner=helm,name={release},status=deployed"
+        )
+        if not secrets:
+            return None
+        return max(
+            secrets, key=lambda secret: int(secret["metadata"]["labels"]["version"])
+        )
+
+    ############################
+    # Namespace
+    ############################
+
+    def get_namespace_annotations(self):
+        if self.backend == "client":
+            try:
+                res = self._api("CoreV1Api").read_namespace(
+                    self.namespace, _preload_content=False
+                )
+            except ApiException as e:
+                raise Exception(
+                    f"Unable to get namespace {self.namespace}. Error: {e.body}"
+                )
+            namespace = json.loads(res.data)
+        else:
+            result = self._kubectl(["get", "namespace", self.namespace, "-o", "json"])
+            if result.returncode != 0:
+                raise Exception(
+                    f"Unable to get namespace {self.namespace}. Error: {result.stderr}"
+                )
+            namespace = json.loads(result.stdout)
+        return namespace["metadata"].get("annotations") or {}
+
+    def annotate_namespace(self, annotations):
+        """Set the `annotations` (dict) on the namespace"""
+        patch = {"metadata": {"annotations": annotations}}
+        if self.backend == "client":
+            try:
+                self._api("CoreV1Api").patch_namespace(
+                    self.namespace, patch, _preload_content=False
+                )
+            except ApiException as e:
+                raise Exception(
+                    f"Unable to annotate namespace {self.namespace}. Error: {e.body}"
+                )
+            return
+        result = self._kubectl(
+            [
+                "patch",
+                "namespace",
+                self.namespace,
+                "--type",
+                "merge",
+                "-p",
+                json.dumps(patch),
+            ]
+        )
+        if result.returncode != 0:
+            raise Exception(
+                f"Unable to annotate namespace {self.namespace}. Error: {result.stderr}"
+            )
+
+    ############################
+    # Pods
+    ############################
+
+    def list_pods(self, label_selector=None, ready_only=False, namespace=None):
+        """
+        The pods matching `label_selector`, oldest first. With `ready_only`, only the
+        running pods whose containers are all ready.
+        """
+        pods = self.list("pods", label_selector=label_selector, namespace=namespace)
+        if ready_only:
+            pods = [pod for pod in pods if is_pod_ready(pod)]
+        return sorted(pods, key=lambda pod: pod["metadata"]["creationTimestamp"])
+
+    def exec(self, pod_name, command, container=None, timeout=None):
+        """
+        Run `command` (list of args) in the pod and return an ExecResult.
+        Raises subprocess.TimeoutExpired if it runs for more than `timeout` seconds.
+        """
+        if self.backend != "client":
+            args = ["exec", pod_name]
+            if container:
+                args += ["-c", container]
+            result = self._kubectl(args + ["--"] + command, timeout=timeout)
+            return ExecResult(result.returncode, result.stdout, result.stderr)
+
+        # `stream` swaps the transport of the ApiClient it is given for the duration of
+        # the call, so it gets its own client and doesn't disturb concurrent requests
+        core_api = k8s_client.CoreV1Api(k8s_client.ApiClient(_configuration))
+        kwargs = {"container": container} if container else {}
+        try:
+            resp = k8s_stream(
+                core_api.connect_get_namespaced_pod_exec,
+                pod_name,
+                self.namespace,
+                command=command,
+                stdin=False,
+                stdout=True,
+                stderr=True,
+                tty=False,
+                _preload_content=False,
+                **kwargs,
+            )
+        except ApiException as e:
+            # same message as kubectl, e.g. 'pods "fence-xxx" not found'
+            return ExecResult(1, "", json.loads(e.body or "{}").get("message", str(e)))
+        stdout, stderr = [], []
+        start = time.time()
+        try:
+            while resp.is_open():
+                if timeout is not None and time.time() - start > timeout:
+                    raise subprocess.TimeoutExpired(command, timeout)
+                resp.update(timeout=1)
+                if resp.peek_stdout():
+                    stdout.append(resp.read_stdout())
+                if resp.peek_stderr():
+                    stderr.append(resp.read_stderr())
+            try:
+                returncode = resp.returncode
+            except (KeyError, IndexError, TypeError, ValueError):
+                # the command couldn't run at all (e.g. executable not found)
+                returncode = 1
+        finally:
+            resp.close()
+        return ExecResult(returncode, "".join(stdout), "".join(stderr))
+
+    def get_pod_logs(self, pod_name, container=None, tail=None, namespace=None):
+        namespace = namespace or self.namespace
+        if self.backend == "client":
+            kwargs = {}
+            if container:
+                kwargs["container"] = container
+            if tail is not None and tail >= 0:
+                kwargs["tail_lines"] = tail
+            try:
+                return (
+                    self._api("CoreV1Api")
+                    .read_namespaced_pod_log(
+                        pod_name, namespace, _preload_content=False, **kwargs
+                    )
+                    .data.decode("utf-8")
+                )
+            except ApiException as e:
+                raise Exception(f"Unable to get {pod_name} logs. Error: {e.body}")
+        args = ["logs", pod_name]
+        if container:
+            args += ["-c", container]
+        if tail is not None:
+            args += ["--tail", str(tail)]
+        result = self._kubectl(args, namespace=namespace)
+        if result.returncode != 0:
+            raise Exception(f"Unable to get {pod_name} logs. Error: {result.stderr}")
+        return result.stdout
+
+    def follow_logs(self, pod_name, container=None):
+        """
+        LogStream of the log lines of the container as it writes them, until it stops
+        or the stream is closed
+        """
+        if self.backend != "client":
+            args = ["kubectl", "-n", self.namespace, "logs", "-f", pod_name]
+            if container:
+                args += ["-c", container]
+            process = subprocess.Popen(
+                args, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+            )
+
+            def kubectl_lines():
+                try:
+                    for line in process.stdout:
+                        yield line.rstrip("\n")
+                finally:
+                    process.kill()
+                    process.wait()
+                    process.stdout.close()
+
+            return LogStream(kubectl_lines(), process.kill)
+
+        kwargs = {"container": container} if container else {}
+        try:
+            resp = self._api("CoreV1Api").read_namespaced_pod_log(
+                pod_name, self.namespace, follow=True, _preload_content=False, **kwargs
+            )
+        except ApiException as e:
+            raise Exception(f"Unable to follow {pod_name} logs. Error: {e.body}")
+
+        def client_lines():
+            try:
+                pending = b""
+                for chunk in resp.stream(4096, decode_content=False):
+                    pending += chunk
+                    *lines, pending = pending.split(b"\n")
+                    for line in lines:
+                        yield line.decode("utf-8", errors="replace")
+                if pending:
+                    yield pending.decode("utf-8", errors="replace")
+            finally:
+                resp.release_conn()
+
+        # closing the response ends the read the streaming thread is blocked on
+        return LogStream(client_lines(), resp.close)
+
+    def get_logs(self, label_selector, tail=None, namespace=None):
+        """
+        Logs of every container of every pod matching `label_selector`, concatenated,
+        like `kubectl logs -l <selector> --all-containers`
+        """
+        logs = []
+        for pod in self.list_pods(label_selector=label_selector, namespace=namespace):
+            pod_name = pod["metadata"]["name"]
+            spec = pod["spec"]
+            for container in spec.get("initContainers", []) + spec["containers"]:
+                try:
+                    container_logs = self.get_pod_logs(
+                        pod_name, container["name"], tail=tail, namespace=namespace
+                    )
+                except Exception as e:
+                    # e.g. the container didn't start yet
+                    container_logs = str(e)
+                logs.append(f"[{pod_name}/{container['name']}]\n{container_logs}")
+        return "\n".join(logs)
+
+    ############################
+    # Jobs
+    ############################
+
+    def create_job_from_cronjob(self, cronjob_name, job_name):
+        """Start a job from the template of a cronjob, like `kubectl create job --from`"""
+        if self.backend != "client":
+            result = self._kubectl(
+                ["create", "job", f"--from=cronjob/{cronjob_name}", job_name]
+            )
+            if result.returncode != 0:
+                raise Exception(
+                    f"Unable to create job {job_name} from cronjob {cronjob_name}. Error: {result.stderr}"
+                )
+            return self.get("jobs", job_name)
+        cronjob = self.get("cronjobs", cronjob_name)
+        if cronjob is None:
+            raise Exception(f"Cronjob {cronjob_name} not found")
+        job_template = cronjob["spec"]["jobTemplate"]
+        metadata = job_template.get("metadata") or {}
+        return self.create(
+            "jobs",
+            {
+                "apiVersion": "batch/v1",
+                "kind": "Job",
+                "metadata": {
+                    "name": job_name,
+                    "namespace": self.namespace,
+                    "labels": metadata.get("labels") or {},
+                    "annotations": {
+                        **(metadata.get("annotations") or {}),
+                        "cronjob.kubernetes.io/instantiate": "manual",
+                    },
+                    "ownerReferences": [
+                        {
+                            "apiVersion": "batch/v1",
+                            "kind": "CronJob",
+                            "name": cronjob_name,
+                            "uid": cronjob["metadata"]["uid"],
+                            "controller": True,
+                        }
+                    ],
+                },
+                "spec": job_template["spec"],
+            },
+        )
+
+    def rerun_job(self, job_name):
+        """Delete the job and create it again from its own spec, like `kubectl replace --force`"""
+        job = self.get("jobs", job_name)
+        if job is None:
+            raise Exception(f"Job {job_name} not found")
+        # fields generated by kubernetes, which can't be set when creating a job
+        job.pop("status", None)
+        job["spec"].pop("selector", None)
+        job["spec"]["template"].get("metadata", {}).pop("labels", None)
+        for field in ("uid", "resourceVersion", "creationTimestamp", "managedFields"):
+            job["metadata"].pop(field, None)
+        self.delete("jobs", job_name, wait=True)
+        return self.create("jobs", job)
+
+    def wait_for_job(self, job_name, timeout):
+        """
+        Wait until the job completes or fails. Returns "Complete" or "Failed", or None
+        if it is still running after `timeout` seconds.
+        """
+        return self.watch(
+            "jobs", job_name, lambda job: job and get_job_condition(job), timeout
+        )
+
+
+def _kill_when(process, stopped):
+    """Kill `process` once `stopped()` is true, unless it exited before"""
+    while process.poll() is None:
+        if stopped():
+            process.kill()
+            return
+        time.sleep(KUBECTL_WATCH_CHECK_SECS)
+
+
+def is_pod_ready(pod):
+    statuses = pod.get("status", {}).get("containerStatuses") or []
+    return (
+        pod.get("status", {}).get("phase") == "Running"
+        and not pod["metadata"].get("deletionTimestamp")
+        and bool(statuses)
+        and all(status.get("ready") for status in statuses)
+    )
+
+
+def is_rollout_complete(deployment):
+    status = deployment.get("status", {})
+    replicas = deployment["spec"].get("replicas", 1)
+    return (
+        status.get("observedGeneration", 0) >= deployment["metadata"]["generation"]
+        and status.get("updatedReplicas", 0) == replicas
+        and status.get("replicas", 0) == replicas
+        and status.get("availableReplicas", 0) == replicas
+    )
+
+
+def get_job_condition(job):
+    """The condition the job finished with ("Complete" or "Failed"), None while it runs"""
+    for condition in job.get("status", {}).get("conditions") or []:
+        if (
+            condition["type"] in ("Complete", "Failed")
+            and condition["status"] == "True"
+        ):
+            return condition["type"]
+    return None
+
+
+def get_kube_gateway(test_env_namespace):
+    """Get the KubeGateway of `test_env_namespace`, shared for the whole session"""
+    with _gateways_lock:
+        if test_env_namespace not in _gateways:
+            _gateways[test_env_namespace] = KubeGateway(test_env_namespace)
+        return _gateways[test_env_namespace]
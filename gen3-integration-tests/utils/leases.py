@@ -0,0 +1,149 @@
+import fcntl
+import os
+import re
+import time
+
+from utils import TEST_DATA_PATH_OBJECT, logger
+
+LEASES_PATH_OBJECT = TEST_DATA_PATH_OBJECT / "leases"
+EXCLUSIVE = "exclusive"
+SHARED = "shared"
+
+
+def get_leases(item):
+    """
+    Resources the test `item` declares with `@pytest.mark.uses(...)`, as resource => mode.
+    A resource used in both modes is leased exclusively.
+
+    Usage:
+        @pytest.mark.uses("ras_account")
+        @pytest.mark.uses("guppy", mode="shared")
+        class TestSomething:
+            pass
+    """
+    leases = {}
+    if item is None:
+        return leases
+    for marker in item.iter_markers("uses"):
+        mode = marker.kwargs.get("mode", EXCLUSIVE)
+        if mode not in (EXCLUSIVE, SHARED):
+            raise Exception(f"Unknown lease mode '{mode}' for {item.nodeid}")
+        for resource in marker.args:
+            if leases.get(resource) != EXCLUSIVE:
+                leases[resource] = mode
+    return leases
+
+
+def merge_leases(leases_list):
+    """Leases needed to hold all the `leases_list` at once"""
+    merged = {}
+    for leases in leases_list:
+        for resource, mode in leases.items():
+            if merged.get(resource) != EXCLUSIVE:
+                merged[resource] = mode
+    return merged
+
+
+def get_scope(nodeid):
+    """The scope a test is scheduled in (its class, or its module), see conftest.py"""
+    return nodeid.rsplit("::", 1)[0]
+
+
+_scope_leases = {}
+
+
+def get_scope_leases(item):
+    """Leases of all the tests in the scope of `item`, held while the scope runs"""
+    if item is None:
+        return {}
+    if not _scope_leases:
+        by_scope = {}
+        for session_item in item.session.items:
+            by_scope.setdefault(get_scope(session_item.nodeid), []).append(
+                get_leases(session_item)
+            )
+        _scope_leases.update(
+            {scope: merge_leases(leases) for scope, leases in by_scope.items()}
+        )
+    return _scope_leases.get(get_scope(item.nodeid), get_leases(item))
+
+
+def leases_conflict(leases, other_leases):
+    """Whether 2 sets of leases can't be held at the same time"""
+    return any(
+        EXCLUSIVE in (mode, other_leases[resource])
+        for resource, mode in leases.items()
+        if resource in other_leases
+    )
+
+
+class LeaseManager(object):
+    """
+    Leases on shared resources (a test account, an ES alias...) held by this process, so
+    the tests of different workers using the same resource don't run at the same time.
+
+    A lease is a `flock` on `test_data/leases/<resource>.lock`: several workers can hold a
+    shared lease, an exclusive lease waits for all the others to be released. Waiting
+    workers are woken up by the kernel as soon as the lease is released. Leases are always
+    acquired in the same order, so 2 workers can't wait on each other.
+
+    The leases of a scope (test class or module) are held from its first test's setup to
+    its last test's teardown, and kept for the next scope if it needs them too.
+    """
+
+    def __init__(self):
+        # resource => (mode, file descriptor)
+        self.held = {}
+        self.waited_secs = 0.0
+
+    @staticmethod
+    def _path(resource):
+        return LEASES_PATH_OBJECT / (re.sub(r"[^\w.-]", "_", resource) + ".lock")
+
+    def _holds(self, resource, mode):
+        return resource in self.held and (
+            self.held[resource][0] == EXCLUSIVE or mode == SHARED
+        )
+
+    def acquire(self, leases, holder=""):
+        """Hold the `leases` (resource => mode), the leases held are kept if they cover them"""
+        if all(self._holds(resource, mode) for resource, mode in leases.items()):
+            return
+        # waiting for a lease while holding one acquired out of order could deadlock
+        # with another worker: start over
+        self.release()
+        for resource in sorted(leases):
+            mode = leases[resource]
+            LEASES_PATH_OBJECT.mkdir(parents=True, exist_ok=True)
+            fd = os.open(self._path(resource), os.O_RDWR | os.O_CREAT, 0o644)
+            start = time.monotonic()
+            fcntl.flock(fd, fcntl.LOCK_EX if mode == EXCLUSIVE else fcntl.LOCK_SH)
+            waited = time.monotonic() - start
+            self.waited_secs += waited
+            if waited > 1:
+                logger.info(
+                    f"{holder} waited {waited:.1f}s for {mode} lease on '{resource}'"
+                )
+            self.held[resource] = (mode, fd)
+
+    def release(self, resources=None):
+        """Release the leases on `resources`, all the leases by default"""
+        for resource in list(self.held if resources is None else resources):
+            if resource not in self.held:
+                continue
+            _, fd = self.held.pop(resource)
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def keep_only(self, leases):
+        """Release the leases held which are not in `leases` (resource => mode)"""
+        self.release(
+            [
+                resource
+                for resource, (mode, _) in self.held.items()
+                if leases.get(resource) != mode
+            ]
+        )
+
+
+lease_manager = LeaseManager()
@@ -1,19 +1,95 @@
+import functools
+import hashlib
 import os
+import pickle
+import random
+import socket
+import tempfile
+import threading
 import time
+from pathlib import Path
 
 from filelock import FileLock, Timeout
 from utils import TEST_DATA_PATH_OBJECT, logger
 
+# First wait between polling attempts, multiplied by POLL_BACKOFF after every attempt
+POLL_INITIAL_INTERVAL = float(os.getenv("POLL_INITIAL_INTERVAL_SECS", "1"))
+POLL_MAX_INTERVAL = float(os.getenv("POLL_MAX_INTERVAL_SECS", "30"))
+POLL_BACKOFF = float(os.getenv("POLL_BACKOFF", "1.5"))
+POLL_JITTER = float(os.getenv("POLL_JITTER", "0.2"))
 
-def one_worker_only(wait_secs=3, max_wait_minutes=1):
+# Results of the `one_worker_only` functions, for the workers getting there after them
+ONE_WORKER_ONLY_PATH_OBJECT = TEST_DATA_PATH_OBJECT / "one_worker_only"
+
+_poll_stats = {}
+_poll_stats_lock = threading.Lock()
+
+
+def _one_worker_only_payload(worker_id, result=None, error=None):
+    """Pickled result or error of a `one_worker_only` function, for the other workers"""
+    try:
+        return pickle.dumps((worker_id, result, error))
+    except Exception as e:
+        # the other workers can't rebuild the result or the error
+        return pickle.dumps(
+            (
+                worker_id,
+                None,
+                Exception(f"Unable to share the {'error' if error else 'result'}: {e}"),
+            )
+        )
+
+
+def _serve_one_worker_only_payload(server, done, payload):
+    """Send the payload to every waiting worker once `done` is set"""
+    while True:
+        try:
+            conn, _ = server.accept()
+        except OSError:  # the server was closed
+            return
+        with conn:
+            done.wait()
+            try:
+                conn.sendall(payload[0])
+            except OSError:
+                pass
+
+
+def _read_one_worker_only_payload(socket_path, timeout):
+    """Wait for the payload sent by the worker running the function, None if there is none"""
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(timeout)
+    try:
+        client.connect(str(socket_path))
+        chunks = []
+        while True:
+            chunk = client.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        return pickle.loads(b"".join(chunks)) if chunks else None
+    except socket.timeout:
+        raise
+    except (OSError, pickle.UnpicklingError, EOFError):
+        # the server is not started yet or was closed while connecting
+        return None
+    finally:
+        client.close()
+
+
+def one_worker_only(func=None, max_wait_minutes=15):
     """
-    Use this decorator to make sure only 1 worker runs a function. Other workers will wait until the 1st
-    worker is done before proceeding. Useful for configuration autorun fixtures that must run before the
-    tests can run.
+    Use this decorator to make sure only 1 worker runs a function. Other workers wait until the 1st
+    worker is done and get the same return value, or the same exception is raised. Useful for
+    configuration autorun fixtures that must run before the tests can run.
+
+    The 1st worker serves the pickled result on a unix socket, so waiting workers are woken up as
+    soon as it is available instead of polling. The result is also written to
+    `test_data/one_worker_only` for the workers that only get there after the 1st worker is done.
+    The return value must be picklable to be shared.
 
     Args:
-        wait_secs (int): how long other workers wait between each check.
-        max_wait_minutes (int): other workers wait up to `max_wait_minutes` min before giving up and proceeding.
+        max_wait_minutes (int): other workers wait up to `max_wait_minutes` min before raising.
 
     Usage:
         @pytest.fixture(autouse=True, scope="session")
@@ -21,66 +97,210 @@ def one_worker_only(wait_secs=3, max_wait_minutes=1):
         def setup_tests():
             pass
 
-        @pytest.fixture(autouse=True, scope="session")
-        @one_worker_only(wait_secs=10, max_wait_minutes=15)
-        def setup_tests():
-            pass
+        @pytest.fixture(scope="session")
+        @one_worker_only(max_wait_minutes=30)
+        def test_records():
+            return create_records()
     """
 
     def one_worker_only_decorator(func):
-        def run_with_lock():
-            worker_id = os.environ["PYTEST_XDIST_WORKER"]
-            lock_path = TEST_DATA_PATH_OBJECT / "lock"
+        @functools.wraps(func)
+        def run_with_lock(*args, **kwargs):
+            worker_id = os.getenv("PYTEST_XDIST_WORKER")
+            if not worker_id:  # not running with xdist
+                return func(*args, **kwargs)
+            # same for all the workers of the session
+            key = f"{os.getenv('PYTEST_XDIST_TESTRUNUID', os.getppid())}_{func.__module__}.{func.__qualname__}"
+            ONE_WORKER_ONLY_PATH_OBJECT.mkdir(parents=True, exist_ok=True)
+            result_path = ONE_WORKER_ONLY_PATH_OBJECT / f"{key}.pkl"
+            lock = FileLock(ONE_WORKER_ONLY_PATH_OBJECT / f"{key}.lock", timeout=0)
+            # unix socket paths are limited to ~100 characters
+            socket_path = (
+                Path(tempfile.gettempdir())
+                / f"gen3-{hashlib.sha1(key.encode()).hexdigest()[:16]}.sock"
+            )
 
-            lock = FileLock(lock_path, timeout=0)
-            try:  # attempt to get a lock on the lock file
-                lock.acquire()
+            deadline = time.monotonic() + max_wait_minutes * 60
+            waiting = False
+            while True:
+                if result_path.exists():
+                    payload = pickle.loads(result_path.read_bytes())
+                    break
                 try:
-                    logger.info(f"Worker '{worker_id}' running '{func.__name__}'")
-                    # successful lock: run `func`
-                    result = func()
-                    # if `func` completes quickly, this worker may release the lock before other workers
-                    # attempt to lock, and `func` could run more than once. Wait 1 sec to avoid this
-                    time.sleep(0.5)
-                    logger.info(
-                        f"Worker '{worker_id}' is done running '{func.__name__}'"
+                    lock.acquire()
+                except Timeout:  # another worker is running `func`: wait for its result
+                    if not waiting:
+                        logger.info(
+                            f"Worker '{worker_id}' waiting for '{func.__name__}' to be done running"
+                        )
+                        waiting = True
+                    remaining = deadline - time.monotonic()
+                    try:
+                        if remaining <= 0:
+                            raise socket.timeout()
+                        payload = _read_one_worker_only_payload(socket_path, remaining)
+                    except socket.timeout:
+                        raise Exception(
+                            f"Worker '{worker_id}' waited {max_wait_minutes} min, '{func.__name__}' is not done running"
+                        )
+                    if payload is not None:
+                        break
+                    # the server is not started yet or is already closed
+                    time.sleep(0.05)
+                    continue
+                try:
+                    if result_path.exists():  # the other worker was done after all
+                        continue
+                    return _run_and_share(
+                        func, args, kwargs, worker_id, result_path, socket_path
                     )
                 finally:
                     lock.release()
-                return result
-            except Timeout:  # unable to lock: another worker already locked; wait
-                logger.info(
-                    f"Worker '{worker_id}' waiting for '{func.__name__}' to be done running"
-                )
-                with open(lock_path, "r") as lock_file:
-                    waited_secs = 0
-                    while True:
-                        try:
-                            lock.acquire()
-                            # the worker obtained the lock, so `func` is done running => exit
-                            lock.release()
-                            logger.info(f"Worker '{worker_id}' is done waiting")
-                            break
-                        except IOError:
-                            logger.info(f"Worker '{worker_id}' waiting {wait_secs}s...")
-                            if waited_secs < max_wait_minutes * 60:
-                                time.sleep(wait_secs)
-                                waited_secs += wait_secs
-                            else:
-                                logger.warn(
-                                    f"Worker '{worker_id}' waited {max_wait_minutes} min, '{func.__name__}' is not done running, proceeding anyway"
-                                )
-                                break
+
+            origin_worker_id, result, error = payload
+            logger.info(
+                f"Worker '{worker_id}' got the result of '{func.__name__}' from worker '{origin_worker_id}'"
+            )
+            if error is not None:
+                raise error
+            return result
 
         return run_with_lock
 
+    if func is not None:  # used as `@one_worker_only` without arguments
+        return one_worker_only_decorator(func)
     return one_worker_only_decorator
 
 
+def _run_and_share(func, args, kwargs, worker_id, result_path, socket_path):
+    """Run `func` and send its result or error to the workers waiting for it"""
+    socket_path.unlink(missing_ok=True)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(str(socket_path))
+    server.listen(64)
+    done = threading.Event()
+    payload = [None]
+    thread = threading.Thread(
+        target=_serve_one_worker_only_payload,
+        args=(server, done, payload),
+        daemon=True,
+    )
+    thread.start()
+    try:
+        logger.info(f"Worker '{worker_id}' running '{func.__name__}'")
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:  # including pytest.skip and pytest.fail
+            payload[0] = _one_worker_only_payload(worker_id, error=e)
+            raise
+        payload[0] = _one_worker_only_payload(worker_id, result=result)
+        logger.info(f"Worker '{worker_id}' is done running '{func.__name__}'")
+        return result
+    finally:
+        # write the result before waking up the waiting workers, so the workers that
+        # get there after the server is closed find it
+        tmp_path = result_path.with_suffix(f".{worker_id}.tmp")
+        tmp_path.write_bytes(payload[0])
+        tmp_path.replace(result_path)
+        done.set()
+        # let the thread answer the connections already accepted, the workers whose
+        # connection is dropped read the result file
+        thread.join(timeout=0.1)
+        try:
+            server.shutdown(socket.SHUT_RDWR)  # wakes up `accept`
+        except OSError:
+            pass
+        server.close()
+        socket_path.unlink(missing_ok=True)
+
+
+def _poll_stats_entry(name):
+    with _poll_stats_lock:
+        return _poll_stats.setdefault(
+            name,
+            {
+                "calls": 0,
+                "attempts": 0,
+                "failures": 0,
+                "waited_secs": 0.0,
+                "max_secs": 0.0,
+            },
+        )
+
+
+def poll(
+    timeout,
+    exceptions,
+    initial_interval=POLL_INITIAL_INTERVAL,
+    max_interval=POLL_MAX_INTERVAL,
+    backoff=POLL_BACKOFF,
+    jitter=POLL_JITTER,
+    min_attempts=1,
+):
+    """
+    Decorator that keeps calling the wrapped function/method until it stops raising one of
+    the exceptions listed in `exceptions` or `timeout` seconds have passed. The wait between
+    attempts starts at `initial_interval` and grows by `backoff` up to `max_interval`, with
+    +/- `jitter` (a fraction of the interval) added so workers don't poll in lockstep.
+    A condition that becomes true after 2s returns after about 2s.
+
+    The last exception is raised once the deadline has passed and the function has been
+    called at least `min_attempts` times.
+
+    Usage:
+        @poll(timeout=300, exceptions=(AssertionError,))
+        def wait_for_record(self, guid):
+            pass
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def newfn(*args, **kwargs):
+            stats = _poll_stats_entry(func.__qualname__)
+            start = time.monotonic()
+            deadline = start + timeout
+            interval = initial_interval
+            attempt = 1
+            with _poll_stats_lock:
+                stats["calls"] += 1
+            try:
+                while True:
+                    with _poll_stats_lock:
+                        stats["attempts"] += 1
+                    try:
+                        return func(*args, **kwargs)
+                    except exceptions as e:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0 and attempt >= min_attempts:
+                            with _poll_stats_lock:
+                                stats["failures"] += 1
+                            raise
+                        wait = interval * random.uniform(1 - jitter, 1 + jitter)
+                        if remaining > 0:
+                            wait = min(wait, remaining)
+                        logger.info(
+                            f"'{func.__name__}' not done yet ({type(e).__name__}), attempt {attempt}, "
+                            f"retrying in {wait:.1f}s ({max(remaining, 0):.0f}s left)"
+                        )
+                        time.sleep(wait)
+                        with _poll_stats_lock:
+                            stats["waited_secs"] += wait
+                        interval = min(interval * backoff, max_interval)
+                        attempt += 1
+            finally:
+                with _poll_stats_lock:
+                    stats["max_secs"] = max(stats["max_secs"], time.monotonic() - start)
+
+        return newfn
+
+    return decorator
+
+
 def retry(times, delay, exceptions):
     """
     Decorator that retries the wrapped function/method `times` times if the exceptions
-    listed in ``exceptions`` are thrown waiting for `delay` seconds between retries
+    listed in ``exceptions`` are thrown waiting for `delay` seconds between retries.
+    Use `poll` instead for functions waiting for a condition to become true
     """
 
     def decorator(func):
@@ -100,3 +320,18 @@ def retry(times, delay, exceptions):
         return newfn
 
     return decorator
+
+
+def get_poll_stats():
+    """Per call site polling stats: calls, attempts, failures, time waited and slowest call"""
+    with _poll_stats_lock:
+        return {name: dict(stats) for name, stats in _poll_stats.items()}
+
+
+def log_poll_stats():
+    for name, stats in sorted(get_poll_stats().items()):
+        logger.info(
+            f"Polling stats for '{name}': {stats['calls']} calls, {stats['attempts']} attempts, "
+            f"{stats['failures']} timed out, waited {stats['waited_secs']:.1f}s in total, "
+            f"slowest call took {stats['max_secs']:.1f}s"
+        )
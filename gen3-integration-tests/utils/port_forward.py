@@ -0,0 +1,153 @@
+import atexit
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+
+from utils import logger
+
+# How long to wait for a new port-forward to accept connections
+START_TIMEOUT_SECS = 60
+
+
+def get_free_port():
+    """Ask the OS for a local port nobody is listening on"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def is_port_open(port, host="127.0.0.1", timeout=2):
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+class PortForward(object):
+    """
+    `kubectl port-forward` from a free local port to `remote_port` of `target`
+    (e.g. "service/gen3-elasticsearch-master"), restarted whenever it dies
+    """
+
+    def __init__(self, test_env_namespace, target, remote_port):
+        self.namespace = test_env_namespace
+        self.target = target
+        self.remote_port = remote_port
+        self.local_port = None
+        self.restarts = 0
+        self._process = None
+        self._stderr = None
+        self._lock = threading.Lock()
+
+    def __str__(self):
+        return f"{self.namespace}/{self.target}:{self.remote_port}"
+
+    def _start(self):
+        self.local_port = get_free_port()
+        # kubectl keeps logging to stderr for as long as it runs, a file can't fill up
+        # and block it the way a pipe would
+        self._stderr = tempfile.TemporaryFile()
+        self._process = subprocess.Popen(
+            [
+                "kubectl",
+                "port-forward",
+                "--address",
+                "127.0.0.1",
+                self.target,
+                f"{self.local_port}:{self.remote_port}",
+                "-n",
+                self.namespace,
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=self._stderr,
+        )
+        start = time.time()
+        while time.time() - start < START_TIMEOUT_SECS:
+            if self._process.poll() is not None:
+                self._stderr.seek(0)
+                error = self._stderr.read().decode("utf-8").strip()
+                self._stop()
+                raise Exception(f"Unable to port-forward {self}. Error: {error}")
+            if is_port_open(self.local_port):
+                logger.info(f"Port-forwarding {self} to localhost:{self.local_port}")
+                return
+            time.sleep(0.2)
+        self._stop()
+        raise Exception(f"Port-forward {self} did not become ready")
+
+    def _stop(self):
+        if self._process is not None:
+            if self._process.poll() is None:
+                self._process.terminate()
+                try:
+                    self._process.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    self._process.kill()
+                    self._process.wait()
+            self._process = None
+        if self._stderr is not None:
+            self._stderr.close()
+            self._stderr = None
+
+    def is_healthy(self):
+        return (
+            self._process is not None
+            and self._process.poll() is None
+            and is_port_open(self.local_port)
+        )
+
+    def ensure(self):
+        """Start the port-forward, or restart it if it dropped. Returns the local port"""
+        with self._lock:
+            if not self.is_healthy():
+                if self._process is not None:
+                    logger.warning(f"Port-forward {self} dropped, reconnecting")
+                    self.restarts += 1
+                self._stop()
+                self._start()
+            return self.local_port
+
+    @property
+    def url(self):
+        return f"http://localhost:{self.ensure()}"
+
+    def stop(self):
+        with self._lock:
+            self._stop()
+
+
+class PortForwardManager(object):
+    """
+    Keeps one port-forward per (namespace, target, port) for the whole session.
+    Every process (e.g. every xdist worker) gets its own local ports, so they
+    don't collide.
+    """
+
+    def __init__(self):
+        self._forwards = {}
+        self._lock = threading.Lock()
+
+    def get(self, test_env_namespace, target, remote_port):
+        """Get the healthy port-forward to `remote_port` of `target`"""
+        key = (test_env_namespace, target, remote_port)
+        with self._lock:
+            if key not in self._forwards:
+                self._forwards[key] = PortForward(*key)
+            forward = self._forwards[key]
+        forward.ensure()
+        return forward
+
+    def stop_all(self):
+        with self._lock:
+            forwards = list(self._forwards.values())
+            self._forwards.clear()
+        for forward in forwards:
+            forward.stop()
+
+
+port_forwards = PortForwardManager()
+# in case the session doesn't get to its teardown, don't leave kubectl processes behind
+atexit.register(port_forwards.stop_all)
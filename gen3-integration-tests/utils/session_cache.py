@@ -0,0 +1,83 @@
+import functools
+import hashlib
+import json
+import threading
+
+import pytest
+from filelock import FileLock
+from utils import TEST_DATA_PATH_OBJECT, logger
+from utils.k8s import get_kube_gateway
+
+SESSION_CACHE_PATH_OBJECT = TEST_DATA_PATH_OBJECT / "session_cache"
+UNKNOWN_REVISION = "unknown"
+
+_memory_cache = {}
+_lock = threading.RLock()
+
+
+def get_helm_revision(test_env_namespace):
+    """Revision of the helm release of the namespace, bumped by every helm upgrade"""
+    try:
+        revision = get_kube_gateway(test_env_namespace).get_helm_revision(
+            test_env_namespace
+        )
+    except Exception as e:
+        logger.info(f"Unable to get helm revision. Error: {e}")
+        revision = None
+    return revision or UNKNOWN_REVISION
+
+
+def _get_revision():
+    # computed by the controller as part of the environment snapshot
+    if getattr(pytest, "helm_revision", None) is None:
+        pytest.helm_revision = get_helm_revision(pytest.namespace)
+    return pytest.helm_revision
+
+
+def session_cached(name):
+    """
+    Decorator caching the (JSON serializable) result of the wrapped function for the
+    whole session, per arguments. Results are stored on disk so every xdist worker
+    reuses the first worker's result, and are keyed by the namespace's helm revision,
+    so they are recomputed after each helm upgrade. Exceptions are not cached.
+
+    When the helm revision can't be read, results are only cached in memory, since
+    nothing would tell a stale result on disk from a fresh one.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def newfn(*args, **kwargs):
+            args_hash = hashlib.sha1(
+                json.dumps([args, kwargs], sort_keys=True, default=str).encode()
+            ).hexdigest()[:12]
+            prefix = f"{pytest.namespace}_{name}_"
+            revision = _get_revision()
+            key = f"{prefix}{revision}_{args_hash}"
+            if key in _memory_cache:
+                return _memory_cache[key]
+            if revision == UNKNOWN_REVISION:
+                with _lock:
+                    if key not in _memory_cache:
+                        _memory_cache[key] = func(*args, **kwargs)
+                    return _memory_cache[key]
+            SESSION_CACHE_PATH_OBJECT.mkdir(parents=True, exist_ok=True)
+            cache_path = SESSION_CACHE_PATH_OBJECT / f"{key}.json"
+            with _lock, FileLock(cache_path.with_suffix(".lock")):
+                if key in _memory_cache:
+                    return _memory_cache[key]
+                if cache_path.exists():
+                    result = json.loads(cache_path.read_text())
+                else:
+                    result = func(*args, **kwargs)
+                    # results of previous helm revisions are stale
+                    for old_path in SESSION_CACHE_PATH_OBJECT.glob(f"{prefix}*.json"):
+                        if not old_path.name.startswith(f"{prefix}{revision}_"):
+                            old_path.unlink(missing_ok=True)
+                    cache_path.write_text(json.dumps(result))
+                _memory_cache[key] = result
+            return result
+
+        return newfn
+
+    return decorator
@@ -2,11 +2,19 @@ import csv
 import json
 import os
 import re
-import subprocess
 from pathlib import Path
 
 import pytest
 from utils import TEST_DATA_PATH_OBJECT, gen3_admin_tasks, logger
+from utils.bootstrap import Bootstrap, hash_inputs
+from utils.fence_client_pool import FenceClientPool
+from utils.k8s import get_kube_gateway
+from utils.session_cache import get_helm_revision
+
+# Namespace annotation holding the fingerprint of the last usersync
+USERSYNC_FINGERPRINT_ANNOTATION = "gen3-code-vigil/usersync-fingerprint"
+# Run usersync even if the user.yaml and arborist didn't change
+USERSYNC_FORCE = os.getenv("FORCE_USERSYNC", "false").lower() == "true"
 
 
 def get_api_key(user):
@@ -40,24 +48,29 @@ def delete_all_fence_clients():
         # Join rows with newlines to preserve the format
         data = "\n".join(",".join(row) for row in reader)
     gen3_admin_tasks.delete_fence_client(data, test_env_namespace=pytest.namespace)
+    FenceClientPool(pytest.namespace).forget()
 
 
 def setup_fence_test_clients_info():
+    """
+    Make sure the fence test clients exist, reusing the clients of previous sessions,
+    and write their credentials to `test_data/fence_clients`
+    """
     clients_data_file_path = TEST_DATA_PATH_OBJECT / "test_setup" / "clients.csv"
     clients_path = TEST_DATA_PATH_OBJECT / "fence_clients"
     clients_path.mkdir(parents=True, exist_ok=True)
-    rotated_clients_path = TEST_DATA_PATH_OBJECT / "fence_clients"
-    rotated_clients_path.mkdir(parents=True, exist_ok=True)
     # Read CSV data into a python variable
     with open(clients_data_file_path, newline="") as csvfile:
         reader = csv.reader(csvfile)
         next(reader)  # skip header
         data = list(reader)
-    # Create the client
-    gen3_admin_tasks.setup_fence_test_clients(
-        data,
-        test_env_namespace=os.getenv("NAMESPACE"),
-    )
+    clients, rotated_clients = FenceClientPool(os.getenv("NAMESPACE")).ensure(data)
+    with open(clients_path / "clients_creds.txt", "w") as outfile:
+        for client_name, client_info in clients.items():
+            outfile.write(f"{client_name}:{client_info}\n")
+    with open(clients_path / "client_rotate_creds.txt", "w") as outfile:
+        for client_name, client_info in rotated_clients.items():
+            outfile.write(f"{client_name}:{client_info}\n")
 
 
 def get_rotated_client_id_secret():
@@ -101,32 +114,82 @@ def get_client_id_secret():
             logger.error(f"Error getting client id and secret for {client_name}.")
 
 
-def run_usersync():
+def _get_usersync_pod_spec(kube, job_name, job_type):
+    if job_type == "job":
+        return kube.get("jobs", job_name)["spec"]["template"]["spec"]
+    return kube.get("cronjobs", job_name)["spec"]["jobTemplate"]["spec"]["template"][
+        "spec"
+    ]
+
+
+def get_usersync_fingerprint(job_name, job_type):
+    """
+    Hash of what usersync reads and writes: the user.yaml (the useryaml configmap, and
+    the job's containers, which say where else the user.yaml comes from) and the users,
+    groups and policies in arborist
+    """
+    kube = get_kube_gateway(pytest.namespace)
+    containers = [
+        {key: container.get(key) for key in ("image", "command", "args", "env")}
+        for container in _get_usersync_pod_spec(kube, job_name, job_type)["containers"]
+    ]
+    return hash_inputs(
+        [
+            kube.get_configmap_data("useryaml"),
+            containers,
+            gen3_admin_tasks.get_arborist_state(pytest.namespace),
+        ]
+    )
+
+
+def run_usersync(force=USERSYNC_FORCE):
+    """
+    Run usersync, unless the user.yaml and arborist didn't change since the last
+    usersync. The fingerprint of the last usersync is kept as a namespace annotation.
+    """
+    kube = get_kube_gateway(pytest.namespace)
     # check which job to run: if there are "useryaml" pods, then the "useryaml" job is deployed and
     # should be used. If not, the "useryaml" job is not deployed, but the "usersync" cronjob is.
-    cmd = [
-        "kubectl",
-        "get",
-        "pod",
-        "-n",
-        pytest.namespace,
-        "--selector=job-name=useryaml",
-        "-o",
-        "name",
-    ]
-    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    if result.returncode != 0:
+    try:
+        pods = kube.list_pods(label_selector="job-name=useryaml")
+    except Exception:
         raise Exception(f"[run_usersync] unable to list pods with 'job-name=useryaml'")
 
-    pods = [p for p in result.stdout.decode("utf-8").split("\n") if p]
     job_name, job_type = ("useryaml", "job") if pods else ("usersync", "cronjob")
 
+    if not force:
+        try:
+            fingerprint = get_usersync_fingerprint(job_name, job_type)
+            last_fingerprint = kube.get_namespace_annotations().get(
+                USERSYNC_FINGERPRINT_ANNOTATION
+            )
+        except Exception as e:
+            logger.info(f"[run_usersync] Unable to check the last usersync: {e}")
+        else:
+            if fingerprint == last_fingerprint:
+                logger.info(
+                    "[run_usersync] user.yaml and arborist didn't change since the last usersync, skipping it"
+                )
+                return
+
     gen3_admin_tasks.run_gen3_job(
         job_name,
         test_env_namespace=pytest.namespace,
         job_type=job_type,
     )
 
+    # arborist changed, compute the fingerprint again
+    try:
+        kube.annotate_namespace(
+            {
+                USERSYNC_FINGERPRINT_ANNOTATION: get_usersync_fingerprint(
+                    job_name, job_type
+                )
+            }
+        )
+    except Exception as e:
+        logger.info(f"[run_usersync] Unable to save the usersync fingerprint: {e}")
+
 
 def setup_google_buckets():
     gen3_admin_tasks.create_link_google_test_buckets(
@@ -134,6 +197,54 @@ def setup_google_buckets():
     )
 
 
+def _google_buckets_inputs():
+    """
+    The buckets and what identifies the deployment of the environment, which changes
+    on every helm upgrade or reinstall
+    """
+    fence_deployment = get_kube_gateway(pytest.namespace).get(
+        "deployments", "fence-deployment"
+    )
+    return [
+        gen3_admin_tasks.GOOGLE_TEST_BUCKETS,
+        gen3_admin_tasks.GOOGLE_TEST_BUCKET_PROJECTS,
+        get_helm_revision(pytest.namespace),
+        fence_deployment["metadata"]["uid"] if fence_deployment else None,
+    ]
+
+
+def run_bootstrap(requires_fence_client, requires_google_bucket, requires_usersync):
+    """
+    Set up the environment for the session. Independent steps run concurrently, and
+    steps are skipped when their inputs didn't change since they last ran.
+    """
+    bootstrap = Bootstrap(pytest.namespace, get_kube_gateway(pytest.namespace))
+    if requires_fence_client:
+        # the pool checks the clients itself, see FenceClientPool
+        bootstrap.add("fence_clients", setup_fence_test_clients_info)
+    if requires_google_bucket:
+        bootstrap.add(
+            "google_buckets", setup_google_buckets, inputs=_google_buckets_inputs
+        )
+    if requires_usersync:
+        # usersync grants access to the fence clients and to the linked buckets
+        requires = [
+            step
+            for step in ("fence_clients", "google_buckets")
+            if step in bootstrap.steps
+        ]
+        # skipped by run_usersync itself when nothing changed, see
+        # get_usersync_fingerprint, unless buckets were linked again
+        bootstrap.add(
+            "usersync",
+            lambda: run_usersync(
+                force=USERSYNC_FORCE or bootstrap.ran("google_buckets")
+            ),
+            requires=requires,
+        )
+    bootstrap.run()
+
+
 def get_users():
     user_list_path = TEST_DATA_PATH_OBJECT / "test_setup" / "users.csv"
     with open(user_list_path) as f:
@@ -0,0 +1,205 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import gen3.auth
+import pytest
+from filelock import FileLock
+from gen3.auth import Gen3Auth, Gen3AuthError, decode_token
+from utils import TEST_DATA_PATH_OBJECT, logger
+from utils.http_session import get_session
+
+TOKEN_CACHE_PATH_OBJECT = TEST_DATA_PATH_OBJECT / "token_cache"
+# Tokens closer than this to their expiry are refreshed in the background
+REFRESH_MARGIN_SECS = int(os.getenv("TOKEN_REFRESH_MARGIN_SECS", "300"))
+# Tokens closer than this to their expiry are never handed out
+EXPIRY_MARGIN_SECS = int(os.getenv("TOKEN_EXPIRY_MARGIN_SECS", "60"))
+
+
+class TokenCache(object):
+    """
+    Access token cache keyed by (user, fence endpoint).
+
+    Tokens are reused until they are close to expiry and refreshed in a background
+    thread shortly before that. Every refreshed token is written to a file store so
+    the other xdist workers pick it up instead of doing their own token exchange.
+    """
+
+    def __init__(self, cache_dir=TOKEN_CACHE_PATH_OBJECT):
+        self.cache_dir = cache_dir
+        self._tokens = {}
+        self._locks = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "file_hits": 0, "exchanges": 0}
+
+    def _key(self, user):
+        # looked up through the module so callers patching
+        # `gen3.auth.endpoint_from_token` (e.g. Kind runs on localhost) are honoured
+        endpoint = gen3.auth.endpoint_from_token(pytest.api_keys[user]["api_key"])
+        return (user, endpoint)
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _file_path(self, key):
+        user, endpoint = key
+        endpoint_hash = hashlib.sha1(endpoint.encode()).hexdigest()[:12]
+        return self.cache_dir / f"{user}_{endpoint_hash}.json"
+
+    def _read_file(self, key):
+        try:
+            entry = json.loads(self._file_path(key).read_text())
+            return entry["access_token"], entry["exp"]
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+
+    def _write_file(self, key, token, exp):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._file_path(key)
+        # write a temp file, then rename, so readers never see a partial file
+        temp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump({"access_token": token, "exp": exp}, f)
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def _is_fresh(entry, margin):
+        return entry is not None and time.time() + margin < entry[1]
+
+    def _exchange(self, key, force=False):
+        """Get a token from the file store or Fence, holding the cross-worker lock"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        lock_path = self._file_path(key).with_suffix(".lock")
+        with FileLock(lock_path):
+            entry = self._read_file(key)
+            # another worker may have refreshed the token while we were waiting
+            if not force and self._is_fresh(entry, REFRESH_MARGIN_SECS):
+                self.stats["file_hits"] += 1
+            else:
+                user, endpoint = key
+                token = self._fetch_access_token(user, endpoint)
+                entry = (token, decode_token(token)["exp"])
+                self._write_file(key, *entry)
+                self.stats["exchanges"] += 1
+                logger.debug(f"Fetched new access token for '{user}'")
+        self._tokens[key] = entry
+        return entry
+
+    @staticmethod
+    def _fetch_access_token(user, endpoint):
+        """
+        Same as `gen3.auth.get_access_token_with_key`, but against the endpoint resolved
+        when the key was built, since background refreshes run outside of the caller's patches
+        """
+        response = get_session().post(
+            f"{endpoint}/user/credentials/cdis/access_token",
+            json=pytest.api_keys[user],
+        )
+        if response.status_code != 200:
+            raise Gen3AuthError(
+                f"Failed to get an access token from {endpoint} for '{user}': "
+                f"{response.status_code} {response.text}"
+            )
+        return response.json()["access_token"]
+
+    def _background_refresh(self, key):
+        try:
+            with self._key_lock(key):
+                if not self._is_fresh(self._tokens.get(key), REFRESH_MARGIN_SECS):
+                    self._exchange(key)
+        except Exception as e:
+            # the next caller will refresh synchronously once the token is too old
+            logger.warning(f"Background token refresh failed for '{key[0]}': {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _schedule_refresh(self, key):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        threading.Thread(
+            target=self._background_refresh, args=(key,), daemon=True
+        ).start()
+
+    def get_access_token(self, user, force=False):
+        """Get a valid access token for `user`, exchanging its API key only when needed"""
+        key = self._key(user)
+        entry = self._tokens.get(key)
+        if not force and self._is_fresh(entry, REFRESH_MARGIN_SECS):
+            self.stats["hits"] += 1
+            return entry[0]
+        with self._key_lock(key):
+            if not force:
+                entry = self._tokens.get(key)
+                if not self._is_fresh(entry, REFRESH_MARGIN_SECS):
+                    file_entry = self._read_file(key)
+                    if self._is_fresh(file_entry, EXPIRY_MARGIN_SECS):
+                        self._tokens[key] = entry = file_entry
+                if self._is_fresh(entry, EXPIRY_MARGIN_SECS):
+                    if not self._is_fresh(entry, REFRESH_MARGIN_SECS):
+                        self._schedule_refresh(key)
+                    self.stats["hits"] += 1
+                    return entry[0]
+            return self._exchange(key, force=force)[0]
+
+
+token_cache = TokenCache()
+
+
+class CachedGen3Auth(Gen3Auth):
+    """Gen3Auth which gets its access tokens from the shared token cache"""
+
+    def __init__(self, user, endpoint=None):
+        super().__init__(refresh_token=pytest.api_keys[user], endpoint=endpoint)
+        self._user = user
+
+    def get_access_token(self):
+        self._access_token = token_cache.get_access_token(self._user)
+        self._access_token_info = decode_token(self._access_token)
+        return self._access_token
+
+    def refresh_access_token(self, endpoint=None):
+        self._access_token = token_cache.get_access_token(self._user, force=True)
+        self._access_token_info = decode_token(self._access_token)
+        return self._access_token
+
+    def curl(self, path, request=None, data=None):
+        """Same as Gen3Auth.curl, but sent through the pooled HTTP session"""
+        if not request:
+            request = "GET"
+            if data:
+                request = "POST"
+        json_data = data
+        if data and data[0] == "@":
+            with open(data[1:]) as f:
+                json_data = f.read()
+        url = self.endpoint + "/" + path
+        if request == "GET":
+            return get_session().get(url, auth=self)
+        elif request == "POST":
+            return get_session().post(url, json=json_data, auth=self)
+        elif request == "PUT":
+            return get_session().put(url, json=json_data, auth=self)
+        elif request == "DELETE":
+            return get_session().delete(url, auth=self)
+        raise Exception("Invalid request type: " + request)
+
+
+def get_auth(user, endpoint=None):
+    """
+    Get a Gen3Auth for `user` backed by the shared token cache.
+    Drop-in replacement for `Gen3Auth(refresh_token=pytest.api_keys[user], endpoint=endpoint)`
+    """
+    return CachedGen3Auth(user, endpoint=endpoint)
+
+
+def get_access_token(user):
+    """Get a cached access token for `user`"""
+    return token_cache.get_access_token(user)
@@ -3,16 +3,24 @@ import os
 import shutil
 from datetime import datetime, timedelta
 
-import boto3
 import pytest
 
 # Using dotenv to simplify setting up env vars locally
 from dotenv import load_dotenv
-from utils import LOAD_TESTING_OUTPUT_PATH, TEST_DATA_PATH_OBJECT, logger
+from utils import LOAD_TESTING_OUTPUT_PATH, TEST_DATA_PATH_OBJECT
 from utils import test_setup as setup
+from utils.latency_histogram import TOTAL_KEY, LatencyBreakdown
+from utils.metrics_shipper import MetricsShipper, get_sink
+from utils.timing_store import timing_store
 
 load_dotenv()
 collect_ignore = ["test_setup.py"]
+LOAD_TEST_METRICS_QUEUE_URL = (
+    "https://sqs.us-east-1.amazonaws.com/707767160287/load-test-metrics-sqs"
+)
+metrics_shipper = MetricsShipper(
+    get_sink(LOAD_TEST_METRICS_QUEUE_URL), on_sent=timing_store.mark_exported
+)
 
 
 def pytest_configure(config):
@@ -43,6 +51,12 @@ def pytest_configure(config):
 def pytest_runtest_logreport(report):
     yield
 
+    # Timings are recorded by the controller, which gets the reports of all the workers
+    if os.getenv("PYTEST_XDIST_WORKER"):
+        return
+    worker = report.node.gateway.id if hasattr(report, "node") else None
+    timing_store.record_phase(report, worker=worker)
+
     if report.when != "call":
         return
 
@@ -52,6 +66,11 @@ def pytest_runtest_logreport(report):
     output_path = LOAD_TESTING_OUTPUT_PATH / f"{file_name}.json"
     output = json.loads(output_path.read_text())
     metrics = output.get("metrics", {})
+    latency_path = LOAD_TESTING_OUTPUT_PATH / f"{file_name}.latency.json"
+    latency = (
+        LatencyBreakdown.load(latency_path).summary() if latency_path.exists() else {}
+    )
+    total_latency = latency.pop(TOTAL_KEY, {})
     message = {
         "run_date": str(start_time.date()),
         "run_num": os.getenv("RUN_NUM"),
@@ -69,6 +88,12 @@ def pytest_runtest_logreport(report):
         "http_req_duration_max": metrics["http_req_duration"]["max"],
         "http_req_duration_p90": metrics["http_req_duration"]["p(90)"],
         "http_req_duration_p95": metrics["http_req_duration"]["p(95)"],
+        "http_req_duration_p50": total_latency.get("p(50)"),
+        "http_req_duration_p99": total_latency.get("p(99)"),
+        "http_req_duration_p99_9": total_latency.get("p(99.9)"),
+        "http_req_duration_p99_99": total_latency.get("p(99.99)"),
+        # tags (e.g. "name=DRSAccess,status=200") => count, min, avg, max, percentiles
+        "http_req_duration_breakdown": latency,
         "data_sent_count": metrics["data_sent"]["count"],
         "data_sent_rate": metrics["data_sent"]["rate"],
         "iterations_count": metrics["iterations"]["count"],
@@ -92,20 +117,18 @@ def pytest_runtest_logreport(report):
             "rate"
         ),
     }
-
-    try:
-        sqs = boto3.client("sqs")
-        queue_url = (
-            "https://sqs.us-east-1.amazonaws.com/707767160287/load-test-metrics-sqs"
-        )
-        response = sqs.send_message(QueueUrl=queue_url, MessageBody=json.dumps(message))
-        logger.info(f"[SQS MESSAGE SENT] MessageId: {response['MessageId']}")
-    except Exception as e:
-        logger.error(f"[SQS SEND ERROR] {e}")
+    # Store the message and hand it to the background shipper
+    key = timing_store.add_message(LOAD_TEST_METRICS_QUEUE_URL, message)
+    metrics_shipper.submit(key, message)
 
 
 def pytest_unconfigure(config):
     if not hasattr(config, "workerinput"):
+        metrics_shipper.flush()
+        # Send what is left over from failed sends and from previous runs
+        timing_store.export_pending(LOAD_TEST_METRICS_QUEUE_URL, metrics_shipper.send)
+        metrics_shipper.close()
+        timing_store.close()
         directory_path = TEST_DATA_PATH_OBJECT / "generated_metadata_service_template"
         if os.path.exists(directory_path):
             shutil.rmtree(directory_path)
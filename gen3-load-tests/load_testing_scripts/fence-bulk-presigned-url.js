@@ -1,6 +1,7 @@
 const { check, group, sleep } = require('k6'); // eslint-disable-line import/no-unresolved
 const http = require('k6/http'); // eslint-disable-line import/no-unresolved
 const { Counter, Rate } = require('k6/metrics'); // eslint-disable-line import/no-unresolved
+const { SharedArray } = require('k6/data'); // eslint-disable-line import/no-unresolved
 
 const {
   ACCESS_TOKEN,
@@ -10,11 +11,16 @@ const {
   BULK_TEST_SCENARIO_GAP_SECONDS,
   BULK_TEST_VUS,
   GEN3_HOST,
+  GUIDS_FILE,
   GUIDS_LIST,
   RELEASE_VERSION,
 } = __ENV; // eslint-disable-line no-undef
 
-const guids = GUIDS_LIST.split(',').filter((guid) => guid);
+// GUIDS_FILE has one GUID per line (see utils/record_pool.py), GUIDS_LIST is comma-separated.
+// A SharedArray is loaded once and shared by the VUs, however many GUIDs there are
+const guids = new SharedArray('guids', () => (GUIDS_FILE
+  ? open(GUIDS_FILE).split('\n') // eslint-disable-line no-restricted-globals
+  : GUIDS_LIST.split(',')).filter((guid) => guid));
 const batchSizes = parseBatchSizes(BATCH_SIZES || '1,5,10,25,50,100');
 const scenarioDuration = BULK_TEST_DURATION || '60s';
 const scenarioGapSeconds = parseInt(BULK_TEST_SCENARIO_GAP_SECONDS || '5', 10);
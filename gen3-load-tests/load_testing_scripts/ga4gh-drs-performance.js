@@ -130,6 +130,8 @@ const {
     }
 
     const listOfDIDs = [];
+    // authz of each GUID, to break the latencies down by authz
+    const authzOfDIDs = {};
     // as long as we don't have enough records, continue to loop over provided ACL / Authz
     // and attempt to bump the page number for indexd's pagination
     while (listOfDIDs.length < minimumRecords) {
@@ -142,13 +144,17 @@ const {
         const url = `https://${TARGET_ENV}/index/index?authz=${authz}&limit=${recordChunkSize}&page=${indexdPaginationPageNum}`;
         console.log(`fetching guids from ${url}`);
         const resp = http.get(url, {
-          'content-type': 'application/json',
-          accept: 'application/json',
-        }, {});
+          headers: {
+            'content-type': 'application/json',
+            accept: 'application/json',
+          },
+          tags: { name: 'IndexdListRecords', authz },
+        });
 
         const body = JSON.parse(resp.body);
         for (const record of body.records) {
           listOfDIDs.push(record.did);
+          authzOfDIDs[record.did] = authz;
         }
       }
       indexdPaginationPageNum += 1;
@@ -172,7 +178,11 @@ const {
               method,
               url,
               body: JSON.stringify(requestBody),
-              params,
+              // the URL contains the GUID: name the requests to aggregate them
+              params: {
+                ...params,
+                tags: { name: 'DRSAccess', authz: authzOfDIDs[listOfDIDs[k]] },
+              },
             };
             i = k;
           }
@@ -1,8 +1,10 @@
 const { check, group, sleep } = require('k6'); // eslint-disable-line import/no-unresolved
 const http = require('k6/http'); // eslint-disable-line import/no-unresolved
 const { Rate } = require('k6/metrics'); // eslint-disable-line import/no-unresolved
+const { SharedArray } = require('k6/data'); // eslint-disable-line import/no-unresolved
 
 const {
+  GUIDS_FILE,
   GUIDS_LIST,
   RELEASE_VERSION,
   GEN3_HOST,
@@ -11,9 +13,11 @@ const {
   SIGNED_URL_PROTOCOL,
 } = __ENV; // eslint-disable-line no-undef
 
-// __ENV.GUIDS_LIST should contain either a list of GUIDs from load-test-descriptor.json
-// or it should be assembled based on an indexd query (requires `indexd_record_url` to fetch DIDs)
-const guids = GUIDS_LIST.split(',');
+// GUIDS_FILE has one GUID per line (see utils/record_pool.py), GUIDS_LIST is comma-separated.
+// A SharedArray is loaded once and shared by the VUs, however many GUIDs there are
+const guids = new SharedArray('guids', () => (GUIDS_FILE
+  ? open(GUIDS_FILE).split('\n') // eslint-disable-line no-restricted-globals
+  : GUIDS_LIST.split(',')).filter((guid) => guid));
 
 const myFailRate = new Rate('failed_requests');
 console.log(VIRTUAL_USERS)
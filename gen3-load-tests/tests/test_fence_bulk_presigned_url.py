@@ -3,9 +3,8 @@ import re
 
 import pytest
 from gen3.auth import Gen3Auth
-from gen3.index import Gen3Index
 from utils import load_test
-from utils import test_setup as setup
+from utils.record_pool import RecordPool
 
 
 @pytest.mark.fence_bulk_presigned_url
@@ -18,13 +17,12 @@ class TestFenceBulkPresignedURL:
         self.index_auth = Gen3Auth(
             refresh_token=pytest.api_keys["indexing_account"], endpoint=pytest.root_url
         )
-        self.index = Gen3Index(self.index_auth)
-        self.guids_list = []
+        self.record_pool = None
 
     def teardown_method(self):
-        """Delete the indexd records the test created"""
-        for did in self.guids_list:
-            self.index.delete_record(guid=did)
+        """Delete the pool's indexd records if LOAD_TEST_POOL_TEARDOWN is set"""
+        if self.record_pool:
+            self.record_pool.teardown()
 
     @staticmethod
     def _batch_sizes():
@@ -60,26 +58,22 @@ class TestFenceBulkPresignedURL:
         record_pool_size = int(
             os.getenv("BULK_PRESIGNED_URL_RECORD_POOL_SIZE", max_batch_size * 5)
         )
-
-        index_records = setup.get_indexd_records(
-            self.index_auth, indexd_record_acl="phs000178"
+        record_data = {
+            "acl": ["phs000178"],
+            "authz": ["/programs/phs000178.c1"],
+            "hashes": {
+                "md5": "e5c9a0d417f65226f564f438120381c5"  # pragma: allowlist secret
+            },
+            "size": 129,
+            "urls": ["s3://cdis-presigned-url-test/testdata"],
+        }
+        self.record_pool = RecordPool(
+            self.index_auth,
+            "fence-bulk-presigned-url",
+            [record_data],
+            record_pool_size,
         )
-        self.guids_list = [record["did"] for record in index_records]
-
-        # create records until we have a good pool size
-        while len(self.guids_list) < record_pool_size:
-            record_data = {
-                "acl": ["phs000178"],
-                "authz": ["/programs/phs000178.c1"],
-                "file_name": "bulk_presigned_url_load_test_file",
-                "hashes": {
-                    "md5": "e5c9a0d417f65226f564f438120381c5"  # pragma: allowlist secret
-                },
-                "size": 129,
-                "urls": ["s3://cdis-presigned-url-test/testdata"],
-            }
-            record = self.index.create_record(**record_data)
-            self.guids_list.append(record["did"])
+        self.guids_path = self.record_pool.ensure()
 
     def test_fence_bulk_presigned_url(self):
         """
@@ -93,7 +87,7 @@ class TestFenceBulkPresignedURL:
             "LOAD_TEST_SCENARIO": "bulk-presigned-url",
             "ACCESS_TOKEN": self.auth.get_access_token(),
             "GEN3_HOST": pytest.hostname,
-            "GUIDS_LIST": ",".join(self.guids_list).replace("'", ""),
+            "GUIDS_FILE": str(self.guids_path),
             "RELEASE_VERSION": os.getenv("RELEASE_VERSION", ""),
             "BATCH_SIZES": ",".join(str(size) for size in self._batch_sizes()),
             "BULK_ACCESS_ID": os.getenv("BULK_PRESIGNED_URL_ACCESS_ID", "s3"),
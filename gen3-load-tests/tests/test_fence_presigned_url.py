@@ -1,10 +1,10 @@
+import json
 import os
 
 import pytest
 from gen3.auth import Gen3Auth
-from gen3.index import Gen3Index
 from utils import load_test
-from utils import test_setup as setup
+from utils.record_pool import RecordPool
 
 
 @pytest.mark.fence_presigned_url
@@ -17,37 +17,36 @@ class TestFencePresignedURL:
         self.index_auth = Gen3Auth(
             refresh_token=pytest.api_keys["indexing_account"], endpoint=pytest.root_url
         )
-        self.index = Gen3Index(self.index_auth)
-
-        self.guids_list = []
+        self.record_pool = None
 
     def teardown_method(self):
-        for did in self.guids_list:
-            self.index.delete_record(guid=did)
+        if self.record_pool:
+            self.record_pool.teardown()
 
     def test_fence_presigned_url(self):
-        # Retrieve all indexd records
-        index_records = setup.get_indexd_records(
-            self.index_auth, indexd_record_acl="phs000178"
+        record_data = {
+            "acl": ["phs000178"],
+            "authz": ["/programs/phs000178.c1"],
+            "hashes": {"md5": "e5c9a0d417f65226f564f438120381c5"},
+            "size": 129,
+            "urls": [
+                "s3://cdis-presigned-url-test/testdata",
+                "gs://cdis-presigned-url-test/testdata",
+            ],
+        }
+        virtual_users = '[{"duration": "5s", "target": 1}, {"duration": "10s", "target": 10}, {"duration": "120s", "target": 100}, {"duration": "120s", "target": 300}, {"duration": "30s", "target": 1}]'
+        # The VUs pick a random GUID per request: with 5 x the peak VUs worth of
+        # records, concurrent requests are spread over different records
+        max_virtual_users = max(stage["target"] for stage in json.loads(virtual_users))
+        self.record_pool = RecordPool(
+            self.index_auth,
+            "fence-presigned-url",
+            [record_data],
+            int(
+                os.getenv("FENCE_PRESIGNED_URL_RECORD_POOL_SIZE", max_virtual_users * 5)
+            ),
         )
-        # If no record is present create one
-        if len(index_records) == 0:
-            record_data = {
-                "acl": ["phs000178"],
-                "authz": ["/programs/phs000178.c1"],
-                "file_name": "load_test_file",
-                "hashes": {"md5": "e5c9a0d417f65226f564f438120381c5"},
-                "size": 129,
-                "urls": [
-                    "s3://cdis-presigned-url-test/testdata",
-                    "gs://cdis-presigned-url-test/testdata",
-                ],
-            }
-            record = self.index.create_record(**record_data)
-            self.guids_list.append(record["did"])
-        else:
-            for record in index_records:
-                self.guids_list.append(record["did"])
+        guids_path = self.record_pool.ensure()
 
         # Setup env_vars to pass into load runner
         env_vars = {
@@ -55,9 +54,9 @@ class TestFencePresignedURL:
             "LOAD_TEST_SCENARIO": "presigned-url",
             "ACCESS_TOKEN": self.auth.get_access_token(),
             "GEN3_HOST": f"{pytest.hostname}",
-            "GUIDS_LIST": ",".join(self.guids_list).replace("'", ""),
+            "GUIDS_FILE": str(guids_path),
             "RELEASE_VERSION": os.getenv("RELEASE_VERSION"),
-            "VIRTUAL_USERS": '[{"duration": "5s", "target": 1}, {"duration": "10s", "target": 10}, {"duration": "120s", "target": 100}, {"duration": "120s", "target": 300}, {"duration": "30s", "target": 1}]',
+            "VIRTUAL_USERS": virtual_users,
         }
 
         # Run k6 load test
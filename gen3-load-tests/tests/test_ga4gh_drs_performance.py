@@ -3,8 +3,8 @@ import os
 
 import pytest
 from gen3.auth import Gen3Auth
-from gen3.index import Gen3Index
 from utils import GEN_LOAD_TESTING_PATH, load_test
+from utils.record_pool import RecordPool
 
 
 # @pytest.mark.skip(reason="Need to check on the mtls cert and key")
@@ -15,13 +15,10 @@ class TestGa4ghDrsPerformance:
         self.auth = Gen3Auth(
             refresh_token=pytest.api_keys["main_account"], endpoint=pytest.root_url
         )
-        index_auth = Gen3Auth(
+        self.index_auth = Gen3Auth(
             refresh_token=pytest.api_keys["indexing_account"], endpoint=pytest.root_url
         )
-        self.index = Gen3Index(index_auth)
-
-        # Guid list used for deletion in teardown_method
-        self.guid_list = []
+        self.record_pool = None
 
         # Get CRT and KEY from secrets
         mtls_crt = os.environ.get("MTLS_CRT")
@@ -35,8 +32,8 @@ class TestGa4ghDrsPerformance:
             key_file.write(decoded_key)
 
     def teardown_method(self):
-        for did in self.guid_list:
-            self.index.delete_record(guid=did)
+        if self.record_pool:
+            self.record_pool.teardown()
 
         if os.path.exists("./mtls.crt"):
             os.remove("./mtls.crt")
@@ -45,43 +42,27 @@ class TestGa4ghDrsPerformance:
             os.remove("./mtls.key")
 
     def test_ga4gh_drs_performance(self):
-        for i in range(400):
-            record_data_1 = {
-                "acl": ["jenkins"],
-                "authz": ["/programs/jnkns/projects/jenkins"],
-                "file_name": "load_test_file",
-                "hashes": {"md5": "e5c9a0d417f65226f564f438120381c5"},
-                "size": 129,
-                "urls": [
-                    "s3://cdis-presigned-url-test/testdata",
-                ],
-            }
-            record_data_2 = {
-                "acl": ["jenkins2"],
-                "authz": ["/programs/jnkns/projects/jenkins2"],
-                "file_name": "load_test_file",
+        records_data = [
+            {
+                "acl": [acl],
+                "authz": [authz],
                 "hashes": {"md5": "e5c9a0d417f65226f564f438120381c5"},
                 "size": 129,
                 "urls": [
                     "s3://cdis-presigned-url-test/testdata",
                 ],
             }
-            record_data_3 = {
-                "acl": ["test"],
-                "authz": ["/programs/QA/projects/test"],
-                "file_name": "load_test_file",
-                "hashes": {"md5": "e5c9a0d417f65226f564f438120381c5"},
-                "size": 129,
-                "urls": [
-                    "s3://cdis-presigned-url-test/testdata",
-                ],
-            }
-            record_indexd1 = self.index.create_record(**record_data_1)
-            self.guid_list.append(record_indexd1["did"])
-            record_indexd2 = self.index.create_record(**record_data_2)
-            self.guid_list.append(record_indexd2["did"])
-            record_indexd3 = self.index.create_record(**record_data_3)
-            self.guid_list.append(record_indexd3["did"])
+            for acl, authz in [
+                ("jenkins", "/programs/jnkns/projects/jenkins"),
+                ("jenkins2", "/programs/jnkns/projects/jenkins2"),
+                ("test", "/programs/QA/projects/test"),
+            ]
+        ]
+        self.record_pool = RecordPool(
+            self.index_auth, "ga4gh-drs-performance", records_data, 400
+        )
+        # The k6 script lists the records of each authz itself
+        self.record_pool.ensure()
 
         # Setup env_vars to pass into k6 load runner
         env_vars = {
@@ -1,10 +1,10 @@
+import json
 import os
 
 import pytest
 from gen3.auth import Gen3Auth
-from gen3.index import Gen3Index
 from utils import load_test
-from utils import test_setup as setup
+from utils.record_pool import RecordPool
 
 
 @pytest.mark.indexd_drs_endpoint
@@ -14,48 +14,47 @@ class TestIndexdDrsEndpoint:
         self.auth = Gen3Auth(
             refresh_token=pytest.api_keys["main_account"], endpoint=pytest.root_url
         )
-        index_auth = Gen3Auth(
+        self.index_auth = Gen3Auth(
             refresh_token=pytest.api_keys["indexing_account"], endpoint=pytest.root_url
         )
-        self.index = Gen3Index(index_auth)
-
-        self.guids_list = []
+        self.record_pool = None
 
     def teardown_method(self):
-        for did in self.guids_list:
-            self.index.delete_record(guid=did)
+        if self.record_pool:
+            self.record_pool.teardown()
 
     def test_indexd_drs_endpoint(self):
-        # Retrieve all indexd records
-        index_records = setup.get_indexd_records(
-            self.auth, indexd_record_acl="phs000178"
+        record_data = {
+            "acl": ["phs000178"],
+            "authz": ["/programs/phs000178.c1"],
+            "hashes": {"md5": "e5c9a0d417f65226f564f438120381c5"},
+            "size": 129,
+            "urls": [
+                "s3://cdis-presigned-url-test/testdata",
+            ],
+        }
+        virtual_users = '[{"duration": "1s", "target": 1}, {"duration": "5s", "target": 1}, {"duration": "1s", "target": 2}, {"duration": "5s", "target": 2}, {"duration": "1s", "target": 3}, {"duration": "5s", "target": 3}, {"duration": "1s", "target": 4}, {"duration": "5s", "target": 4}, {"duration": "1s", "target": 5}, {"duration": "5s", "target": 5}, {"duration": "1s", "target": 6}, {"duration": "5s", "target": 6}, {"duration": "1s", "target": 7}, {"duration": "5s", "target": 7}, {"duration": "1s", "target": 8}, {"duration": "5s", "target": 8}, {"duration": "1s", "target": 9}, {"duration": "5s", "target": 9}, {"duration": "1s", "target": 10}, {"duration": "5s", "target": 10}, {"duration": "1s", "target": 11}, {"duration": "5s", "target": 11}, {"duration": "1s", "target": 12}, {"duration": "5s", "target": 12}, {"duration": "1s", "target": 13}, {"duration": "5s", "target": 13}, {"duration": "1s", "target": 14}, {"duration": "5s", "target": 14}, {"duration": "1s", "target": 15}, {"duration": "5s", "target": 15}, {"duration": "1s", "target": 16}, {"duration": "5s", "target": 16}, {"duration": "1s", "target": 17}, {"duration": "5s", "target": 17}, {"duration": "1s", "target": 18}, {"duration": "5s", "target": 18}, {"duration": "1s", "target": 19}, {"duration": "5s", "target": 19}, {"duration": "1s", "target": 20}, {"duration": "5s", "target": 20}]'
+        # The VUs pick a random GUID per request: with 5 x the peak VUs worth of
+        # records, concurrent requests are spread over different records
+        max_virtual_users = max(stage["target"] for stage in json.loads(virtual_users))
+        self.record_pool = RecordPool(
+            self.index_auth,
+            "indexd-drs-endpoint",
+            [record_data],
+            int(
+                os.getenv("INDEXD_DRS_ENDPOINT_RECORD_POOL_SIZE", max_virtual_users * 5)
+            ),
         )
-        # If no record is present create one
-        if len(index_records) == 0:
-            record_data = {
-                "acl": ["phs000178"],
-                "authz": ["/programs/phs000178.c1"],
-                "file_name": "load_test_file",
-                "hashes": {"md5": "e5c9a0d417f65226f564f438120381c5"},
-                "size": 129,
-                "urls": [
-                    "s3://cdis-presigned-url-test/testdata",
-                ],
-            }
-            record = self.index.create_record(**record_data)
-            self.guids_list.append(record["did"])
-        else:
-            for record in index_records:
-                self.guids_list.append(record["did"])
+        guids_path = self.record_pool.ensure()
 
         env_vars = {
             "SERVICE": "indexd",
             "LOAD_TEST_SCENARIO": "drs-endpoint",
-            "GUIDS_LIST": ",".join(self.guids_list).replace("'", ""),
+            "GUIDS_FILE": str(guids_path),
             "RELEASE_VERSION": os.getenv("RELEASE_VERSION"),
             "GEN3_HOST": f"{pytest.hostname}",
             "ACCESS_TOKEN": self.auth.get_access_token(),
-            "VIRTUAL_USERS": '[{"duration": "1s", "target": 1}, {"duration": "5s", "target": 1}, {"duration": "1s", "target": 2}, {"duration": "5s", "target": 2}, {"duration": "1s", "target": 3}, {"duration": "5s", "target": 3}, {"duration": "1s", "target": 4}, {"duration": "5s", "target": 4}, {"duration": "1s", "target": 5}, {"duration": "5s", "target": 5}, {"duration": "1s", "target": 6}, {"duration": "5s", "target": 6}, {"duration": "1s", "target": 7}, {"duration": "5s", "target": 7}, {"duration": "1s", "target": 8}, {"duration": "5s", "target": 8}, {"duration": "1s", "target": 9}, {"duration": "5s", "target": 9}, {"duration": "1s", "target": 10}, {"duration": "5s", "target": 10}, {"duration": "1s", "target": 11}, {"duration": "5s", "target": 11}, {"duration": "1s", "target": 12}, {"duration": "5s", "target": 12}, {"duration": "1s", "target": 13}, {"duration": "5s", "target": 13}, {"duration": "1s", "target": 14}, {"duration": "5s", "target": 14}, {"duration": "1s", "target": 15}, {"duration": "5s", "target": 15}, {"duration": "1s", "target": 16}, {"duration": "5s", "target": 16}, {"duration": "1s", "target": 17}, {"duration": "5s", "target": 17}, {"duration": "1s", "target": 18}, {"duration": "5s", "target": 18}, {"duration": "1s", "target": 19}, {"duration": "5s", "target": 19}, {"duration": "1s", "target": 20}, {"duration": "5s", "target": 20}]',
+            "VIRTUAL_USERS": virtual_users,
             "SIGNED_URL_PROTOCOL": "s3",
         }
 
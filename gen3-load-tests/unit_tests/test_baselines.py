@@ -0,0 +1,182 @@
+"""
+BASELINES
+"""
+
+import io
+import math
+import random
+
+import pytest
+from utils.baselines import (
+    Baseline,
+    BaselineStore,
+    Comparison,
+    S3BaselineStore,
+    mann_whitney,
+    release_key,
+)
+from utils.latency_histogram import TOTAL_KEY, LatencyBreakdown, LatencyHistogram
+
+
+def histogram(values):
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+    return histogram
+
+
+def breakdown(values):
+    latency = LatencyBreakdown()
+    latency.histograms[TOTAL_KEY] = histogram(values)
+    return latency
+
+
+def samples(seed, scale=1.0, count=2000):
+    rng = random.Random(seed)
+    return [scale * rng.lognormvariate(4, 0.5) for _ in range(count)]
+
+
+def test_mann_whitney_exact_small_sample():
+    # every current latency is higher than every baseline one: U = 3 * 2
+    p_value, prob_slower = mann_whitney(histogram([3, 4, 5]), histogram([1, 2]))
+    assert prob_slower == 1.0
+    z = (6 - 3) / math.sqrt(3 * 2 / 12 * (3 + 2 + 1))
+    assert p_value == pytest.approx(0.5 * math.erfc(z / math.sqrt(2)))
+
+
+def test_mann_whitney_ties():
+    p_value, prob_slower = mann_whitney(histogram([1, 1, 1]), histogram([1, 1]))
+    assert prob_slower == 0.5
+    assert p_value == 1.0
+
+
+def test_mann_whitney_same_distribution():
+    p_value, prob_slower = mann_whitney(histogram(samples(1)), histogram(samples(2)))
+    assert p_value > 0.01
+    assert prob_slower == pytest.approx(0.5, abs=0.05)
+
+
+def test_mann_whitney_slower():
+    p_value, prob_slower = mann_whitney(
+        histogram(samples(1, scale=1.3)), histogram(samples(2))
+    )
+    assert p_value < 1e-6
+    assert prob_slower > 0.6
+
+
+def test_comparison_flags_latency_regression():
+    baseline = Baseline("2025.01", breakdown(samples(1)), [100.0])
+    comparison = Comparison(baseline, breakdown(samples(2, scale=1.5)), 100.0)
+    latency_row = comparison.rows[0]
+    assert latency_row["tags"] == TOTAL_KEY
+    assert latency_row["regression"]
+    assert comparison.regressions == [latency_row]
+
+
+def test_comparison_same_release_no_regression():
+    baseline = Baseline("2025.01", breakdown(samples(1)), [100.0, 104.0])
+    comparison = Comparison(baseline, breakdown(samples(2)), 101.0)
+    assert comparison.regressions == []
+    assert [row["metric"] for row in comparison.rows] == [
+        "p95 latency (ms)",
+        "throughput (req/s)",
+    ]
+
+
+def test_comparison_flags_throughput_regression():
+    baseline = Baseline("2025.01", breakdown(samples(1)), [100.0])
+    comparison = Comparison(baseline, breakdown(samples(2)), 80.0)
+    assert [row["metric"] for row in comparison.regressions] == ["throughput (req/s)"]
+
+
+def test_comparison_skips_small_samples():
+    baseline = Baseline("2025.01", breakdown(samples(1, count=10)))
+    comparison = Comparison(baseline, breakdown(samples(2, count=10)), None)
+    assert comparison.rows == []
+
+
+def test_release_key():
+    assert release_key("2025.04") == (2025, 4)
+    assert release_key("2025.10") > release_key("2025.9")
+    assert release_key("master") is None
+    assert release_key(None) is None
+
+
+def test_previous_is_the_highest_lower_release(tmp_path):
+    store = BaselineStore(tmp_path)
+    latency = breakdown(samples(1, count=10))
+    for release in ["2024.12", "2025.02", "2025.10", "master"]:
+        store.save(release, "scenario", latency, 100.0)
+    # saved last, but not older than the tested release
+    store.save("2025.04", "other_scenario", latency, 100.0)
+    store.save("2025.06", "scenario", latency, 100.0)
+
+    assert store.previous("2025.04", "scenario").release == "2025.02"
+    assert store.previous("2025.11", "scenario").release == "2025.10"
+    assert store.previous("2024.12", "scenario") is None
+    # runs which aren't releases (e.g. pull requests) are compared to the last release
+    assert store.previous("master", "scenario").release == "2025.10"
+    assert store.previous(None, "scenario").release == "2025.10"
+
+
+def test_save_merges_runs(tmp_path):
+    store = BaselineStore(tmp_path)
+    store.save("2025.04", "scenario", breakdown([10, 20]), 100.0)
+    store.save("2025.04", "scenario", breakdown([30]), 110.0)
+    baseline = store.load("2025.04", "scenario")
+    assert baseline.latency.histograms[TOTAL_KEY].total_count == 3
+    assert baseline.throughput == 105.0
+
+
+class FakeS3Client(object):
+    """The S3 client calls of S3BaselineStore, on objects kept in memory"""
+
+    class exceptions(object):
+        class NoSuchKey(Exception):
+            pass
+
+    def __init__(self):
+        self.objects = {}
+
+    def get_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise self.exceptions.NoSuchKey(Key)
+        return {"Body": io.BytesIO(self.objects[(Bucket, Key)])}
+
+    def put_object(self, Bucket, Key, Body, ContentType):
+        self.objects[(Bucket, Key)] = Body
+
+    def get_paginator(self, operation):
+        assert operation == "list_objects_v2"
+        return self
+
+    def paginate(self, Bucket, Prefix, Delimiter):
+        prefixes = sorted(
+            {
+                Prefix + key[len(Prefix) :].split(Delimiter)[0] + Delimiter
+                for bucket, key in self.objects
+                if bucket == Bucket
+                and key.startswith(Prefix)
+                and Delimiter in key[len(Prefix) :]
+            }
+        )
+        yield {"CommonPrefixes": [{"Prefix": prefix} for prefix in prefixes]}
+
+
+def test_s3_store(tmp_path, monkeypatch):
+    monkeypatch.setattr("utils.baselines.LOAD_TESTING_OUTPUT_PATH", tmp_path)
+    store = S3BaselineStore("s3://ci-bucket/load-tests/baselines/")
+    store._client = FakeS3Client()
+    assert store.load("2025.04", "scenario") is None
+
+    store.save("2025.02", "scenario", breakdown([10, 20]), 100.0)
+    store.save("2025.02", "scenario", breakdown([30]), 110.0)
+    store.save("2025.04", "scenario", breakdown([40]), 120.0)
+    assert ("ci-bucket", "load-tests/baselines/2025.02/scenario.json") in (
+        store.client.objects
+    )
+    baseline = store.load("2025.02", "scenario")
+    assert baseline.latency.histograms[TOTAL_KEY].total_count == 3
+    assert baseline.throughput == 105.0
+    assert store.previous("2025.04", "scenario").release == "2025.02"
+    assert store.previous("master", "scenario").release == "2025.04"
@@ -0,0 +1,64 @@
+"""
+K6 RUNNER
+"""
+
+import pytest
+from utils import k6_runner
+from utils.k6_runner import K6Runner, wilson_upper_bound
+
+
+def test_wilson_upper_bound_known_value():
+    # 95% interval of 8 passes out of 10: [0.490, 0.943]
+    assert wilson_upper_bound(8, 10, z=1.96) == pytest.approx(0.943, abs=0.001)
+
+
+def test_wilson_upper_bound_edges():
+    assert wilson_upper_bound(0, 0) == 1.0
+    assert wilson_upper_bound(100, 100) == pytest.approx(1.0)
+    assert 0 < wilson_upper_bound(0, 100) < 0.1
+
+
+def test_wilson_upper_bound_narrows_with_samples():
+    bounds = [wilson_upper_bound(n * 95 // 100, n) for n in (100, 1000, 10000)]
+    assert bounds[0] > bounds[1] > bounds[2] > 0.95
+
+
+@pytest.fixture
+def runner(tmp_path):
+    script = tmp_path / "script.js"
+    script.write_text(
+        "export const options = { thresholds: { http_req_duration: ['p(95)<100'] } };"
+    )
+    return K6Runner(script, None, tmp_path / "points.json", {}, pass_threshold=98)
+
+
+def add_points(runner, metric, values):
+    for value in values:
+        runner._add_line(
+            '{"type": "Point", "metric": "%s", "data": '
+            '{"time": "2026-01-01T00:00:00Z", "value": %s}}' % (metric, value)
+        )
+
+
+def test_abort_on_pass_rate(runner):
+    add_points(runner, "checks", [1] * 180 + [0] * 20)
+    assert "pass rate" in runner._check_thresholds()
+
+
+def test_no_abort_while_pass_rate_can_pass(runner):
+    add_points(runner, "checks", [1] * 196 + [0] * 4)
+    assert runner._check_thresholds() is None
+
+
+def test_p95_spike_doesnt_abort(runner):
+    # a warm-up spike, then fast requests: k6's p95 over the whole run passes
+    add_points(runner, "http_req_duration", [500] * 20 + [50] * 980)
+    for _ in range(k6_runner.ABORT_P95_CONSECUTIVE):
+        assert runner._check_thresholds() is None
+
+
+def test_abort_on_p95(runner):
+    add_points(runner, "http_req_duration", [50] * 500 + [500] * 500)
+    for _ in range(k6_runner.ABORT_P95_CONSECUTIVE - 1):
+        assert runner._check_thresholds() is None
+    assert "p95 latency" in runner._check_thresholds()
@@ -0,0 +1,115 @@
+"""
+LATENCY HISTOGRAM
+"""
+
+import math
+import random
+
+import pytest
+from utils.latency_histogram import (
+    OTHER_KEY,
+    TOTAL_KEY,
+    LatencyBreakdown,
+    LatencyHistogram,
+)
+
+
+def exact_percentile(values, percentile):
+    values = sorted(values)
+    return values[max(1, math.ceil(percentile / 100 * len(values))) - 1]
+
+
+def k6_point(value, **tags):
+    return {
+        "type": "Point",
+        "metric": "http_req_duration",
+        "data": {"time": "2026-01-01T00:00:00Z", "value": value, "tags": tags},
+    }
+
+
+@pytest.fixture
+def latencies():
+    rng = random.Random(42)
+    # mostly fast requests and a slow tail, from 0.1ms to a few seconds
+    return [rng.lognormvariate(3, 1.2) for _ in range(20000)]
+
+
+def test_percentiles_within_precision(latencies):
+    histogram = LatencyHistogram(significant_digits=2)
+    for value in latencies:
+        histogram.record(value)
+    assert histogram.total_count == len(latencies)
+    for percentile in [50, 90, 95, 99, 99.9, 99.99]:
+        exact = exact_percentile(latencies, percentile)
+        assert histogram.percentile(percentile) == pytest.approx(exact, rel=0.01)
+    assert histogram.percentile(100) == pytest.approx(max(latencies), abs=0.001)
+
+
+def test_small_values_are_exact():
+    histogram = LatencyHistogram()
+    for value in [0.001, 0.002, 0.003, 0.1]:
+        histogram.record(value)
+    assert histogram.percentile(25) == 0.001
+    assert histogram.percentile(50) == 0.002
+    assert histogram.summary()["min"] == 0.001
+
+
+def test_empty_histogram():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(95) is None
+    assert histogram.percentile_ci(95) == (None, None)
+    assert histogram.summary() == {"count": 0}
+
+
+def test_percentile_ci_contains_the_percentile(latencies):
+    histogram = LatencyHistogram()
+    for value in latencies:
+        histogram.record(value)
+    low, high = histogram.percentile_ci(95)
+    assert low <= histogram.percentile(95) <= high
+    assert low < high
+
+
+def test_merge_is_the_same_as_recording_everything(latencies):
+    merged = LatencyHistogram()
+    whole = LatencyHistogram()
+    for start in range(0, len(latencies), 5000):
+        shard = LatencyHistogram()
+        for value in latencies[start : start + 5000]:
+            shard.record(value)
+            whole.record(value)
+        merged.merge(shard)
+    assert merged.counts == whole.counts
+    assert merged.summary() == whole.summary()
+
+
+def test_merge_different_precisions():
+    with pytest.raises(Exception):
+        LatencyHistogram(2).merge(LatencyHistogram(3))
+
+
+def test_dict_round_trip(latencies):
+    histogram = LatencyHistogram()
+    for value in latencies[:1000]:
+        histogram.record(value)
+    assert (
+        LatencyHistogram.from_dict(histogram.to_dict()).summary()
+        == histogram.summary()
+    )
+
+
+def test_breakdown_by_tags(monkeypatch):
+    breakdown = LatencyBreakdown()
+    breakdown.add(k6_point(10, name="A", status="200"))
+    breakdown.add(k6_point(20, name="A", status="200"))
+    breakdown.add(k6_point(30, name="B", status="500"))
+    breakdown.add({"type": "Point", "metric": "checks", "data": {"value": 1}})
+    summary = breakdown.summary()
+    assert summary[TOTAL_KEY]["count"] == 3
+    assert summary["name=A,status=200"]["count"] == 2
+    assert summary["name=B,status=500"]["max"] == 30
+
+    monkeypatch.setattr("utils.latency_histogram.MAX_BREAKDOWN_KEYS", 1)
+    breakdown.add(k6_point(40, name="C"))
+    assert breakdown.histograms[OTHER_KEY].total_count == 1
+    assert breakdown.histograms[TOTAL_KEY].total_count == 4
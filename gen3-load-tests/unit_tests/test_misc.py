@@ -0,0 +1,47 @@
+"""
+MISC
+"""
+
+import pytest
+from utils import misc
+from utils.misc import retry
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(misc.time, "sleep", sleeps.append)
+    return sleeps
+
+
+def test_retry_first_attempt_does_not_wait(sleeps):
+    @retry(times=3, delay=5, exceptions=(ValueError,))
+    def succeed():
+        return "done"
+
+    assert succeed() == "done"
+    assert sleeps == []
+
+
+def test_retry_waits_between_attempts(sleeps):
+    calls = []
+
+    @retry(times=3, delay=5, exceptions=(ValueError,))
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ValueError()
+        return "done"
+
+    assert flaky() == "done"
+    assert sleeps == [5, 5]
+
+
+def test_retry_raises_after_the_last_attempt(sleeps):
+    @retry(times=2, delay=1, exceptions=(ValueError,))
+    def fail():
+        raise ValueError("still failing")
+
+    with pytest.raises(ValueError, match="still failing"):
+        fail()
+    assert sleeps == [1, 1]
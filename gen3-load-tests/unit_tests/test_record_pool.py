@@ -0,0 +1,174 @@
+"""
+RECORD POOL
+"""
+
+import json
+import threading
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from utils import record_pool
+from utils import test_setup as setup
+from utils.record_pool import RecordPool
+
+TEMPLATES = [
+    {"acl": ["phs000178"], "authz": ["/programs/phs000178.c1"], "size": 129},
+    {"acl": ["phs000179"], "authz": ["/programs/phs000179.c1"], "size": 129},
+]
+
+
+class FakeIndexd(object):
+    """GET /index/index of indexd: filters, `limit` and `start` pagination"""
+
+    def __init__(self):
+        self.records = []
+        self.requests = 0
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                api.requests += 1
+                query = parse_qs(urlparse(self.path).query)
+                query = {key: values[0] for key, values in query.items()}
+                data = json.dumps({"records": api.page(**query)}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def page(self, limit, start=None, **filters):
+        records = sorted(self.records, key=lambda record: record["did"])
+        matching = [
+            record
+            for record in records
+            if (start is None or record["did"] > start)
+            and all(
+                ",".join(record[key]) == value
+                if isinstance(record[key], list)
+                else record[key] == value
+                for key, value in filters.items()
+            )
+        ]
+        return matching[: int(limit)]
+
+    def add(self, **record):
+        record = {"did": str(uuid.uuid4()), **record}
+        self.records.append(record)
+        return record
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def indexd(monkeypatch, tmp_path):
+    indexd = FakeIndexd().start()
+    monkeypatch.setattr(pytest, "root_url", indexd.url, raising=False)
+    monkeypatch.setattr(setup, "_indexd_session", None)
+    monkeypatch.setattr(record_pool, "LOAD_TESTING_OUTPUT_PATH", tmp_path)
+    # records are created in the fake indexd by create_indexd_records below
+    monkeypatch.setattr(record_pool, "Gen3Index", lambda auth: None)
+
+    def create_indexd_records(index, records_data):
+        return [
+            {"success": True, "record": indexd.add(**record_data)}
+            for record_data in records_data
+        ]
+
+    monkeypatch.setattr(setup, "create_indexd_records", create_indexd_records)
+    yield indexd
+    indexd.stop()
+
+
+def pool_guids(path):
+    return path.read_text().split()
+
+
+def test_iter_indexd_records_pages(indexd):
+    for _ in range(5):
+        indexd.add(file_name="a", version="1", authz=["/a"])
+    indexd.add(file_name="b", version="1", authz=["/a"])
+    guids = list(setup.iter_indexd_guids(None, page_size=2, file_name="a"))
+    assert len(set(guids)) == 5
+    assert indexd.requests == 3
+
+
+def test_count_indexd_records_stops_at_the_limit(indexd):
+    for _ in range(5):
+        indexd.add(file_name="a", version="1", authz=["/a"])
+    assert setup.count_indexd_records(None, file_name="a") == 5
+    assert setup.count_indexd_records(None, limit=3, file_name="a") == 3
+    assert setup.count_indexd_records(None, file_name="b") == 0
+
+
+def test_write_guids_file(tmp_path):
+    path = tmp_path / "guids"
+    assert setup.write_guids_file(path, iter(["a", "b", "c"])) == 3
+    assert pool_guids(path) == ["a", "b", "c"]
+    assert setup.write_guids_file(path, iter(["a", "b"]), sample_size=5) == 2
+    assert pool_guids(path) == ["a", "b"]
+
+
+def test_write_guids_file_samples_uniformly(tmp_path):
+    path = tmp_path / "guids"
+    picks = Counter()
+    for seed in range(2000):
+        assert setup.write_guids_file(path, range(10), sample_size=3, seed=seed) == 3
+        sample = pool_guids(path)
+        assert len(set(sample)) == 3
+        picks.update(sample)
+    # each GUID is in 3 of 10 samples
+    for guid in map(str, range(10)):
+        assert picks[guid] == pytest.approx(600, rel=0.15)
+
+
+def test_ensure_tops_up_the_pool(indexd):
+    pool = RecordPool(None, "scenario", TEMPLATES, 3)
+    indexd.add(**pool._record(TEMPLATES[0]))
+    guids = pool_guids(pool.ensure())
+    assert len(set(guids)) == 6
+    assert len(indexd.records) == 6
+    assert Counter(record["acl"][0] for record in indexd.records) == {
+        "phs000178": 3,
+        "phs000179": 3,
+    }
+
+    # the next run reuses the records
+    assert sorted(pool_guids(pool.ensure())) == sorted(guids)
+    assert len(indexd.records) == 6
+
+
+def test_ensure_samples_the_pool(indexd):
+    pool = RecordPool(None, "scenario", TEMPLATES, 5)
+    all_guids = set(pool_guids(pool.ensure()))
+    sample = pool_guids(pool.ensure(sample_size=4))
+    assert len(set(sample)) == 4
+    assert set(sample) <= all_guids
+
+
+def test_ensure_fails_when_records_are_not_created(indexd, monkeypatch):
+    monkeypatch.setattr(
+        setup,
+        "create_indexd_records",
+        lambda index, records_data: [
+            {"success": False, "error": "500"} for _ in records_data
+        ],
+    )
+    pool = RecordPool(None, "scenario", TEMPLATES, 2)
+    with pytest.raises(Exception, match="Pool 'scenario' has 0 records"):
+        pool.ensure()
@@ -0,0 +1,336 @@
+import csv
+import io
+import json
+import math
+import os
+import re
+import statistics
+import time
+from pathlib import Path
+
+import boto3
+from filelock import FileLock
+from utils import GEN_LOAD_TESTING_PATH, LOAD_TESTING_OUTPUT_PATH, logger
+from utils.latency_histogram import TOTAL_KEY, LatencyBreakdown
+
+# One directory per release, with one file per scenario. Used when no S3 URL is set
+BASELINES_PATH = Path(
+    os.getenv("LOAD_TEST_BASELINES_PATH", GEN_LOAD_TESTING_PATH / "baselines")
+)
+# s3://<bucket>/<prefix> to keep the baselines in, so the CI runs share them
+BASELINES_S3_URL = os.getenv("LOAD_TEST_BASELINES_S3_URL")
+# Release to compare to, by default the highest release version lower than the tested
+# release (RELEASE_VERSION)
+BASELINE_RELEASE = os.getenv("LOAD_TEST_BASELINE_RELEASE")
+# "fail" the test on a regression, only "flag" it in the report, or "off"
+REGRESSION_MODE = os.getenv("LOAD_TEST_REGRESSION_MODE", "flag").lower()
+# Relative increase of the p95 latency / decrease of the throughput tolerated
+LATENCY_TOLERANCE = float(os.getenv("LOAD_TEST_LATENCY_TOLERANCE", "0.1"))
+THROUGHPUT_TOLERANCE = float(os.getenv("LOAD_TEST_THROUGHPUT_TOLERANCE", "0.1"))
+# Significance level of the comparison, split between the compared tags
+REGRESSION_ALPHA = float(os.getenv("LOAD_TEST_REGRESSION_ALPHA", "0.01"))
+# Tags with fewer requests than this in either run are not compared
+REGRESSION_MIN_SAMPLES = int(os.getenv("LOAD_TEST_REGRESSION_MIN_SAMPLES", "100"))
+# Save the results of the tested release (RELEASE_VERSION) as its baseline
+SAVE_BASELINE = os.getenv("LOAD_TEST_SAVE_BASELINE", "true").lower() == "true"
+# Fail the test when there is no baseline to compare to, by default in CI, where a
+# missing baseline means the store is misconfigured
+BASELINE_REQUIRED = (
+    os.getenv(
+        "LOAD_TEST_BASELINE_REQUIRED", os.getenv("GITHUB_ACTIONS", "false")
+    ).lower()
+    == "true"
+)
+CONFIDENCE_Z = 2.576  # 99%
+
+
+def mann_whitney(current, baseline):
+    """
+    One-sided Mann-Whitney U test of 2 LatencyHistograms with the same precision: the
+    probability of seeing latencies this much higher in `current` if it had the
+    distribution of `baseline` (normal approximation, values of a bucket being ties).
+
+    Returns (p-value, probability that a current latency is higher than a baseline one)
+    """
+    n1 = current.total_count
+    n2 = baseline.total_count
+    u = 0.0
+    baseline_below = 0
+    ties = 0
+    for index in sorted(set(current.counts) | set(baseline.counts)):
+        current_count = current.counts.get(index, 0)
+        baseline_count = baseline.counts.get(index, 0)
+        u += current_count * (baseline_below + baseline_count / 2)
+        baseline_below += baseline_count
+        tied = current_count + baseline_count
+        ties += tied**3 - tied
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0, 0.5
+    z = (u - n1 * n2 / 2) / math.sqrt(variance)
+    return 0.5 * math.erfc(z / math.sqrt(2)), u / (n1 * n2)
+
+
+def release_key(release):
+    """Sort key of a release version, e.g. "2025.04" => (2025, 4), None if not a version"""
+    if not re.fullmatch(r"\d+(\.\d+)*", release or ""):
+        return None
+    return tuple(int(part) for part in release.split("."))
+
+
+def get_throughput(summary):
+    """Requests per second of a k6 summary export"""
+    return summary.get("metrics", {}).get("http_reqs", {}).get("rate")
+
+
+class Baseline(object):
+    """
+    Results of a scenario on a release: the latency histograms of its runs merged
+    together, and the throughput of each run
+    """
+
+    def __init__(self, release, latency=None, throughputs=None, saved_at=None):
+        self.release = release
+        self.latency = latency or LatencyBreakdown()
+        self.throughputs = throughputs or []
+        self.saved_at = saved_at
+
+    @property
+    def throughput(self):
+        return statistics.median(self.throughputs) if self.throughputs else None
+
+    def to_dict(self):
+        return {
+            "release": self.release,
+            "saved_at": self.saved_at,
+            "throughputs": self.throughputs,
+            "latency": self.latency.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data["release"],
+            LatencyBreakdown.from_dict(data["latency"]),
+            data["throughputs"],
+            data["saved_at"],
+        )
+
+
+class BaselineStore(object):
+    """`<path>/<release>/<scenario>.json` files of the Baselines"""
+
+    def __init__(self, path=BASELINES_PATH):
+        self.path = Path(path)
+
+    def __str__(self):
+        return str(self.path)
+
+    def _file(self, release, scenario):
+        return self.path / re.sub(r"[^\w.-]", "_", release) / f"{scenario}.json"
+
+    def _read(self, release, scenario):
+        file = self._file(release, scenario)
+        return file.read_text() if file.exists() else None
+
+    def _write(self, release, scenario, text):
+        file = self._file(release, scenario)
+        file.parent.mkdir(parents=True, exist_ok=True)
+        file.write_text(text)
+
+    def _lock_path(self, release, scenario):
+        return f"{self._file(release, scenario)}.lock"
+
+    def _releases(self):
+        return [
+            directory.name for directory in self.path.glob("*") if directory.is_dir()
+        ]
+
+    def load(self, release, scenario):
+        text = self._read(release, scenario)
+        if text is None:
+            return None
+        return Baseline.from_dict(json.loads(text))
+
+    def save(self, release, scenario, latency, throughput):
+        """Add a run to the baseline of `scenario` on `release`"""
+        Path(self._lock_path(release, scenario)).parent.mkdir(
+            parents=True, exist_ok=True
+        )
+        # runs of the same release on several workers
+        with FileLock(self._lock_path(release, scenario)):
+            baseline = self.load(release, scenario) or Baseline(release)
+            baseline.latency.merge(latency)
+            if throughput is not None:
+                baseline.throughputs.append(throughput)
+            baseline.saved_at = time.time()
+            self._write(release, scenario, json.dumps(baseline.to_dict()))
+        logger.info(f"Saved the results of {scenario} to the {release} baseline")
+
+    def previous(self, release, scenario):
+        """
+        The baseline of `scenario` for the highest release version lower than `release`,
+        or for the highest release version if `release` is not a release version (e.g.
+        a pull request)
+        """
+        current_key = release_key(release)
+        older_releases = [
+            name
+            for name in self._releases()
+            if release_key(name) is not None
+            and (current_key is None or release_key(name) < current_key)
+        ]
+        for older_release in sorted(older_releases, key=release_key, reverse=True):
+            baseline = self.load(older_release, scenario)
+            if baseline is not None:
+                return baseline
+        return None
+
+
+class S3BaselineStore(BaselineStore):
+    """`<s3 url>/<release>/<scenario>.json` objects of the Baselines"""
+
+    def __init__(self, url=BASELINES_S3_URL):
+        self.url = url.rstrip("/")
+        self.bucket, _, self.prefix = self.url[len("s3://") :].partition("/")
+        self._client = None
+
+    def __str__(self):
+        return self.url
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = boto3.client("s3")
+        return self._client
+
+    def _key(self, release, scenario):
+        release = re.sub(r"[^\w.-]", "_", release)
+        return "/".join(filter(None, [self.prefix, release, f"{scenario}.json"]))
+
+    def _read(self, release, scenario):
+        try:
+            response = self.client.get_object(
+                Bucket=self.bucket, Key=self._key(release, scenario)
+            )
+        except self.client.exceptions.NoSuchKey:
+            return None
+        return response["Body"].read().decode("utf-8")
+
+    def _write(self, release, scenario, text):
+        self.client.put_object(
+            Bucket=self.bucket,
+            Key=self._key(release, scenario),
+            Body=text.encode("utf-8"),
+            ContentType="application/json",
+        )
+
+    def _lock_path(self, release, scenario):
+        # only serializes the workers of this runner, CI runs of a release don't overlap
+        return LOAD_TESTING_OUTPUT_PATH / f"baseline_{release}_{scenario}.lock"
+
+    def _releases(self):
+        prefix = f"{self.prefix}/" if self.prefix else ""
+        releases = []
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(
+            Bucket=self.bucket, Prefix=prefix, Delimiter="/"
+        ):
+            for common_prefix in page.get("CommonPrefixes", []):
+                releases.append(common_prefix["Prefix"][len(prefix) :].rstrip("/"))
+        return releases
+
+
+def get_baseline_store():
+    if BASELINES_S3_URL:
+        return S3BaselineStore(BASELINES_S3_URL)
+    return BaselineStore(BASELINES_PATH)
+
+
+class Comparison(object):
+    """Latencies and throughput of a run compared to a baseline"""
+
+    def __init__(self, baseline, latency, throughput):
+        self.baseline = baseline
+        self.rows = []
+        keys = [
+            key
+            for key, histogram in latency.histograms.items()
+            if key in baseline.latency.histograms
+            and histogram.total_count >= REGRESSION_MIN_SAMPLES
+            and baseline.latency.histograms[key].total_count >= REGRESSION_MIN_SAMPLES
+        ]
+        # Bonferroni correction, every compared tag is a chance of a false alarm
+        alpha = REGRESSION_ALPHA / max(1, len(keys))
+        for key in sorted(keys, key=lambda key: (key != TOTAL_KEY, key)):
+            self.rows.append(
+                self._compare_latency(
+                    key,
+                    latency.histograms[key],
+                    baseline.latency.histograms[key],
+                    alpha,
+                )
+            )
+        baseline_throughput = baseline.throughput
+        if throughput is not None and baseline_throughput:
+            change = throughput / baseline_throughput - 1
+            self.rows.append(
+                {
+                    "metric": "throughput (req/s)",
+                    "tags": TOTAL_KEY,
+                    "baseline": round(baseline_throughput, 2),
+                    "current": round(throughput, 2),
+                    "change": f"{change * 100:+.1f}%",
+                    "p_value": None,
+                    "regression": change < -THROUGHPUT_TOLERANCE,
+                }
+            )
+
+    def _compare_latency(self, key, current, baseline, alpha):
+        baseline_p95 = baseline.percentile(95)
+        current_p95 = current.percentile(95)
+        _, baseline_high = baseline.percentile_ci(95, CONFIDENCE_Z)
+        current_low, _ = current.percentile_ci(95, CONFIDENCE_Z)
+        p_value, prob_slower = mann_whitney(current, baseline)
+        change = current_p95 / baseline_p95 - 1 if baseline_p95 else 0.0
+        return {
+            "metric": "p95 latency (ms)",
+            "tags": key,
+            "baseline": baseline_p95,
+            "current": current_p95,
+            "change": f"{change * 100:+.1f}%",
+            "p_value": float(f"{p_value:.3g}"),
+            "prob_slower": round(prob_slower, 3),
+            # slower beyond the tolerance, and not by chance: the latencies are higher
+            # overall and the p95 confidence intervals don't overlap
+            "regression": change > LATENCY_TOLERANCE
+            and p_value < alpha
+            and current_low > baseline_high,
+        }
+
+    @property
+    def regressions(self):
+        return [row for row in self.rows if row["regression"]]
+
+    def to_csv(self):
+        output = io.StringIO()
+        writer = csv.DictWriter(
+            output,
+            fieldnames=[
+                "metric",
+                "tags",
+                "baseline",
+                "current",
+                "change",
+                "p_value",
+                "prob_slower",
+                "regression",
+            ],
+        )
+        writer.writeheader()
+        writer.writerows(self.rows)
+        return output.getvalue()
+
+
+baseline_store = get_baseline_store()
@@ -0,0 +1,346 @@
+import json
+import math
+import os
+import re
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from utils import logger
+from utils.latency_histogram import TOTAL_KEY, LatencyBreakdown
+
+# How often the progress of a running load test is logged
+PROGRESS_INTERVAL_SECS = int(os.getenv("LOAD_TEST_PROGRESS_INTERVAL_SECS", "30"))
+# Stop the load test as soon as it can't meet its thresholds anymore
+EARLY_ABORT = os.getenv("LOAD_TEST_EARLY_ABORT", "true").lower() == "true"
+# Samples needed before the pass rate and the p95 are judged
+ABORT_MIN_CHECKS = int(os.getenv("LOAD_TEST_ABORT_MIN_CHECKS", "200"))
+# Confidence of the pass rate and p95 bounds: 2.576 => 99%
+ABORT_Z_SCORE = float(os.getenv("LOAD_TEST_ABORT_Z_SCORE", "2.576"))
+# The p95 of the whole run must be over the threshold in this many progress checks in a row
+ABORT_P95_CONSECUTIVE = int(os.getenv("LOAD_TEST_ABORT_P95_CONSECUTIVE", "3"))
+# Window of the latency and throughput logged while the load test runs
+P95_WINDOW_SECS = int(os.getenv("LOAD_TEST_P95_WINDOW_SECS", "60"))
+# How long k6 gets to write its summary once interrupted
+ABORT_GRACE_SECS = 60
+# Number of k6 stdout/stderr lines kept for the report
+OUTPUT_TAIL_LINES = 500
+
+
+def wilson_upper_bound(passes, total, z=ABORT_Z_SCORE):
+    """Upper bound of the confidence interval of a pass rate (Wilson score interval)"""
+    if total == 0:
+        return 1.0
+    rate = passes / total
+    denominator = 1 + z * z / total
+    center = rate + z * z / (2 * total)
+    margin = z * math.sqrt(rate * (1 - rate) / total + z * z / (4 * total * total))
+    return (center + margin) / denominator
+
+
+def get_p95_threshold(js_script_path):
+    """The `http_req_duration: ['p(95)<N']` threshold of the k6 script in ms, None if not set"""
+    match = re.search(
+        r"http_req_duration\s*:\s*\[[^\]]*p\(95\)\s*<\s*(\d+(?:\.\d+)?)",
+        js_script_path.read_text(),
+    )
+    return float(match.group(1)) if match else None
+
+
+class RollingAggregates(object):
+    """
+    Aggregates of the points written by `k6 run --out json`: totals for the checks,
+    failed requests and requests, and latencies over the last `window_secs`
+    """
+
+    def __init__(self, window_secs=P95_WINDOW_SECS):
+        self.window_secs = window_secs
+        self.check_passes = 0
+        self.check_fails = 0
+        self.failed_requests = 0
+        self.requests = 0
+        # (epoch time, duration in ms) of the http requests of the window
+        self.durations = deque()
+
+    def add(self, point):
+        """Add a k6 JSON output line, already parsed"""
+        if point.get("type") != "Point":
+            return
+        metric = point["metric"]
+        data = point["data"]
+        value = data["value"]
+        if metric == "checks":
+            if value:
+                self.check_passes += 1
+            else:
+                self.check_fails += 1
+        elif metric == "failed_requests":
+            self.requests += 1
+            if value:
+                self.failed_requests += 1
+        elif metric == "http_req_duration":
+            point_time = _parse_k6_time(data["time"])
+            self.durations.append((point_time, value))
+            while (
+                self.durations and self.durations[0][0] < point_time - self.window_secs
+            ):
+                self.durations.popleft()
+
+    @property
+    def checks(self):
+        return self.check_passes + self.check_fails
+
+    @property
+    def pass_rate(self):
+        return self.check_passes / self.checks if self.checks else None
+
+    def window_percentile(self, percentile):
+        if not self.durations:
+            return None
+        values = sorted(value for _, value in self.durations)
+        return values[min(len(values) - 1, int(len(values) * percentile / 100))]
+
+    @property
+    def window_rps(self):
+        if len(self.durations) < 2:
+            return 0.0
+        span = self.durations[-1][0] - self.durations[0][0]
+        return len(self.durations) / span if span > 0 else 0.0
+
+    def to_dict(self):
+        return {
+            "checks": self.checks,
+            "check_passes": self.check_passes,
+            "check_fails": self.check_fails,
+            "pass_rate": self.pass_rate,
+            "requests": self.requests,
+            "failed_requests": self.failed_requests,
+            "window_p95_ms": self.window_percentile(95),
+            "window_rps": round(self.window_rps, 2),
+        }
+
+
+def _parse_k6_time(value):
+    # e.g. "2024-05-02T10:11:12.123456789Z" or "...+02:00": keep microseconds at most
+    match = re.match(r"(.*?T\d\d:\d\d:\d\d)(\.\d+)?(Z|[+-]\d\d:\d\d)?$", value)
+    base, fraction, zone = match.groups()
+    fraction = (fraction or ".0")[:7]
+    zone = "+00:00" if zone in (None, "Z") else zone
+    return datetime.fromisoformat(f"{base}{fraction}{zone}").timestamp()
+
+
+class K6Result(object):
+    """Outcome of a k6 run, with the same `returncode`, `stdout` and `stderr` as subprocess.run"""
+
+    def __init__(
+        self,
+        returncode,
+        stdout,
+        stderr,
+        aggregates,
+        aborted_reason,
+        points_path,
+        latency_breakdown,
+    ):
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.aggregates = aggregates
+        # why the run was stopped early, None if it ran to the end
+        self.aborted_reason = aborted_reason
+        self.points_path = points_path
+        # HDR histograms of the http_req_duration, overall and per tags
+        self.latency_breakdown = latency_breakdown
+
+    @property
+    def aborted(self):
+        return self.aborted_reason is not None
+
+
+class K6Runner(object):
+    """
+    Runs a k6 script and follows the points it writes (`--out json=<file>`) while it
+    runs, instead of waiting for it to exit. Logs the progress every
+    PROGRESS_INTERVAL_SECS and interrupts k6 (like Ctrl+C, so it still writes its
+    summary) once the thresholds are clearly out of reach:
+    - the pass rate of the checks can't reach `pass_threshold` anymore: the upper bound
+      of its 99% confidence interval is below it
+    - the p95 since the start of the run, which is what k6 checks the script's
+      `p(95)<N` threshold against, is over it: the lower bound of its 99% confidence
+      interval is over the threshold ABORT_P95_CONSECUTIVE times in a row
+    """
+
+    def __init__(
+        self,
+        js_script_path,
+        summary_path,
+        points_path,
+        env,
+        pass_threshold,
+        early_abort=EARLY_ABORT,
+    ):
+        self.js_script_path = js_script_path
+        self.summary_path = summary_path
+        self.points_path = points_path
+        self.env = env
+        self.pass_threshold = pass_threshold
+        self.early_abort = early_abort
+        self.p95_threshold = get_p95_threshold(js_script_path)
+        self.aggregates = RollingAggregates()
+        self.latency_breakdown = LatencyBreakdown()
+        self.aborted_reason = None
+        self._lock = threading.Lock()
+        self._p95_violations = 0
+        self._stdout = deque(maxlen=OUTPUT_TAIL_LINES)
+        self._stderr = deque(maxlen=OUTPUT_TAIL_LINES)
+
+    def _read_output(self, stream, lines):
+        for line in stream:
+            line = line.rstrip("\n")
+            lines.append(line)
+            logger.debug(f"[k6] {line}")
+
+    def _add_line(self, line):
+        try:
+            point = json.loads(line)
+        except ValueError:
+            return
+        with self._lock:
+            self.aggregates.add(point)
+            self.latency_breakdown.add(point)
+
+    def _follow_points(self, process):
+        """Parse the points as k6 writes them, until it exits"""
+        while not self.points_path.exists():
+            if process.poll() is not None:
+                return
+            time.sleep(0.2)
+        with open(self.points_path, "r") as points_file:
+            partial = ""
+            while True:
+                line = points_file.readline()
+                if line.endswith("\n"):
+                    self._add_line(partial + line)
+                    partial = ""
+                    continue
+                # end of what k6 wrote so far, maybe in the middle of a line
+                partial += line
+                if process.poll() is not None:
+                    for line in (partial + points_file.read()).splitlines():
+                        self._add_line(line)
+                    return
+                time.sleep(0.2)
+
+    def _check_thresholds(self):
+        """The reason to stop the run, None if it can still pass"""
+        aggregates = self.aggregates
+        if aggregates.checks >= ABORT_MIN_CHECKS:
+            upper_bound = wilson_upper_bound(aggregates.check_passes, aggregates.checks)
+            if upper_bound * 100 < self.pass_threshold:
+                return (
+                    f"pass rate {aggregates.pass_rate * 100:.2f}% after {aggregates.checks} checks, "
+                    f"at most {upper_bound * 100:.2f}% with 99% confidence, threshold {self.pass_threshold}%"
+                )
+        histogram = self.latency_breakdown.histograms.get(TOTAL_KEY)
+        if (
+            self.p95_threshold is not None
+            and histogram is not None
+            and histogram.total_count >= ABORT_MIN_CHECKS
+        ):
+            low, _ = histogram.percentile_ci(95, z=ABORT_Z_SCORE)
+            if low > self.p95_threshold:
+                self._p95_violations += 1
+            else:
+                self._p95_violations = 0
+            if self._p95_violations >= ABORT_P95_CONSECUTIVE:
+                return (
+                    f"p95 latency {histogram.percentile(95):.0f}ms after {histogram.total_count} requests, "
+                    f"at least {low:.0f}ms with 99% confidence, threshold {self.p95_threshold:.0f}ms, "
+                    f"{self._p95_violations} times in a row"
+                )
+        return None
+
+    def _log_progress(self, elapsed):
+        aggregates = self.aggregates.to_dict()
+        pass_rate = aggregates["pass_rate"]
+        p95 = aggregates["window_p95_ms"]
+        logger.info(
+            f"[{self.js_script_path.stem}] {elapsed:.0f}s: {aggregates['checks']} checks, "
+            f"pass rate {'-' if pass_rate is None else f'{pass_rate * 100:.2f}%'}, "
+            f"{aggregates['failed_requests']} failed requests, "
+            f"p95 {'-' if p95 is None else f'{p95:.0f}ms'} and {aggregates['window_rps']} req/s "
+            f"over the last {P95_WINDOW_SECS}s"
+        )
+
+    def run(self):
+        self.points_path.unlink(missing_ok=True)
+        process = subprocess.Popen(
+            [
+                "k6",
+                "run",
+                str(self.js_script_path),
+                f"--summary-export={self.summary_path}",
+                f"--out=json={self.points_path}",
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            env=self.env,
+        )
+        threads = [
+            threading.Thread(
+                target=self._read_output,
+                args=(process.stdout, self._stdout),
+                daemon=True,
+            ),
+            threading.Thread(
+                target=self._read_output,
+                args=(process.stderr, self._stderr),
+                daemon=True,
+            ),
+            threading.Thread(target=self._follow_points, args=(process,), daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+        start = time.time()
+        aborted_at = None
+        while True:
+            try:
+                process.wait(timeout=PROGRESS_INTERVAL_SECS)
+                break
+            except subprocess.TimeoutExpired:
+                pass
+            if aborted_at and time.time() - aborted_at > ABORT_GRACE_SECS:
+                logger.error(
+                    f"[{self.js_script_path.stem}] k6 still running {ABORT_GRACE_SECS}s after being interrupted, killing it"
+                )
+                process.kill()
+                continue
+            with self._lock:
+                self._log_progress(time.time() - start)
+                reason = self._check_thresholds() if self.early_abort else None
+            if reason and self.aborted_reason is None:
+                self.aborted_reason = reason
+                logger.error(
+                    f"[{self.js_script_path.stem}] Stopping the load test: {reason}"
+                )
+                process.send_signal(signal.SIGINT)
+                aborted_at = time.time()
+        # the aggregates and histograms must include every point k6 wrote
+        points_thread = threads[-1]
+        points_thread.join()
+        for thread in threads[:-1]:
+            thread.join(timeout=30)
+        self._log_progress(time.time() - start)
+        return K6Result(
+            process.returncode,
+            "\n".join(self._stdout),
+            "\n".join(self._stderr),
+            self.aggregates.to_dict(),
+            self.aborted_reason,
+            self.points_path,
+            self.latency_breakdown,
+        )
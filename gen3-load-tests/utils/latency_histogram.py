@@ -0,0 +1,241 @@
+import json
+import math
+import os
+import sys
+from pathlib import Path
+
+# Tags of the k6 points the latencies are broken down by, when the points have them
+BREAKDOWN_TAGS = os.getenv(
+    "LATENCY_BREAKDOWN_TAGS", "scenario,group,name,method,status,batch_size,authz"
+).split(",")
+# More keys than this are counted under OTHER_KEY, e.g. when requests are not named and
+# each URL is its own key
+MAX_BREAKDOWN_KEYS = int(os.getenv("LATENCY_MAX_BREAKDOWN_KEYS", "500"))
+TOTAL_KEY = "*"
+OTHER_KEY = "other"
+PERCENTILES = [50, 75, 90, 95, 99, 99.9, 99.99]
+
+
+class LatencyHistogram(object):
+    """
+    HDR histogram of latencies: values are recorded in microseconds with
+    `significant_digits` of precision (2 => within 1%) whatever their magnitude, in at
+    most a couple thousand buckets, so the tail percentiles are as precise as the median.
+
+    The buckets are the ones of HdrHistogram: `sub_bucket_count` linear buckets for
+    values up to `sub_bucket_count`, then the same number of buckets for every power of 2,
+    each twice as wide as the previous ones. Histograms with the same precision are merged
+    by adding their counts, so the histograms of several runs or shards can be combined.
+    """
+
+    def __init__(self, significant_digits=2):
+        self.significant_digits = significant_digits
+        largest_single_unit = 2 * 10**significant_digits
+        self.sub_bucket_count = 2 ** math.ceil(math.log2(largest_single_unit))
+        self.sub_bucket_half_count_magnitude = int(math.log2(self.sub_bucket_count)) - 1
+        self.sub_bucket_half_count = self.sub_bucket_count // 2
+        # counts index => count, only the non-empty buckets
+        self.counts = {}
+        self.total_count = 0
+        self.total_us = 0
+        self.min_us = None
+        self.max_us = None
+
+    def _index(self, value):
+        bucket_index = max(
+            0, value.bit_length() - (self.sub_bucket_half_count_magnitude + 1)
+        )
+        sub_bucket_index = value >> bucket_index
+        return ((bucket_index + 1) << self.sub_bucket_half_count_magnitude) + (
+            sub_bucket_index - self.sub_bucket_half_count
+        )
+
+    def _highest_equivalent_value(self, index):
+        """Largest value counted in the bucket `index`"""
+        bucket_index = (index >> self.sub_bucket_half_count_magnitude) - 1
+        sub_bucket_index = (
+            index & (self.sub_bucket_half_count - 1)
+        ) + self.sub_bucket_half_count
+        if bucket_index < 0:
+            sub_bucket_index -= self.sub_bucket_half_count
+            bucket_index = 0
+        return (sub_bucket_index << bucket_index) + (1 << bucket_index) - 1
+
+    def record(self, value_ms, count=1):
+        value = max(0, int(round(value_ms * 1000)))
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.total_count += count
+        self.total_us += value * count
+        self.min_us = value if self.min_us is None else min(self.min_us, value)
+        self.max_us = value if self.max_us is None else max(self.max_us, value)
+
+    def merge(self, other):
+        if other.significant_digits != self.significant_digits:
+            raise Exception(
+                f"Unable to merge histograms of {other.significant_digits} and {self.significant_digits} significant digits"
+            )
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total_count += other.total_count
+        self.total_us += other.total_us
+        if other.min_us is not None:
+            self.min_us = (
+                other.min_us if self.min_us is None else min(self.min_us, other.min_us)
+            )
+            self.max_us = (
+                other.max_us if self.max_us is None else max(self.max_us, other.max_us)
+            )
+        return self
+
+    def value_at_rank(self, rank):
+        """Latency in ms of the `rank`-th smallest value (from 1), None if empty"""
+        if not self.total_count:
+            return None
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                # the exact max is known, don't report more than it
+                return min(self._highest_equivalent_value(index), self.max_us) / 1000
+        return self.max_us / 1000
+
+    def percentile(self, percentile):
+        """Latency in ms under which `percentile`% of the values are, None if empty"""
+        return self.value_at_rank(
+            max(1, math.ceil(percentile / 100 * self.total_count))
+        )
+
+    def percentile_ci(self, percentile, z=2.576):
+        """
+        Confidence interval (2.576 => 99%) of the `percentile` of the distribution the
+        values were drawn from, as (low, high) in ms: the ranks of the bounds come from the
+        binomial distribution of the number of values under the percentile
+        """
+        if not self.total_count:
+            return None, None
+        n = self.total_count
+        p = percentile / 100
+        margin = z * math.sqrt(n * p * (1 - p))
+        return (
+            self.value_at_rank(max(1, math.floor(n * p - margin))),
+            self.value_at_rank(min(n, math.ceil(n * p + margin) + 1)),
+        )
+
+    def summary(self):
+        if not self.total_count:
+            return {"count": 0}
+        summary = {
+            "count": self.total_count,
+            "min": self.min_us / 1000,
+            "avg": round(self.total_us / self.total_count / 1000, 3),
+            "max": self.max_us / 1000,
+        }
+        for percentile in PERCENTILES:
+            summary[f"p({percentile:g})"] = self.percentile(percentile)
+        return summary
+
+    def to_dict(self):
+        return {
+            "significant_digits": self.significant_digits,
+            "counts": {str(index): count for index, count in self.counts.items()},
+            "total_count": self.total_count,
+            "total_us": self.total_us,
+            "min_us": self.min_us,
+            "max_us": self.max_us,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls(data["significant_digits"])
+        histogram.counts = {
+            int(index): count for index, count in data["counts"].items()
+        }
+        histogram.total_count = data["total_count"]
+        histogram.total_us = data["total_us"]
+        histogram.min_us = data["min_us"]
+        histogram.max_us = data["max_us"]
+        return histogram
+
+
+def breakdown_key(tags, breakdown_tags=BREAKDOWN_TAGS):
+    """e.g. "name=BulkPreSignedURL,status=200,batch_size=10" """
+    return ",".join(f"{tag}={tags[tag]}" for tag in breakdown_tags if tags.get(tag))
+
+
+class LatencyBreakdown(object):
+    """
+    One LatencyHistogram of the `metric` per combination of the BREAKDOWN_TAGS of the
+    k6 points (e.g. per request name, status and batch size), plus the TOTAL_KEY one for
+    all the points
+    """
+
+    def __init__(self, metric="http_req_duration", significant_digits=2):
+        self.metric = metric
+        self.significant_digits = significant_digits
+        self.histograms = {}
+
+    def _histogram(self, key):
+        if key not in self.histograms:
+            self.histograms[key] = LatencyHistogram(self.significant_digits)
+        return self.histograms[key]
+
+    def add(self, point):
+        """Add a k6 JSON output line, already parsed"""
+        if point.get("type") != "Point" or point.get("metric") != self.metric:
+            return
+        data = point["data"]
+        key = breakdown_key(data.get("tags") or {})
+        if key not in self.histograms and len(self.histograms) > MAX_BREAKDOWN_KEYS:
+            key = OTHER_KEY
+        self._histogram(TOTAL_KEY).record(data["value"])
+        if key:
+            self._histogram(key).record(data["value"])
+
+    def merge(self, other):
+        for key, histogram in other.histograms.items():
+            self._histogram(key).merge(histogram)
+        return self
+
+    def summary(self):
+        """key => count, min, avg, max and percentiles in ms"""
+        return {key: histogram.summary() for key, histogram in self.histograms.items()}
+
+    def to_dict(self):
+        return {
+            "metric": self.metric,
+            "significant_digits": self.significant_digits,
+            "histograms": {
+                key: histogram.to_dict() for key, histogram in self.histograms.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        breakdown = cls(data["metric"], data["significant_digits"])
+        breakdown.histograms = {
+            key: LatencyHistogram.from_dict(histogram)
+            for key, histogram in data["histograms"].items()
+        }
+        return breakdown
+
+    def save(self, path):
+        Path(path).write_text(json.dumps(self.to_dict()))
+
+    @classmethod
+    def load(cls, path):
+        return cls.from_dict(json.loads(Path(path).read_text()))
+
+
+def merge_files(paths):
+    """Merge the breakdowns saved by several runs or shards"""
+    breakdowns = [LatencyBreakdown.load(path) for path in paths]
+    merged = LatencyBreakdown(breakdowns[0].metric, breakdowns[0].significant_digits)
+    for breakdown in breakdowns:
+        merged.merge(breakdown)
+    return merged
+
+
+if __name__ == "__main__":
+    # python -m utils.latency_histogram <breakdown file>... > merged summary
+    print(json.dumps(merge_files(sys.argv[1:]).summary(), indent=2))
@@ -1,42 +1,132 @@
 import json
 import os
-import subprocess
 
+import allure
 import pytest
+from allure_commons.types import AttachmentType
 from utils import LOAD_TESTING_OUTPUT_PATH, LOAD_TESTING_SCRIPTS_PATH, logger
+from utils.baselines import (
+    BASELINE_RELEASE,
+    BASELINE_REQUIRED,
+    REGRESSION_MODE,
+    SAVE_BASELINE,
+    Comparison,
+    baseline_store,
+    get_throughput,
+)
+from utils.k6_runner import K6Runner
 from utils.test_execution import attach_json_file
 
 
 def run_load_test(env_vars):
+    """
+    Run the k6 script of the scenario, following its results as they come and stopping it
+    early if it can't pass anymore (see utils.k6_runner)
+    """
     service = env_vars["SERVICE"]
     load_test_scenario = env_vars["LOAD_TEST_SCENARIO"]
     js_script_path = LOAD_TESTING_SCRIPTS_PATH / f"{service}-{load_test_scenario}.js"
     output_path = LOAD_TESTING_OUTPUT_PATH / f"{service}-{load_test_scenario}.json"
+    points_path = (
+        LOAD_TESTING_OUTPUT_PATH / f"{service}-{load_test_scenario}.points.json"
+    )
     logger.info(f"Running load test for {service}-{load_test_scenario}")
-    result = subprocess.run(
-        ["k6", "run", js_script_path, f"--summary-export={output_path}"],
-        capture_output=True,
-        text=True,
+    result = K6Runner(
+        js_script_path,
+        summary_path=output_path,
+        points_path=points_path,
         env={**env_vars, **dict(os.environ)},
-    )
+        pass_threshold=pytest.pass_threshold,
+    ).run()
     logger.info(result.stdout)
     logger.info(result.stderr)
+    # the latency histograms are kept so runs and shards can be merged later
+    result.latency_breakdown.save(
+        LOAD_TESTING_OUTPUT_PATH / f"{service}-{load_test_scenario}.latency.json"
+    )
     return result
 
 
 def get_results(result, service, load_test_scenario):
     logger.info(f"Validating logs for {service}-{load_test_scenario}")
+    if result.aborted:
+        raise Exception(
+            f"Load test {service}-{load_test_scenario} stopped early: {result.aborted_reason}"
+        )
     output_path = LOAD_TESTING_OUTPUT_PATH / f"{service}-{load_test_scenario}.json"
     output = json.loads(output_path.read_text())
     passed = str(output["metrics"]["checks"]["passes"])
     failed = str(output["metrics"]["checks"]["fails"])
     pass_rate = round(float(output["metrics"]["checks"]["value"]) * 100, 2)
     attach_json_file(f"{service}-{load_test_scenario}.json")
+    latency_summary = result.latency_breakdown.summary()
+    allure.attach(
+        json.dumps(latency_summary, indent=2),
+        name=f"{service}-{load_test_scenario} latency percentiles",
+        attachment_type=AttachmentType.JSON,
+    )
     logger.info(f"Load Test Metrics for {service}-{load_test_scenario}:")
     logger.info(f"Passed   : {passed}")
     logger.info(f"Failed   : {failed}")
     logger.info(f"Pass Rate: {pass_rate}%")
+    for key, summary in latency_summary.items():
+        if summary["count"]:
+            logger.info(
+                f"Latency {key}: p50 {summary['p(50)']}ms, p99 {summary['p(99)']}ms, "
+                f"p99.9 {summary['p(99.9)']}ms over {summary['count']} requests"
+            )
     if pass_rate < pytest.pass_threshold:
         logger.info(result.stdout)
         logger.info(result.stderr)
-        raise f"Pass rate is below threshold of {pytest.pass_threshold}%"
+        raise Exception(f"Pass rate is below threshold of {pytest.pass_threshold}%")
+    compare_to_baseline(result, f"{service}-{load_test_scenario}", output)
+
+
+def compare_to_baseline(result, scenario, summary):
+    """
+    Compare the latencies and throughput of the run to the baseline of the previous
+    release (see utils.baselines) and save them as the baseline of this release
+    """
+    if REGRESSION_MODE == "off":
+        return
+    release = os.getenv("RELEASE_VERSION")
+    throughput = get_throughput(summary)
+    if BASELINE_RELEASE:
+        baseline = baseline_store.load(BASELINE_RELEASE, scenario)
+    else:
+        baseline = baseline_store.previous(release, scenario)
+    regressions = []
+    if baseline is None:
+        logger.info(f"No baseline to compare {scenario} to in {baseline_store}")
+    else:
+        comparison = Comparison(baseline, result.latency_breakdown, throughput)
+        allure.attach(
+            comparison.to_csv(),
+            name=f"{scenario} compared to {baseline.release}",
+            attachment_type=AttachmentType.CSV,
+        )
+        for row in comparison.rows:
+            logger.info(
+                f"{row['metric']} [{row['tags']}]: {row['baseline']} on {baseline.release}, "
+                f"{row['current']} now ({row['change']})"
+                + (" REGRESSION" if row["regression"] else "")
+            )
+        regressions = comparison.regressions
+    if release and SAVE_BASELINE:
+        baseline_store.save(release, scenario, result.latency_breakdown, throughput)
+    if baseline is None and BASELINE_REQUIRED:
+        raise Exception(
+            f"No baseline to compare {scenario} to in {baseline_store}. Set "
+            "LOAD_TEST_BASELINES_S3_URL to the shared baselines, "
+            "LOAD_TEST_BASELINE_RELEASE to a release saved there, or "
+            "LOAD_TEST_BASELINE_REQUIRED=false to run without comparing"
+        )
+    if not regressions:
+        return
+    message = f"{scenario} regressed since {baseline.release}: " + ", ".join(
+        f"{row['metric']} [{row['tags']}] {row['change']}" for row in regressions
+    )
+    if REGRESSION_MODE == "fail":
+        raise Exception(message)
+    logger.error(message)
+    allure.dynamic.tag("performance-regression")
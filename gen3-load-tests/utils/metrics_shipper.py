@@ -0,0 +1,176 @@
+import json
+import os
+import queue
+import random
+import threading
+import time
+from pathlib import Path
+
+import boto3
+from utils import logger
+
+# SQS accepts at most 10 messages per send_message_batch call
+SQS_BATCH_SIZE = 10
+# How long the shipper waits for a batch to fill up before sending it anyway
+BATCH_LINGER_SECS = float(os.getenv("METRICS_BATCH_LINGER_SECS", "2"))
+MAX_RETRIES = int(os.getenv("METRICS_MAX_RETRIES", "5"))
+BACKOFF_SECS = float(os.getenv("METRICS_BACKOFF_SECS", "0.5"))
+# Write messages to this file (one JSON object per line) instead of sending them to SQS
+FILE_SINK_PATH = os.getenv("METRICS_FILE_SINK")
+
+
+class SQSSink(object):
+    def __init__(self, queue_url):
+        self.queue_url = queue_url
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = boto3.client("sqs")
+        return self._client
+
+    def send_batch(self, entries):
+        """
+        Send up to 10 (key, message) entries in one call.
+        Returns the keys of the messages which failed.
+        """
+        response = self.client.send_message_batch(
+            QueueUrl=self.queue_url,
+            Entries=[
+                {"Id": str(i), "MessageBody": json.dumps(message)}
+                for i, (_, message) in enumerate(entries)
+            ],
+        )
+        failed = []
+        for failure in response.get("Failed", []):
+            failed.append(entries[int(failure["Id"])][0])
+            logger.error(
+                f"[SQS SEND ERROR] {failure.get('Code')}: {failure.get('Message')}"
+            )
+        return failed
+
+
+class FileSink(object):
+    """Local stand-in for SQS, appends every message to a JSON lines file"""
+
+    def __init__(self, queue_url, path=FILE_SINK_PATH):
+        self.queue_url = queue_url
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def send_batch(self, entries):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock, open(self.path, "a") as f:
+            for _, message in entries:
+                f.write(json.dumps({"queue": self.queue_url, "message": message}) + "\n")
+        return []
+
+
+def get_sink(queue_url):
+    if FILE_SINK_PATH:
+        return FileSink(queue_url)
+    return SQSSink(queue_url)
+
+
+class MetricsShipper(object):
+    """
+    Sends metrics messages from a background thread, 10 per call, so reporting a test
+    result never waits on the network.
+
+    Failed sends are retried with exponential backoff. `on_sent` is called from the
+    shipper thread with the keys of the messages which were sent.
+    """
+
+    def __init__(self, sink, on_sent=None, batch_size=SQS_BATCH_SIZE):
+        self.sink = sink
+        self.on_sent = on_sent
+        self.batch_size = batch_size
+        self.stats = {"messages": 0, "batches": 0, "retries": 0, "failed": 0}
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def submit(self, key, message):
+        """Queue a message, returns right away"""
+        self._start()
+        self._queue.put((key, message))
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + BATCH_LINGER_SECS
+        while len(batch) < self.batch_size and batch[-1] is not None:
+            try:
+                batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        done = False
+        while not done:
+            batch = self._next_batch()
+            if batch[-1] is None:
+                done = True
+            entries = [entry for entry in batch if entry is not None]
+            try:
+                if entries:
+                    self.send(entries)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def send(self, entries):
+        """
+        Send the (key, message) entries now, in batches, retrying failures with backoff.
+        Returns the keys of the messages which were sent.
+        """
+        sent = []
+        for i in range(0, len(entries), self.batch_size):
+            sent.extend(self._send_batch(entries[i : i + self.batch_size]))
+        return sent
+
+    def _send_batch(self, entries):
+        pending = entries
+        all_sent = []
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                failed_keys = set(self.sink.send_batch(pending))
+            except Exception as e:
+                logger.error(f"[SQS SEND ERROR] {e}")
+                failed_keys = set(key for key, _ in pending)
+            sent = [key for key, _ in pending if key not in failed_keys]
+            all_sent.extend(sent)
+            self.stats["batches"] += 1
+            self.stats["messages"] += len(sent)
+            if sent and self.on_sent:
+                self.on_sent(sent)
+            pending = [entry for entry in pending if entry[0] in failed_keys]
+            if not pending or attempt == MAX_RETRIES:
+                break
+            self.stats["retries"] += 1
+            time.sleep(BACKOFF_SECS * 2**attempt * random.uniform(0.5, 1.5))
+        self.stats["failed"] += len(pending)
+        return all_sent
+
+    def flush(self):
+        """Wait until every queued message was sent or given up on"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        logger.info(
+            f"Metrics shipper stats: {self.stats['messages']} messages sent in "
+            f"{self.stats['batches']} batches, {self.stats['retries']} retries, "
+            f"{self.stats['failed']} failed"
+        )
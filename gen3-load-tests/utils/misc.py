@@ -11,7 +11,6 @@ def retry(times, delay, exceptions):
         def newfn(*args, **kwargs):
             attempt = 1
             while attempt <= times:
-                time.sleep(delay)
                 try:
                     return func(*args, **kwargs)
                 except exceptions:
@@ -19,6 +18,7 @@ def retry(times, delay, exceptions):
                         f"Errored when trying to run '{func.__name__}', attempt {attempt} of {times}"
                     )
                     attempt += 1
+                time.sleep(delay)
             return func(*args, **kwargs)
 
         return newfn
@@ -0,0 +1,120 @@
+import os
+
+from filelock import FileLock
+from gen3.index import Gen3Index
+from utils import LOAD_TESTING_OUTPUT_PATH, logger
+from utils import test_setup as setup
+
+# Bump to stop using the records of the pools created so far (e.g. after changing the
+# record templates), they are then left alone
+POOL_VERSION = os.getenv("LOAD_TEST_POOL_VERSION", "1")
+# Delete the records of the pools once the load tests are done instead of keeping them
+# for the next runs
+POOL_TEARDOWN = os.getenv("LOAD_TEST_POOL_TEARDOWN", "false").lower() == "true"
+# Only pass a random sample of this many GUIDs of each pool to the k6 scripts, e.g. to
+# keep the GUIDs file small with large pools (all of them by default)
+POOL_SAMPLE_SIZE = (
+    int(os.environ["LOAD_TEST_POOL_SAMPLE_SIZE"])
+    if os.getenv("LOAD_TEST_POOL_SAMPLE_SIZE")
+    else None
+)
+
+
+class RecordPool(object):
+    """
+    Indexd records kept in the environment across runs for a load test scenario, instead
+    of creating and deleting them every run.
+
+    The records of a pool are labeled with their file name (`load_test_pool_<name>`) and
+    version (POOL_VERSION). There are `size` records of each of the `templates` (records
+    data, with different authz); the missing ones are created concurrently. indexd has no
+    count query, so the pool is checked while listing at most `size` records of each
+    template, the listing the GUIDs file is written from; it is only counted again
+    after creating records.
+    """
+
+    def __init__(self, index_auth, name, templates, size, version=POOL_VERSION):
+        self.index_auth = index_auth
+        self.name = name
+        self.templates = templates
+        self.size = size
+        self.version = version
+
+    @property
+    def file_name(self):
+        return f"load_test_pool_{self.name}"
+
+    def _record(self, template):
+        return {
+            **template,
+            "file_name": self.file_name,
+            "version": self.version,
+            "metadata": {"load_test_pool": self.name},
+        }
+
+    def _filters(self, template=None):
+        """indexd query parameters of the pool's records of `template` (all by default)"""
+        filters = {"file_name": self.file_name, "version": self.version}
+        if template is not None:
+            filters["authz"] = ",".join(template["authz"])
+        return filters
+
+    @property
+    def guids_path(self):
+        """File with the GUIDs of the pool, one per line, passed to the k6 scripts"""
+        return LOAD_TESTING_OUTPUT_PATH / f"{self.name}.guids"
+
+    def _guids(self):
+        """
+        GUIDs of at most `size` records of each template, topping up the templates
+        that are short
+        """
+        for template in self.templates:
+            count = 0
+            for guid in setup.iter_indexd_guids(
+                self.index_auth, limit=self.size, **self._filters(template)
+            ):
+                yield guid
+                count += 1
+            missing = self.size - count
+            if missing <= 0:
+                continue
+            logger.info(f"Adding {missing} records to pool '{self.name}' (has {count})")
+            results = setup.create_indexd_records(
+                Gen3Index(self.index_auth),
+                [self._record(template) for _ in range(missing)],
+            )
+            for result in results:
+                if result["success"]:
+                    yield result["record"]["did"]
+            # the new records must be found by the next runs, check they are listed
+            count = setup.count_indexd_records(
+                self.index_auth, limit=self.size, **self._filters(template)
+            )
+            if count < self.size:
+                raise Exception(
+                    f"Pool '{self.name}' has {count} records of "
+                    f"{template['authz']}, expected {self.size}"
+                )
+
+    def ensure(self, sample_size=POOL_SAMPLE_SIZE):
+        """
+        Top up the pool if it is short and write the GUIDs of its records (or a random
+        sample of `sample_size` of them) to `guids_path`, which is returned
+        """
+        # workers running the same scenario top it up once
+        with FileLock(LOAD_TESTING_OUTPUT_PATH / f"{self.name}.pool.lock"):
+            written = setup.write_guids_file(
+                self.guids_path, self._guids(), sample_size
+            )
+        logger.info(f"Pool '{self.name}': wrote {written} GUIDs to {self.guids_path}")
+        return self.guids_path
+
+    def teardown(self, force=False):
+        """Delete the records of the pool, only if POOL_TEARDOWN is set or `force`"""
+        if not (POOL_TEARDOWN or force):
+            return
+        setup.delete_indexd_records(
+            Gen3Index(self.index_auth),
+            list(setup.iter_indexd_guids(self.index_auth, **self._filters())),
+        )
@@ -1,6 +1,8 @@
 import csv
 import json
+import os
 import random
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import pytest
@@ -10,6 +12,12 @@ from gen3.submission import Gen3Submission
 from jinja2 import Environment, FileSystemLoader
 from utils import TEST_DATA_PATH_OBJECT, logger
 
+# Maximum number of concurrent indexd requests made while seeding/cleaning up records
+INDEXD_BULK_MAX_WORKERS = int(os.getenv("INDEXD_BULK_MAX_WORKERS", "8"))
+# Largest page indexd returns
+INDEXD_PAGE_SIZE = 1024
+_indexd_session = None
+
 
 def get_api_key(user):
     file_path = Path.home() / ".gen3" / f"{pytest.namespace}_{user}.json"
@@ -28,15 +36,118 @@ def get_users():
     return users
 
 
-def get_indexd_records(auth, indexd_record_acl=None):
-    url = f"{pytest.root_url}/index/index"
-    if indexd_record_acl:
-        url += f"?acl={indexd_record_acl}"
-    result = requests.get(url=url, auth=auth)
-    assert (
-        result.status_code == 200
-    ), f"Expected status 200 but got {result.status_code}"
-    return result.json()["records"]
+def get_indexd_session():
+    """Session reused by the indexd listings, keeping its connections open"""
+    global _indexd_session
+    if _indexd_session is None:
+        _indexd_session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=INDEXD_BULK_MAX_WORKERS)
+        _indexd_session.mount("https://", adapter)
+    return _indexd_session
+
+
+def iter_indexd_records(auth, limit=None, page_size=INDEXD_PAGE_SIZE, **filters):
+    """
+    Yield the indexd records matching the `filters` (acl, authz, file_name, version...
+    query parameters of GET /index/index) page by page, following indexd's `start`
+    pagination, so only one page is in memory at a time. Stops after `limit` records.
+    """
+    seen = 0
+    start = None
+    while limit is None or seen < limit:
+        params = {**filters, "limit": page_size}
+        if limit is not None:
+            params["limit"] = min(page_size, limit - seen)
+        if start:
+            params["start"] = start
+        result = get_indexd_session().get(
+            url=f"{pytest.root_url}/index/index", params=params, auth=auth
+        )
+        assert (
+            result.status_code == 200
+        ), f"Expected status 200 but got {result.status_code}"
+        records = result.json()["records"]
+        yield from records
+        seen += len(records)
+        if len(records) < params["limit"]:
+            return
+        start = records[-1]["did"]
+
+
+def iter_indexd_guids(auth, limit=None, **filters):
+    for record in iter_indexd_records(auth, limit=limit, **filters):
+        yield record["did"]
+
+
+def count_indexd_records(auth, limit=None, **filters):
+    """Number of indexd records matching the `filters`, counting at most `limit`"""
+    return sum(1 for _ in iter_indexd_records(auth, limit=limit, **filters))
+
+
+def write_guids_file(path, guids, sample_size=None, seed=None):
+    """
+    Write the `guids` (any iterable) to `path`, one per line, without holding them in
+    memory. With `sample_size`, only write a uniform random sample of that many GUIDs
+    (reservoir sampling). Returns the number of GUIDs written.
+    """
+    if sample_size is not None:
+        rng = random.Random(seed)
+        sample = []
+        for i, guid in enumerate(guids):
+            if i < sample_size:
+                sample.append(guid)
+            else:
+                j = rng.randint(0, i)
+                if j < sample_size:
+                    sample[j] = guid
+        guids = sample
+    written = 0
+    with open(path, "w") as guids_file:
+        for guid in guids:
+            guids_file.write(f"{guid}\n")
+            written += 1
+    return written
+
+
+def create_indexd_records(index, records_data, max_workers=INDEXD_BULK_MAX_WORKERS):
+    """
+    Create indexd records concurrently with the given Gen3Index.
+    Returns one {"success": bool, "record": dict, "error": str} per record, in order.
+    """
+
+    def create_record(record_data):
+        try:
+            return {"success": True, "record": index.create_record(**record_data)}
+        except Exception as e:
+            logger.error(f"Failed to create indexd record: {e}")
+            return {"success": False, "error": str(e)}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(create_record, records_data))
+    failures = len([result for result in results if not result["success"]])
+    logger.info(f"Created {len(results) - failures} indexd records, {failures} failed")
+    return results
+
+
+def delete_indexd_records(index, guids, max_workers=INDEXD_BULK_MAX_WORKERS):
+    """
+    Delete indexd records concurrently with the given Gen3Index.
+    Returns {guid: {"success": bool, "error": str}}
+    """
+
+    def delete_record(guid):
+        try:
+            index.delete_record(guid=guid)
+            return {"success": True}
+        except Exception as e:
+            logger.error(f"Failed to delete indexd record {guid}: {e}")
+            return {"success": False, "error": str(e)}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = dict(zip(guids, executor.map(delete_record, guids)))
+    failures = len([result for result in results.values() if not result["success"]])
+    logger.info(f"Deleted {len(results) - failures} indexd records, {failures} failed")
+    return results
 
 
 def perform_pre_load_testing_setup():
@@ -0,0 +1,239 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from uuid import uuid4
+
+from utils import logger
+
+TIMING_STORE_PATH = Path(
+    os.getenv("TIMING_STORE_PATH", Path(__file__).parent.parent / "timings.db")
+)
+# Max number of rows written per transaction by the writer thread
+WRITE_BATCH_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS test_phases (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL,
+    nodeid TEXT NOT NULL,
+    phase TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    start REAL,
+    duration REAL NOT NULL,
+    worker TEXT,
+    env TEXT
+);
+CREATE INDEX IF NOT EXISTS test_phases_nodeid ON test_phases (nodeid);
+CREATE INDEX IF NOT EXISTS test_phases_run_id ON test_phases (run_id);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL UNIQUE,
+    run_id TEXT NOT NULL,
+    sink TEXT NOT NULL,
+    body TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS exports (
+    message_key TEXT PRIMARY KEY,
+    exported_at REAL NOT NULL
+);
+"""
+
+
+def get_run_id():
+    """Identify the CI run, or make up an id for local runs"""
+    parts = [os.getenv(name) for name in ("REPO", "PR_NUM", "RUN_NUM", "ATTEMPT_NUM")]
+    if all(parts):
+        return "-".join(parts)
+    return os.getenv("RUN_ID") or uuid4().hex
+
+
+def get_env():
+    return {
+        "namespace": os.getenv("NAMESPACE"),
+        "tested_env": os.getenv("TESTED_ENV"),
+        "hostname": os.getenv("HOSTNAME"),
+        "release_version": os.getenv("RELEASE_VERSION"),
+    }
+
+
+class TimingStore(object):
+    """
+    Append-only SQLite store of test phase timings and of the messages to export
+    to remote sinks (SQS...).
+
+    Rows are handed to a writer thread, so recording a test result never waits on
+    disk or network. Messages are exported in batch with `export_pending` and
+    marked as exported in a separate table, so rows are never updated.
+    """
+
+    def __init__(self, path=TIMING_STORE_PATH, run_id=None):
+        self.path = Path(path)
+        self._run_id = run_id
+        self._env = None
+        self._queue = queue.Queue()
+        self._writer = None
+        self._lock = threading.Lock()
+
+    @property
+    def run_id(self):
+        # computed on first use, after the conftest loaded the .env file
+        if self._run_id is None:
+            self._run_id = get_run_id()
+        return self._run_id
+
+    @property
+    def env(self):
+        if self._env is None:
+            self._env = json.dumps(get_env())
+        return self._env
+
+    def _connect(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        return conn
+
+    def _start_writer(self):
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_rows, daemon=True)
+                self._writer.start()
+
+    def _write_rows(self):
+        conn = self._connect()
+        done = False
+        while not done:
+            rows = [self._queue.get()]
+            while len(rows) < WRITE_BATCH_SIZE:
+                try:
+                    rows.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            statements = [row for row in rows if row is not None]
+            done = len(statements) < len(rows)
+            try:
+                with conn:
+                    for statement, params in statements:
+                        conn.execute(statement, params)
+            except sqlite3.Error as e:
+                # don't lose the whole batch because of one bad row
+                logger.warning(
+                    f"Unable to write {len(statements)} rows to {self.path} at once ({e}), "
+                    "writing them one by one"
+                )
+                self._write_one_by_one(conn, statements)
+            finally:
+                for _ in rows:
+                    self._queue.task_done()
+        conn.close()
+
+    def _write_one_by_one(self, conn, statements):
+        for statement, params in statements:
+            try:
+                with conn:
+                    conn.execute(statement, params)
+            except sqlite3.Error as e:
+                logger.error(f"Unable to write row to {self.path}, skipping it: {e}")
+
+    def _put(self, statement, params):
+        self._start_writer()
+        self._queue.put((statement, params))
+
+    def record_phase(self, report, worker=None):
+        """Record the duration and outcome of one phase (setup/call/teardown) of a test"""
+        self._put(
+            "INSERT INTO test_phases "
+            "(run_id, nodeid, phase, outcome, start, duration, worker, env) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                self.run_id,
+                report.nodeid,
+                report.when,
+                report.outcome,
+                getattr(report, "start", None),
+                report.duration,
+                worker,
+                self.env,
+            ),
+        )
+
+    def add_message(self, sink, message):
+        """Queue a message for export to `sink`, returns the key identifying the message"""
+        key = uuid4().hex
+        self._put(
+            "INSERT INTO messages (key, run_id, sink, body, created_at) VALUES (?, ?, ?, ?, ?)",
+            (key, self.run_id, sink, json.dumps(message), time.time()),
+        )
+        return key
+
+    def flush(self):
+        """Wait for the writer thread to write every queued row"""
+        if self._writer is not None:
+            self._queue.join()
+
+    def close(self):
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join()
+            self._writer = None
+
+    def query(self, sql, params=()):
+        """Run a read query against the store, e.g. for offline reports"""
+        self.flush()
+        conn = self._connect()
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def pending_messages(self, sink):
+        """Messages for `sink` that were not exported yet, from every run"""
+        rows = self.query(
+            "SELECT key, body FROM messages WHERE sink = ? "
+            "AND key NOT IN (SELECT message_key FROM exports) ORDER BY id",
+            (sink,),
+        )
+        return [(key, json.loads(body)) for key, body in rows]
+
+    def mark_exported(self, keys):
+        for key in keys:
+            self._put(
+                "INSERT OR IGNORE INTO exports (message_key, exported_at) VALUES (?, ?)",
+                (key, time.time()),
+            )
+
+    def export_pending(self, sink, send_batch, batch_size=100):
+        """
+        Export the pending messages of `sink` in batches.
+
+        Args:
+            send_batch (callable): gets a list of (message key, message) and returns the
+                keys of the messages it sent. The other ones stay pending for the next export.
+        """
+        pending = self.pending_messages(sink)
+        exported = 0
+        for i in range(0, len(pending), batch_size):
+            sent_ids = send_batch(pending[i : i + batch_size])
+            self.mark_exported(sent_ids)
+            exported += len(sent_ids)
+        logger.info(f"Exported {exported} of {len(pending)} pending messages to {sink}")
+        return exported
+
+    def get_durations(self, nodeid, phase="call"):
+        """Durations of `nodeid` over the recorded runs, oldest first"""
+        return [
+            duration
+            for (duration,) in self.query(
+                "SELECT duration FROM test_phases WHERE nodeid = ? AND phase = ? ORDER BY id",
+                (nodeid, phase),
+            )
+        ]
+
+
+timing_store = TimingStore()